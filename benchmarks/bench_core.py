@@ -0,0 +1,274 @@
+#!/usr/bin/python3
+"""Throughput benchmarks for the note processing hot path
+
+Builds a headless Core for each configuration in a temporary folder,
+with stand-in rtmidi2 ports instead of devices (no window and no
+Launchpads), and pushes a synthetic MPE stream through cb_midi_in: 10
+finger chords, each finger on its own channel with pressure, pitch
+bend and CC74 while held.  The startup cache is turned off: startup
+isn't what is measured, and the user's cache folder is left alone.
+
+Events are handled on this thread in batches, like the MIDI engine
+drains its input rings, followed by Core.engine_update() (lights,
+output flush).  Events/second includes that work, the per-event latency
+is just cb_midi_in.  The best of a few runs is kept.
+
+Results are written to benchmarks/results.json and compared against
+benchmarks/baseline.json if it exists.  Both are specific to the machine,
+so they aren't committed: save a baseline before making changes.
+
+Usage (from the project folder):
+    python benchmarks/bench_core.py [--chords N] [--runs N] [--only name,...]
+    python benchmarks/bench_core.py --save-baseline
+"""
+import os, sys, json, math, time, shutil, tempfile, argparse, platform, threading, contextlib
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import rtmidi2
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS = os.path.join(HERE, "results.json")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+# settings.ini [general] options for each configuration
+CONFIGS = {
+    "mpe": {},
+    "split": {"split": "true"},
+    "hardware_split_128": {"size": "-8"}, # 128 testing the 200's split
+    "hardware_split_200": {"size": "200"},
+    "y_bend": {"y_bend": "true"},
+    "one_channel": {"one_channel": "1"},
+}
+
+FINGERS = 10
+FRAMES = 20 # expression messages per finger while a chord is held
+BATCH = 16 # events handled before each engine update
+
+
+class BenchMidiOut:
+    """Stands in for rtmidi2.MidiOut, only counting what is sent"""
+
+    def __init__(self):
+        self.count = 0
+
+    def open_port(self, port):
+        pass
+
+    def send_raw(self, *msg):
+        self.count += 1
+
+    def send_messages(self, kind, msgs):
+        self.count += len(msgs)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
+
+
+class BenchMidiIn:
+    """Stands in for rtmidi2.MidiIn, the benchmark calls the core directly"""
+
+    def __init__(self):
+        self.callback = None
+
+    def open_port(self, port):
+        pass
+
+    def close_port(self):
+        pass
+
+
+def install_ports():
+    """Make the core find a LinnStrument, a loopback and a split port"""
+    rtmidi2.get_out_ports = lambda: ["LinnStrument MIDI", "midimech", "split"]
+    rtmidi2.get_in_ports = lambda: ["LinnStrument MIDI"]
+    rtmidi2.MidiOut = BenchMidiOut
+    rtmidi2.MidiIn = BenchMidiIn
+
+
+def make_core(options, folder):
+    """Build a Core reading `options` from a settings.ini in `folder`"""
+    from src.core import Core
+
+    settings = {"headless": "true", "launchpad": "false", "cache": "false"}
+    settings.update(options)
+    with open(os.path.join(folder, "settings.ini"), "w") as f:
+        f.write("[general]\n")
+        for key, value in settings.items():
+            f.write("%s=%s\n" % (key, value))
+    shutil.copy(os.path.join(ROOT, "scales.yaml"), folder)
+
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            core = Core()
+            # no device to wait for
+            core.rpn_queue.interval = 0.0
+            core.rpn_queue.wait()
+            core.engine.sync()
+    finally:
+        os.chdir(cwd)
+    # handle events on this thread instead, with output batched like the engine does
+    core.engine.stop()
+    core.output.thread = threading.get_ident()
+    return core
+
+
+def chord_stream(core, chords):
+    """Generate the LinnStrument messages for playing `chords` chords"""
+    hardware_split = core.options.hardware_split
+    events = []
+    for c in range(chords):
+        shift = c % 4
+        fingers = []
+        for i in range(FINGERS):
+            ch = i + 1 # channel 1 is the MPE main channel
+            width = core.board_w
+            if hardware_split:
+                # the device's left and right halves use their own note numbers
+                width = core.split_point if ch < 8 else core.board_w - core.split_point
+            x = (i % 5) * 2 + shift % 2
+            y = 1 + (i // 5) * 3 + shift // 2
+            fingers.append((ch, min(x, width - 1) + y * width))
+        for ch, note in fingers:
+            events.append((0x90 | ch, note, 40 + ch * 8))
+        for frame in range(FRAMES):
+            t = frame / FRAMES
+            for ch, note in fingers:
+                phase = t * 2.0 * math.pi + ch
+                pressure = int(64 + 63 * math.sin(phase))
+                bend = 8192 + int(600 * math.sin(phase * 3.0))
+                timbre = int(127 * t) # sweeps into y_bend's threshold
+                events.append((0xD0 | ch, pressure))
+                events.append((0xE0 | ch, bend & 0x7F, bend >> 7))
+                events.append((0xB0 | ch, 74, timbre))
+        for ch, note in fingers:
+            events.append((0x80 | ch, note, 64))
+    return events
+
+
+def run(core, events):
+    """Handle `events`, returns (total seconds, per-event nanoseconds)"""
+    cb_midi_in = core.cb_midi_in
+    engine_update = core.engine_update
+    clock = time.perf_counter_ns
+    latencies = [0] * len(events)
+    start = clock()
+    for i in range(0, len(events), BATCH):
+        for j in range(i, min(i + BATCH, len(events))):
+            data = list(events[j]) # the handlers change it
+            t = clock()
+            cb_midi_in(data, 0)
+            latencies[j] = clock() - t
+        engine_update()
+    return (clock() - start) / 1e9, latencies
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, len(values) * p // 100)]
+
+
+def bench(name, options, chords, runs):
+    folder = tempfile.mkdtemp(prefix="midimech-bench-")
+    core = make_core(options, folder)
+    try:
+        events = chord_stream(core, chords)
+        run(core, events[:len(events) // 10]) # warm up
+        best = None
+        for i in range(runs):
+            elapsed, latencies = run(core, events)
+            if best is None or elapsed < best[0]:
+                best = elapsed, latencies
+        elapsed, latencies = best
+        latencies.sort()
+        n = len(latencies)
+        return {
+            "events": n,
+            "seconds": elapsed,
+            "events_per_sec": n / elapsed,
+            "mean_us": sum(latencies) / n / 1000.0,
+            "p50_us": percentile(latencies, 50) / 1000.0,
+            "p90_us": percentile(latencies, 90) / 1000.0,
+            "p99_us": percentile(latencies, 99) / 1000.0,
+            "max_us": latencies[-1] / 1000.0,
+            "sent": sum(out.count for out in (core.midi_out, core.split_out, core.linn_out) if out),
+        }
+    finally:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            core.deinit()
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def compare(results, baseline, threshold):
+    """Print the change from the baseline, returns the names of regressions"""
+    regressions = []
+    print()
+    print("%-20s %10s %10s %10s %10s" % ("vs baseline", "events/s", "", "p99 us", ""))
+    for name, result in results["configs"].items():
+        base = baseline["configs"].get(name)
+        if not base:
+            print("%-20s (not in baseline)" % name)
+            continue
+        rate = (result["events_per_sec"] / base["events_per_sec"] - 1.0) * 100.0
+        p99 = (result["p99_us"] / base["p99_us"] - 1.0) * 100.0 if base["p99_us"] else 0.0
+        flag = ""
+        if rate < -threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        print("%-20s %10.0f %+9.1f%% %10.2f %+9.1f%%  %s" % (
+            name, result["events_per_sec"], rate, result["p99_us"], p99, flag
+        ))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the note processing hot path")
+    parser.add_argument("--chords", type=int, default=100, help="chords played per run")
+    parser.add_argument("--runs", type=int, default=3, help="runs per configuration (the best is kept)")
+    parser.add_argument("--only", default="", help="comma separated configurations to run")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=10.0,
+        help="percent fewer events/s than the baseline that counts as a regression")
+    args = parser.parse_args()
+    sys.argv = sys.argv[:1] # the core reads its flags from here too
+
+    install_ports()
+    names = [name for name in args.only.split(",") if name] or list(CONFIGS)
+    results = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "chords": args.chords,
+        "configs": {},
+    }
+    print("%-20s %8s %12s %9s %9s %9s %9s" % (
+        "config", "events", "events/s", "mean us", "p50 us", "p99 us", "max us"
+    ))
+    for name in names:
+        r = results["configs"][name] = bench(name, CONFIGS[name], args.chords, args.runs)
+        print("%-20s %8d %12.0f %9.2f %9.2f %9.2f %9.1f" % (
+            name, r["events"], r["events_per_sec"], r["mean_us"], r["p50_us"], r["p99_us"], r["max_us"]
+        ))
+
+    with open(RESULTS, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.save_baseline:
+        shutil.copy(RESULTS, BASELINE)
+        print("Saved baseline:", BASELINE)
+        return 0
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("Slower than the baseline:", ", ".join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
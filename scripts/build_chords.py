@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+"""Generate chords.bin, the table used by the chord analyzer
+
+Runs musicpy's chord detection once for every pitch class set and bass
+note, voiced as the bass followed by the other notes going up.
+
+The table is committed, so this is only needed when changing how chords
+are named; musicpy is not needed to run midimech.  Detection gets slow
+for big chords (about a second per chord from 7 notes), so the full
+table takes hours: use --jobs to run several detections at once.
+Progress is saved as it goes, so an interrupted run can be resumed.
+
+Usage (from the project folder):
+    python scripts/build_chords.py [max notes] [--jobs N]
+    python scripts/build_chords.py --verify [count]
+"""
+import os, sys, random
+from multiprocessing import Pool
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.chords import ChordTable
+
+import musicpy as mp
+
+FILENAME = os.path.join(ROOT, ChordTable.FILENAME)
+
+
+def detect(key):
+    mask, bass = key
+    return mask, bass, mp.alg.detect(mp.chord(",".join(ChordTable.voicing(mask, bass))))
+
+
+def keys(max_notes=12):
+    """Every (mask, bass), smallest chords first"""
+    masks = sorted(
+        (m for m in range(1, 1 << 12) if bin(m).count("1") <= max_notes),
+        key=lambda m: (bin(m).count("1"), m),
+    )
+    for mask in masks:
+        for bass in range(12):
+            if mask >> bass & 1:
+                yield mask, bass
+
+
+def build(max_notes, jobs):
+    table = ChordTable()
+    table.load(FILENAME)
+    todo = [key for key in keys(max_notes) if not table.get(*key)]
+    print("Chords to detect:", len(todo))
+    with Pool(jobs) as pool:
+        for i, (mask, bass, label) in enumerate(pool.imap(detect, todo)):
+            table.set(mask, bass, label)
+            if i % 100 == 99:
+                table.save(FILENAME)
+                print(i + 1, "/", len(todo))
+        table.save(FILENAME) # before the pool is shut down, in case that hangs
+
+
+def verify(count):
+    """Compare the table against musicpy for random chords"""
+    table = ChordTable()
+    table.load(FILENAME)
+    entries = list(keys())
+    mismatches = 0
+    for key in random.sample(entries, min(count, len(entries))):
+        mask, bass, expected = detect(key)
+        if table.get(mask, bass) != expected:
+            mismatches += 1
+            print("Mismatch:", ",".join(ChordTable.voicing(mask, bass)), repr(table.get(mask, bass)), repr(expected))
+    print("Checked", min(count, len(entries)), "chords,", mismatches, "mismatches")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--verify" in args:
+        args.remove("--verify")
+        sys.exit(0 if verify(int(args[0]) if args else 200) else 1)
+    jobs = 1
+    if "--jobs" in args:
+        i = args.index("--jobs")
+        jobs = int(args[i + 1])
+        del args[i:i + 2]
+    build(int(args[0]) if args else 12, jobs)
@@ -0,0 +1,117 @@
+#!/usr/bin/python3
+"""Compare Launchpad press-to-output latency of frame polling and rtmidi callbacks
+
+No hardware needed: Launchpad X pad presses arrive at random times on a
+stand-in rtmidi input and are timed until the MIDI engine handles them
+(where the note is sent and the output flushed).  The old way read the
+Launchpad once per frame in Core.logic, now rtmidi calls back with each
+message as it arrives (from the thread sending the presses here, from
+rtmidi's own thread when playing).
+
+Presses are timed while playing (5-50 ms apart) and as the first press
+after a pause (`idle` seconds without input).
+
+Usage (from the project folder):
+    python scripts/launchpad_latency.py [fps] [presses] [idle presses] [idle]
+"""
+import os, sys, random, threading, time
+from collections import deque
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import rtmidi2
+
+from src.engine import MidiEngine
+from src.launchpad import Launchpad
+
+
+class FakeMidiIn:
+    """Stands in for rtmidi2.MidiIn: calls back with presses, or queues them if there's no callback"""
+
+    def __init__(self):
+        self.callback = None
+        self.queue = deque()
+
+    def open_port(self, port):
+        pass
+
+    def close_port(self):
+        pass
+
+    def press(self, msg):
+        if self.callback:
+            self.callback(msg, 0.0)
+        else:
+            self.queue.append(msg)
+
+
+class FakeCore:
+    latency = None
+    profiler = None
+
+    def __init__(self):
+        self.arrived = {}
+        self.delays = []
+
+    def cb_launchpad_in(self, lp, msg, timestamp=0):
+        self.delays.append(time.perf_counter() - self.arrived.pop(msg[1]))
+
+    def engine_update(self):
+        pass
+
+
+def run(callback, fps, presses, gap=(0.005, 0.05)):
+    core = FakeCore()
+    engine = MidiEngine(core)
+    midi_in = FakeMidiIn()
+    lp = Launchpad(core, None, "lpx")
+    lp.input = engine.input(core.cb_launchpad_in)
+    engine.start()
+
+    done = threading.Event()
+
+    def player():
+        for i in range(presses):
+            time.sleep(random.uniform(*gap))
+            note = 11 + (i % 8) + 10 * (i // 8 % 8)
+            core.arrived[note] = time.perf_counter()
+            midi_in.press([144, note, 100])
+        time.sleep(0.1)
+        done.set()
+
+    threading.Thread(target=player, daemon=True).start()
+    if callback:
+        lp.port_in = 0
+        rtmidi2.MidiIn = lambda: midi_in # what Launchpad.start() opens
+        lp.start()
+        done.wait()
+        lp.stop()
+    else:
+        # what Core.logic used to do every frame
+        while not done.is_set():
+            while midi_in.queue:
+                lp.input(lp, midi_in.queue.popleft())
+            time.sleep(1.0 / fps)
+    engine.stop()
+    return core.delays
+
+
+def report(name, delays):
+    delays = sorted(d * 1000.0 for d in delays)
+    n = len(delays)
+    print("%-24s n=%d mean=%.2fms p50=%.2fms p99=%.2fms max=%.2fms" % (
+        name, n, sum(delays) / n, delays[n // 2], delays[min(n - 1, n * 99 // 100)], delays[-1]
+    ))
+
+
+if __name__ == "__main__":
+    fps = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    presses = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    idle_presses = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    idle = float(sys.argv[4]) if len(sys.argv) > 4 else 3.0
+    report("polled at %d fps" % fps, run(False, fps, presses))
+    report("rtmidi callback", run(True, fps, presses))
+    gap = (idle, idle + 0.05)
+    report("polled, after %gs idle" % idle, run(False, fps, idle_presses, gap))
+    report("callback, after %gs idle" % idle, run(True, fps, idle_presses, gap))
@@ -1,19 +1,30 @@
+import threading, time
 from enum import Enum
 from src.util import *
 from src.constants import *
 
+WAVETABLE_SIZE = 1024
+# one cycle of a sine, the first value is repeated at the end for interpolating
+SINE = [math.sin(math.tau * i / WAVETABLE_SIZE) for i in range(WAVETABLE_SIZE + 1)]
+
+def sine(phase):
+    """sin(tau * phase) from the wavetable, phase is 0-1"""
+    pos = phase * WAVETABLE_SIZE
+    i = int(pos)
+    a = SINE[i]
+    return a + (SINE[i + 1] - a) * (pos - i)
+
 class Articulation:
     State = Enum('state', 'off pre attack hold release')
     
     def __init__(self, core):
         self.core = core
         self.value = 0.0
-        self.time_between_ticks = 0.02
-        self.timer = 0.0
         self.state = self.State(self.State.off)
 
         # a list of midi notes that need to be released
         self.deferred_notes = set()
+        self.clock = None # ArticulationClock, started or woken when the vibrato starts
         # self.noise_ = 0.0
         # self.last_noise = 0.0
 
@@ -38,7 +49,7 @@ class Articulation:
         elif self.mode not in ('mod', 'pitch'):
             print('Vibrato option must be mod or pitch. Disabling.')
             self.mode = 'off'
-        self.t = 0.0
+        self.phase = 0.0 # vibrato cycle, 0-1
         self.vibrato_speed = 5.0
         self.vibrato_depth = 1.0 / 4.0
         self.vibrato_shift = 0.0 # 0.1
@@ -59,7 +70,14 @@ class Articulation:
                 self.vibrato_dir = 1.0
         if value >= self.vibrato_high:
             if self.vibrato_dir >= 0.0:
+                starting = self.vibrato_window_t <= 0.0
                 self.vibrato_window_t = self.vibrato_window
+                if starting:
+                    # logic() may have been idle (or never run), it has work again
+                    if self.clock:
+                        self.clock.wake()
+                    else:
+                        self.core.start_articulation_clock()
                 self.vibrato_dir = -1.0
                 self.wiggles += 1
 
@@ -85,9 +103,6 @@ class Articulation:
     def stop(self):
         self.change_state(self.state.off)
 
-    def defer_midi_note(self, note):
-        self.notes.add(note)
-
     def set(self, value):
         if self.value is False or self.value <= 0.0:
             if self.state != self.state.off:
@@ -98,6 +113,16 @@ class Articulation:
         if self.state == self.state.off:
             self.change_state(self.state.pre)
 
+    def idle(self):
+        """True when there's no vibrato changing, so logic() has nothing to send"""
+        if self.mode == 'mod':
+            rest = [0xb0, 1, 0]
+        elif self.mode == 'pitch':
+            rest = [0xe0, 0, 0x40]
+        else:
+            return True
+        return self.vibrato_window_t <= 0.0 and self.mod <= 0.0 and self.last_midi_message == rest
+
     def tick(self):
         # if self.state == self.state.off:
         #     return
@@ -110,7 +135,7 @@ class Articulation:
                     self.last_midi_message = msg
             elif self.mode == 'pitch':
                 if self.mod > 0.0:
-                    wave = self.mod * math.sin(math.tau * self.t * self.vibrato_speed) * self.vibrato_depth + self.vibrato_shift
+                    wave = self.mod * sine(self.phase) * self.vibrato_depth + self.vibrato_shift
                     pb = compose_pitch_bend(wave)
                     msg = [0xe0, pb[0], pb[1]]
                     if msg != self.last_midi_message:
@@ -128,8 +153,8 @@ class Articulation:
         #     pass
 
     def logic(self, dt):
-        self.timer += dt
-        self.t += dt
+        """Advance by `dt` seconds and send the changes (see ArticulationClock)"""
+        self.phase = (self.phase + dt * self.vibrato_speed) % 1.0
 
         if self.mode is None:
             return
@@ -149,13 +174,94 @@ class Articulation:
             if self.mod > 0.0:
                 self.mod = max(0.0, self.mod - 1.0 * dt * self.wiggle_out_speed)
                 self.mod_changed = True
-        
-        if self.timer >= self.time_between_ticks:
-            self.timer -= self.time_between_ticks
-            
-            # we're losing time
-            if self.timer >= self.time_between_ticks:
-                self.timer = 0.0
-
-            self.tick()
+
+        self.tick()
+
+
+class ArticulationClock(threading.Thread):
+    """Runs Articulation.logic() at `rate` ticks per second, apart from frames
+
+    Ticks are scheduled from the first one (never from when the last one
+    ended), so they don't drift.  They are handled on the MIDI engine
+    thread, where the pressure changing the articulation comes from, and
+    each tick's time step is the scheduled one, so the vibrato advances
+    evenly even when a tick is handled late.  If the clock falls behind by
+    whole ticks, those are skipped (counted in `missed`) and the next step
+    covers them.
+
+    While nothing is changing (see Articulation.idle()) the thread sleeps
+    until the articulation wakes it, when the pressure starts a vibrato.
+    The vibrato only comes from launchpad pressure, so the clock isn't
+    started until the first one (see Core.start_articulation_clock()).
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, core, rate):
+        super().__init__(name="articulation", daemon=True)
+        self.core = core
+        self.articulation = core.articulation
+        self.articulation.clock = self
+        self.period = 1.0 / rate
+        self.event = threading.Event()
+        self.running = False
+        self.sleeping = False
+        # ticks are sent to the engine as the time step to advance by
+        self.step = core.engine.input(self.articulation.logic, size=64)
+
+        self.ticks = 0
+        self.missed = 0
+
+    def active(self):
+        return self.core.launchpads and not self.articulation.idle()
+
+    def wake(self):
+        """Start ticking again if sleeping (any thread)"""
+        if self.sleeping:
+            self.event.set()
+
+    def run(self):
+        clock = self.clock
+        period = self.period
+        step = self.step
+        next_tick = clock()
+        last = next_tick - period
+        while self.running:
+            if not self.active():
+                # set first, so a wake() after checking again isn't missed
+                self.sleeping = True
+                self.event.clear()
+                if self.running and not self.active():
+                    self.event.wait()
+                self.sleeping = False
+                # the time slept isn't part of the articulation
+                next_tick = clock()
+                last = next_tick - period
+                continue
+            step(next_tick - last)
+            self.ticks += 1
+            last = next_tick
+            next_tick += period
+            delay = next_tick - clock()
+            if delay > 0.0:
+                time.sleep(delay)
+            elif delay <= -period:
+                missed = int(-delay / period)
+                next_tick += missed * period
+                self.missed += missed
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self.event.set()
+        if self.is_alive():
+            self.join()
+
+    def stats(self):
+        return "Articulation: %d ticks, %d missed" % (self.ticks, self.missed)
 
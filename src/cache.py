@@ -0,0 +1,120 @@
+import os, sys, glob, marshal
+
+def cache_dir():
+    """The per-user cache folder for midimech"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~\\AppData\\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "midimech")
+
+
+class StartupCache:
+    """Things computed at startup, saved for the next run
+
+    The cache is only used while its source files are unchanged.  Each
+    is checked by modification time and size, and only hashed if those
+    changed, so saving a file without changes doesn't throw it away.
+    Loading it is a single read.
+
+    Only plain data is stored (ints, strings, lists, tuples and dicts of
+    them) with marshal, which doesn't unpickle objects.  It's one file in
+    the per-user cache folder, for the project folder that was run last
+    (settings.ini is read from there): the folder is stored in the file
+    and running from another one replaces it.  The header is checked
+    before the rest is decoded.  Turned off with cache=false or
+    --no-cache.
+    """
+
+    MAGIC = b"MMSC"
+    VERSION = 3 # change when what's cached changes
+    HEADER = MAGIC + bytes([VERSION, marshal.version])
+
+    def __init__(self, sources, fn=None, project=None):
+        self.sources = [os.path.abspath(path) for path in sources] # files the cached data is computed from
+        self.fn = fn or os.path.join(cache_dir(), "startup.cache")
+        self.project = os.path.abspath(project or os.getcwd())
+        self.data = None # cached data, if valid
+        self.stamps = {} # source -> (mtime, size, sha1), None if missing
+
+    @staticmethod
+    def hash(path):
+        import hashlib # only needed when something changed
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @classmethod
+    def stamp(cls, path, hashed=True):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, cls.hash(path) if hashed else None
+
+    def load(self):
+        """Read the cache, returns the data or None if it's missing or out of date"""
+        try:
+            with open(self.fn, "rb") as f:
+                buf = f.read()
+            if not buf.startswith(self.HEADER):
+                return self.miss()
+            cache = marshal.loads(buf[len(self.HEADER):])
+        except Exception:
+            return self.miss()
+        if not isinstance(cache, dict) or not isinstance(cache.get("stamps"), dict):
+            return self.miss()
+        if cache.get("project") != self.project:
+            return self.miss()
+        stamps = cache["stamps"]
+        touched = False
+        for path in self.sources:
+            old = stamps.get(path)
+            new = self.stamp(path, hashed=False)
+            if old is None or new is None:
+                if old != new:
+                    return self.miss()
+            elif new[:2] != old[:2]:
+                # changed or just saved again?
+                if new[1] != old[1] or self.hash(path) != old[2]:
+                    return self.miss()
+                stamps[path] = new[:2] + old[2:]
+                touched = True
+        self.stamps = stamps
+        self.data = cache.get("data")
+        if touched:
+            self.write()
+        return self.data
+
+    def miss(self):
+        # stamped before computing, so changes made meanwhile aren't missed
+        self.stamps = {path: self.stamp(path) for path in self.sources}
+        return None
+
+    def save(self, data):
+        """Store the data computed after load() missed"""
+        self.data = data
+        self.write()
+
+    def write(self):
+        cache = {"project": self.project, "stamps": self.stamps, "data": self.data}
+        tmp = self.fn + ".tmp"
+        try:
+            buf = self.HEADER + marshal.dumps(cache)
+            os.makedirs(os.path.dirname(self.fn) or ".", exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(buf)
+            os.replace(tmp, self.fn)
+        except (OSError, ValueError) as e:
+            print("Unable to write " + self.fn + ": " + str(e))
+            return
+        self.prune()
+
+    def prune(self):
+        """Remove the per-folder cache files older versions left behind"""
+        for fn in glob.glob(os.path.join(os.path.dirname(self.fn), "startup-*.cache")):
+            try:
+                os.remove(fn)
+            except OSError:
+                pass
@@ -0,0 +1,80 @@
+import os, zlib
+from src.constants import NOTES
+
+class ChordTable:
+    """Precomputed chord names by pitch class set and bass note
+
+    The key is the 12 bit pitch class mask (bit 0 is C) and the bass
+    pitch class, so every set of held notes has a key.  Names come from
+    musicpy (see scripts/build_chords.py), given the close voicing of the
+    key: the bass followed by the other notes going up.  musicpy used to
+    be given the held notes from the lowest up, which named some wide
+    voicings differently ("Cmajor sort as [1, 3, 2]" for C,G,E, now
+    "Cmajor"); tests/chord_corpus.tsv lists such cases.
+
+    Stored in chords.bin: a header, then the names separated by newlines
+    in key order (mask * 12 + bass, empty where the bass isn't in the
+    mask), compressed with zlib.  Loading it is a read and a split, and
+    looking up the notes being played is a list index.  musicpy is only
+    needed to regenerate the table.
+    """
+
+    FILENAME = "chords.bin"
+    MAGIC = b"MMCT"
+    VERSION = 1 # change when the layout changes
+    HEADER = MAGIC + bytes([VERSION])
+    SIZE = 4096 * 12
+
+    def __init__(self):
+        self.labels = [''] * self.SIZE # mask * 12 + bass -> chord name
+
+    def load(self, fn=FILENAME):
+        """Load the table, returns False if there is no table file"""
+        try:
+            with open(fn, "rb") as f:
+                buf = f.read()
+        except FileNotFoundError:
+            return False
+        if not buf.startswith(self.HEADER):
+            raise ValueError(fn + " is not a chord table (or is from another version)")
+        labels = zlib.decompress(buf[len(self.HEADER):]).decode("utf-8").split("\n")
+        if len(labels) != self.SIZE:
+            raise ValueError(fn + " is incomplete")
+        self.labels = labels
+        return True
+
+    def save(self, fn=FILENAME):
+        tmp = fn + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(self.HEADER + zlib.compress("\n".join(self.labels).encode("utf-8"), 9))
+        os.replace(tmp, fn)
+
+    def get(self, mask, bass):
+        return self.labels[mask * 12 + bass]
+
+    def set(self, mask, bass, label):
+        self.labels[mask * 12 + bass] = label
+
+    def __len__(self):
+        return sum(1 for label in self.labels if label)
+
+    @staticmethod
+    def voicing(mask, bass):
+        """Note names for pitch class set `mask`, from the bass going up"""
+        return [NOTES[(bass + i) % 12] for i in range(12) if mask >> ((bass + i) % 12) & 1]
+
+    @staticmethod
+    def pitch_classes(notes):
+        """Get (mask, bass) for a bitmask of midi notes"""
+        bass = ((notes & -notes).bit_length() - 1) % 12
+        mask = 0
+        while notes:
+            mask |= notes & 0xfff
+            notes >>= 12
+        return mask, bass
+
+    def analyze(self, notes):
+        """Chord name for a bitmask of midi notes, '' if none"""
+        if not notes:
+            return ''
+        return self.get(*self.pitch_classes(notes))
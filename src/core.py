@@ -4,6 +4,7 @@ from collections import OrderedDict
 from configparser import ConfigParser
 import os, sys, glm, copy, binascii, struct, math, traceback, signal
 import rtmidi2
+import numpy as np
 from dataclasses import dataclass
 from glm import ivec2, vec2, ivec3, vec3
 import time
@@ -11,54 +12,42 @@ import time
 from src.util import *
 from src.constants import *
 from src.settings import Settings, DEFAULT_OPTIONS
-from src.note import Note
+from src.note import NoteState
 from src.device import Device, DeviceSettings
 from src.launchpad import Launchpad
-from src.articulation import Articulation
+from src.linnstrument import LinnLights
+from src.articulation import Articulation, ArticulationClock
+from src.layout import Layout
+from src.scales import ScaleDB
+from src.engine import MidiEngine
+from src.output import MidiWriter
+from src.limiter import ExpressionLimiter
+from src.latency import LatencyMonitor
+from src.profiler import FrameProfiler
+from src.scheduler import FrameScheduler
+from src.rpn import RpnQueue
+from src.recorder import Recorder, Replayer, MIDI_IN, FOOT_IN, LAUNCHPAD_IN
+from src.startup import STARTUP
+from src.cache import StartupCache
 # from src.gamepad import Gamepad
 
-with open(os.devnull, "w") as devnull:
-    # suppress pygame messages (to keep console output clean)
-    stdout = sys.stdout
-    sys.stdout = devnull
-    import pygame, pygame.midi, pygame.gfxdraw
+# pygame and pygame_gui are only loaded by src.gui (not in headless mode),
+#  launchpads use rtmidi like the other devices
 
-    sys.stdout = stdout
-import pygame_gui
-
-try:
-    import launchpad_py as launchpad
-except ImportError:
-    try:
-        import launchpad
-    except ImportError:
-        error("The project dependencies have changed! Run the requirements setup command again!")
-
-try:
-    import yaml
-except ImportError:
-    error("The project dependencies have changed! Run the requirements setup command again!")
+# what the startup cache is computed from
+CACHE_SOURCES = ["settings.ini", "scales.yaml"] + [
+    os.path.join(os.path.dirname(__file__), fn)
+    for fn in ("core.py", "layout.py", "scales.py", "settings.py", "util.py")
+]
 
 # import mido
 
-try:
-    import musicpy as mp
-except ImportError:
-    error("The project dependencies have changed! Run the requirements setup command again!")
-
 class Core:
     CORE = None
     
-    def rotate_mode(self, notes: str, mode: int):
-        """Rotates a mode string (see: scales.yaml strings with x and .)"""
-        notes = copy.copy(notes)
-        while mode:
-            if notes[0] == 'x':
-                notes = notes[1:] + notes[0]
-            while notes[0] == '.':
-                notes = notes[1:] + notes[0]
-            mode -= 1
-        return notes
+    def in_scale(self, note):
+        """Is note index (0-11) in the current scale and mode?"""
+        return (self.scale_mask >> note) & 1
 
     def prev_bank(self):
         return self.next_bank(-1)
@@ -69,8 +58,8 @@ class Core:
         self.bank = max(0, min(127, self.bank + ofs))
         msb = (self.bank >> 7) & 0x7f
         lsb = self.bank & 0x7f
-        self.midi_out.send_cc(0, 0, msb)
-        self.midi_out.send_cc(0, 32, lsb)
+        self.midi_write(self.midi_out, [0xb0, 0, msb])
+        self.midi_write(self.midi_out, [0xb0, 32, lsb])
         print('Bank Select: ', self.bank)
         return True
     
@@ -90,7 +79,7 @@ class Core:
 
     def next_mode(self, ofs=1):
         """Go to next mode according to offset (ofs), wrapping around if necessary"""
-        self.set_mode((self.mode_index + ofs) % self.scale_notes.count('x'))
+        self.set_mode((self.mode_index + ofs) % len(self.scales.modes[self.scale_index]))
         self.dirty = self.dirty_lights = True
 
     def prev_scale(self, ofs=1):
@@ -105,7 +94,7 @@ class Core:
     
     def set_mode(self, mode: int):
         """Set mode by index (0-indexed)"""
-        self.scale_notes = self.rotate_mode(self.scale_db[self.scale_index]['notes'], mode)
+        self.scale_mask = self.scales.modes[self.scale_index][mode]
         self.mode_index = mode
         try:
             self.mode_name = self.scale_db[self.scale_index]['modes'][mode]
@@ -137,13 +126,35 @@ class Core:
             val = val**self.velocity_curve_
         return val
 
+    def set_velocity_curve(self, curve):
+        """Change the velocity curve, its velocity map is made the first time it's used"""
+        self.velocity_curve_ = curve
+        velocity_map = self.velocity_maps.get(curve)
+        if velocity_map is None:
+            velocity_map = self.velocity_maps[curve] = self.build_velocity_map()
+        self.velocity_map = velocity_map
+
+    def build_velocity_map(self):
+        """(velocity 0-1, MIDI velocity) played for each note on velocity, see note_on()"""
+        velocity_map = []
+        settings = self.has_velocity_settings()
+        for val in range(128):
+            if settings:
+                vel = self.velocity_curve(val / 127)
+                velocity_map.append((vel, clamp(
+                    self.options.min_velocity,
+                    self.options.max_velocity,
+                    int(vel * 127 + 0.5),
+                )))
+            else:
+                velocity_map.append((val / 127, val))
+        return velocity_map
+
     def send_ls_cc(self, channel, cc, val):
         """Send CC to LinnStrument channel with value, if connected"""
         if not self.linn_out:
             return
-        # msg = [0xb0 | channel, cc, val]
-        self.linn_out.send_cc(channel, cc, val)
-        # self.linn_out.send_messages(0xb0, [(channel, cc, val)])
+        self.midi_write(self.linn_out, [0xb0 | channel, cc, val])
 
     def send_all_notes_off(self):
         if not self.midi_out:
@@ -156,9 +167,7 @@ class Core:
     def ls_color(self, x, y, col):
         """Set LinnStrument pad color"""
         if self.linn_out:
-            self.send_ls_cc(0, 20, x + 1)
-            self.send_ls_cc(0, 21, self.board_h - y - 1)
-            self.send_ls_cc(0, 22, col)
+            self.linn_lights.set(x + 1, self.board_h - y - 1, col)
 
     def set_light(self, x, y, col, index=None, mark=False):  # col is [1,11], 0 resets
         """Set light to color `col` at x, y if in range and connected"""
@@ -170,13 +179,13 @@ class Core:
         if not index:
             index = self.get_note_index(x, y, transpose=False)
 
-        self.mark_lights[y][x] = mark
+        self.mark_lights[y, x] = mark
         
         self.ls_color(x, y, col)
 
         if index is not None:
             for lp in self.launchpads:
-                if self.scale_notes[index] != '.':
+                if self.in_scale(index):
                     if self.options.launchpad_colors:
                         lp_col = self.options.launchpad_colors[index]
                     else:
@@ -189,42 +198,33 @@ class Core:
                 if 0 <= x < 8 and 0 <= y < 8:
                     if not self.is_macro_button(x, y):
                         if self.options.launchpad_colors:
-                            lp.out.LedCtrlXYByCode(x, y+1, lp_col)
+                            lp.frame.set_code(x, y+1, lp_col)
                         else:
-                            lp.out.LedCtrlXY(x, y+1, lp_col[0], lp_col[1], None if lp_col[2] == 0 else lp_col[2])
+                            lp.frame.set(x, y+1, lp_col[0], lp_col[1], None if lp_col[2] == 0 else lp_col[2])
                     else:
                         if self.options.launchpad_colors:
-                            lp.out.LedCtrlXYByCode(x, y+1, 3)
+                            lp.frame.set_code(x, y+1, 3)
                         else:
-                            lp.out.LedCtrlXY(x, y+1, 63, 63, 63)
+                            lp.frame.set(x, y+1, 63, 63, 63)
 
-    def reset_light(self, x, y, reset_red=True):
+    def reset_light(self, x, y, reset_red=True, note=None):
         """Reset the light at x, y"""
-        note = self.get_note_index(x, y, transpose=False)
+        if note is None:
+            note = self.get_note_index(x, y, transpose=False)
         
         if self.is_split():
             split_chan = self.channel_from_split(x, self.board_h - y - 1)
             if split_chan:
                 light_col = self.options.split_lights[note]
-                try:
-                    light_col = light_col if self.scale_notes[note]!='.' else 7
-                except IndexError:
-                    light_col = 7
             else:
                 light_col = self.options.lights[note]
-                try:
-                    light_col = light_col if self.scale_notes[note]!='.' else 7
-                except IndexError:
-                    light_col = 7
         else:
             light_col = self.options.lights[note]
-            try:
-                light_col = light_col if self.scale_notes[note]!='.' else 7
-            except IndexError:
-                light_col = 7
+        if not self.in_scale(note):
+            light_col = 7
 
         self.set_light(x, y, light_col, note)
-        self.mark_lights[y][x] = False
+        self.mark_lights[y, x] = False
 
     def reset_launchpad_light(self, x, y, launchpad=None):
         """Reset the launchpad light at x, y"""
@@ -242,11 +242,11 @@ class Core:
 
     def set_mark_light(self, x, y, state=True, launchpad=None):
         """Set launchpad light to touched color"""
-        self.mark_lights[y][x] = state
+        self.mark_lights[y, x] = state
         for lp in ([launchpad] if launchpad else self.launchpads):
             lp_col = self.options.mark_color
             if state:
-                lp.out.LedCtrlXY(x, y, lp_col[0], lp_col[1], lp_col[2])
+                lp.frame.set(x, y, lp_col[0], lp_col[1], lp_col[2])
 
     # `color` below is an scale index (0, 1, 2...)
     def set_launchpad_light(self, x, y, color, launchpad=None):
@@ -258,7 +258,7 @@ class Core:
                 col = glm.ivec3(63,63,63)
         else:
             if color != -1: # not mark
-                if color is not None and self.scale_notes[color] != '.':
+                if color is not None and self.in_scale(color):
                     if self.options.launchpad_colors:
                         col = self.options.launchpad_colors[color]
                     else:
@@ -276,18 +276,20 @@ class Core:
 
         for lp in ([launchpad] if launchpad else self.launchpads):
             if self.options.launchpad_colors:
-                lp.out.LedCtrlXYByCode(x, 8-y, col)
+                lp.frame.set_code(x, 8-y, col)
             else:
-                lp.out.LedCtrlXY(x, 8-y, col[0], col[1], col[2])
+                lp.frame.set(x, 8-y, col[0], col[1], col[2])
 
     def setup_lights(self):
         """Set all lights"""
+        notes = self.note_grid().tolist()
+        marks = self.mark_lights.tolist()
         for y in range(self.board_h):
             for x in range(self.board_w):
-                if self.mark_lights[y][x]:
+                if marks[y][x]:
                     self.set_mark_light(x, y, True)
                 else:
-                    self.reset_light(x, y)
+                    self.reset_light(x, y, note=notes[y][x])
 
     def reset_lights(self):
         """Reset all lights to device defaults"""
@@ -316,9 +318,9 @@ class Core:
         return r
 
     def get_note_index(self, x, y, transpose=True):
-        """Get the note index (0-11) for a given x, y"""
-        y += self.flipped
-        x += self.position.x
+        """Get the note index (0-11) for a given x, y (or numpy arrays of them)"""
+        y = y + self.flipped
+        x = x + self.position.x
         column_offset = self.options.column_offset
         row_offset = self.options.row_offset
         y = self.board_h - y - 1
@@ -333,6 +335,10 @@ class Core:
         # else:
         #     return ((x - ofs) * step + 7 - tr) % len(NOTES)
 
+    def note_grid(self, transpose=False):
+        """Note index of every cell on the board, as a board_h x board_w array"""
+        return self.get_note_index(np.arange(self.board_w), np.arange(self.board_h)[:, None], transpose=transpose)
+
     def get_note(self, x, y, transpose=True):
         """Get note name for x, y"""
         return NOTES[self.get_note_index(x, y, transpose=transpose)]
@@ -364,7 +370,7 @@ class Core:
         #     except IndexError:
         #         light_col = 7
 
-        if self.scale_notes[note] != '.':
+        if self.in_scale(note):
             if self.channel_from_split(x, self.board_h - y - 1):
                 return self.options.split_colors[note]
             else:
@@ -398,11 +404,6 @@ class Core:
         if y < 0:
             return
 
-        if hover:
-            btn = pygame.mouse.get_pressed(3)[0]
-            if not btn:
-                return
-
         # if we're not intending to hold the note, we release the previous primary note
         if not hover:
             if self.mouse_held():
@@ -485,16 +486,15 @@ class Core:
         # else:
         if self.tonic % 2:
             y -= 1
-        octave = int(x + 4 + self.position.x + y * 2.5) // 6
-        return octave
+        octave = x + 4 + self.position.x + y * 2.5
+        if isinstance(octave, np.ndarray):
+            # for arrays of x, y (see Layout.build_cells)
+            return np.trunc(octave).astype(int) // 6
+        return int(octave) // 6
 
     def held_note_count(self):
         """How many held notes?"""
-        count = 0
-        for n in self.notes:
-            if n is not None and n.location:
-                count += 1
-        return count
+        return self.notes.count
 
     def init_board(self):
         """Initialize board"""
@@ -521,13 +521,11 @@ class Core:
         #         line.append(octave)
             # print(line)
 
-        self.notes = [None] * 16  # polyphony
-        for i, note in enumerate(self.notes):
-            self.notes[i] = Note()
+        self.notes = NoteState(16)  # polyphony
 
         # These are midi numbers, not indices, so they only have to be 127
         self.left_chord_notes = [False] * 127
-        self.chord_notes = [False] * 127
+        self.chord_notes = 0 # bitmask of midi notes held (for the chord analyzer)
         self.note_set = set()
 
     def midi_write(self, dev, msg, ts=0):
@@ -536,8 +534,7 @@ class Core:
         #     for d in dev:
         #         self.midi_write(d, msg, ts)
         #     return
-        if dev:
-            dev.send_raw(*msg)
+        self.output.write(dev, msg)
 
     def next_free_note(self):
         """Get the next note available in the polyphony array"""
@@ -563,98 +560,16 @@ class Core:
         elif not self.is_mpe():
             data[0] = (d0 & 0xF0) + (self.options.one_channel-1)
         
-        row = None
-        col = None
+        midinote, visual_midinote, x, y, side = self.layout.get(ch, width)[data[1]]
+        midinote += 12 * octave + transpose
+        row = y
 
-        within_hardware_split = False
-        if width is None:
-            if self.options.hardware_split:
-                # if self.board_w == 25: # 200
-                left_width = self.split_point
-                right_width = self.board_w - left_width
-                # print('hardware splits', left_width, right_width)
-                if ch >= 8:
-                    width = right_width
-                    within_hardware_split = True
-                else:
-                    width = left_width
-                # else:
-                #     left_width = 8
-                #     right_width = 8
-                #     if ch >= 8:
-                #         width = right_width
-                #         within_hardware_split = True
-                #     else:
-                #         width = left_width
-            else:
-                width = self.board_w
-            # else: # 128
-                # width = 8 if self.options.hardware_split else 16
-        
         if self.options.debug:
             print("MIDI:", data)
             print("Message:", msg)
             print("Channel:", ch)
             print("---")
 
-        row = data[1] // width
-        col = data[1] % width
-        col_full = col + (left_width if within_hardware_split else 0)
-        # midinote = self.xy_to_midi(col, row)
-        # y = self.board_h - row - 1
-        column_offset = self.options.column_offset
-        row_offset = self.options.row_offset
-        y = row
-        x = col
-        midinote = row_offset * y + column_offset * x
-        midinote += 32
-        if self.flipped:
-            midinote += 7
-        if within_hardware_split:
-            midinote += self.options.column_offset * left_width
-        visual_midinote = midinote
-        midinote += 12 * (octave + self.octave)
-        midinote += self.options.column_offset * self.position.x
-        midinote += transpose + self.tonic
-
-        # print(x, y, midinote)
-        # return
-
-        # # if mpe:
-        
-        # col_full = col + (left_width if within_hardware_split else 0)
-        # if within_hardware_split:
-        #     data[1] += left_width
-        # data[1] = col + 30 + 2.5 * row
-        # data[1] *= 2
-        # data[1] = int(data[1])
-        # if within_hardware_split:
-        #     data[1] += left_width * 2
-        #     # print(data[1])
-        # # else:
-        # #     row = ch % 8
-        # #     col = ch // 8
-        # #     data[1] *= 2
-        # #     try:
-        # #         data[1] -= row * 5
-        # #     except IndexError:
-        # #         pass
-        
-        # data[1] += (self.octave + self.octave_base + octave) * 12
-        # data[1] += transpose
-        # data[1] += BASE_OFFSET
-        # midinote = data[1] - 24 + self.position.x * 2
-        col_full = x + (left_width if within_hardware_split else 0)
-        
-        # figure out if note is on left or right side
-        side = self.channel_from_split(col_full, row, force=True)
-
-        # if the note is on the right side, we shift by the current octave split
-        if side == 1:
-            octave_split = self.options.octave_split
-            if octave_split != 0:
-                midinote += 12 * octave_split
-
         # if we have a split set up, set the side found above to split_chan,
         #   otherwise everything should be in the same region
         if self.is_split():
@@ -674,7 +589,9 @@ class Core:
         vel = data[2] / 127
         if curve and not aftertouch:
             # apply curve
-            if self.has_velocity_settings():
+            if 0 <= data[2] < 128:
+                vel, data[2] = self.velocity_map[data[2]]
+            elif self.has_velocity_settings():
                 vel = self.velocity_curve(data[2] / 127)
                 data[2] = clamp(
                     self.options.min_velocity,
@@ -688,24 +605,18 @@ class Core:
             pass
         else:
             # if self.options.mpe:
-            note = self.notes[ch]
+            self.notes.on(ch, x, y, vel, midinote, split_chan)
             # else:
             #     note = self.next_free_note()
-            if note:
-                if note.location is None:
-                    note.location = ivec2(0)
-                note.location.x = x
-                note.location.y = y
-                note.pressure = vel
-                note.midinote = midinote
-                note.split = split_chan
 
             # if self.options.jazz:
             #     if side == 0:
             #         self.left_chord_notes[data[1]] = True
                     # self.dirty_left_chord = True
         
-            self.chord_notes[midinote] = True
+            if not 0 <= midinote < 128:
+                return # out of midi range
+            self.chord_notes |= 1 << midinote
             self.note_set.add(midinote)
             self.dirty_chord = True
 
@@ -731,108 +642,10 @@ class Core:
             data[0] = (d0 & 0xF0) + (force_channel-1)
         elif not self.is_mpe():
             data[0] = (d0 & 0xF0) + (self.options.one_channel-1)
-        row = None
-        col = None
 
-        # if width is None:
-        #     if self.board_w == 25: # 200
-        #         width = 11 if self.options.hardware_split else 25
-        #     else: # 128
-        #         width = 8 if self.options.hardware_split else 16
-        # if width is None:
-        #     left_width = 5
-        #     right_width = 11
-        #     width = left_width if ch < 8 else right_width
-        
-        within_hardware_split = False
-        if width is None:
-            if self.options.hardware_split:
-                # if self.board_w == 25: # 200
-                left_width = self.split_point
-                right_width = self.board_w - left_width
-                # print('hardware splits', left_width, right_width)
-                if ch >= 8:
-                    width = right_width
-                    within_hardware_split = True
-                else:
-                    width = left_width
-                # else:
-                #     left_width = 8
-                #     right_width = 8
-                #     if ch >= 8:
-                #         width = right_width
-                #         within_hardware_split = True
-                #     else:
-                #         width = left_width
-            else:
-                width = self.board_w
-        
-        # # if not mpe:
-        # #     row = ch % 8
-        # #     col = ch // 8
-        # # if mpe:
-        #     # row and col within the current split
-        #     # row = data[1] // width
-        #     # col = data[1] % width
-        #     # print(data[1])
-        #     # # data[1] = data[1] % width + 30 + 2.5 * row
-        #     # data[1] *= 2
-        #     # data[1] = int(data[1])
-        #     # if self.options.hardware_split and ch >= 8:
-        #     #     data[1] += self.board_w
-        # row = data[1] // width
-        # col = data[1] % width
-        # col_full = col + (left_width if within_hardware_split else 0)
-        # if within_hardware_split:
-        #     data[1] += left_width
-        # data[1] = col + 30 + 2.5 * row
-        # data[1] *= 2
-        # data[1] = int(data[1])
-        # if within_hardware_split:
-        #     data[1] += left_width * 2
-        # # else:
-        # #     data[1] *= 2
-        # #     try:
-        # #         data[1] -= row * 5
-        # #     except IndexError:
-        # #         pass
-        
-        # data[1] += (self.octave + self.octave_base + octave) * 12
-        # data[1] += BASE_OFFSET
-        # data[1] += transpose
-        # midinote = data[1] - 24 + self.position.x * 2
-
-        row = data[1] // width
-        col = data[1] % width
-        # print('xy', col, row)
-        # col_full = col + (left_width if within_hardware_split else 0)
-        # midinote = self.xy_to_midi(col, row)
-        # y = self.board_h - row - 1
-        column_offset = self.options.column_offset
-        row_offset = self.options.row_offset
-        y = row
-        x = col
-        midinote = row_offset * y + column_offset * x
-        midinote += 32
-        if self.flipped:
-            midinote += 7
-        if within_hardware_split:
-            midinote += self.options.column_offset * left_width
-        visual_midinote = midinote
-        midinote += 12 * (octave + self.octave)
-        midinote += self.options.column_offset * self.position.x
-        midinote += transpose + self.tonic
-        # print('off', x, y, midinote)
-
-        col_full = x + (left_width if within_hardware_split else 0)
-        side = self.channel_from_split(col_full, y, force=True)
-
-        # if the note is on the right side, we shift by the current octave split
-        if side == 1:
-            octave_split = self.options.octave_split
-            if octave_split != 0:
-                midinote += 12 * octave_split
-        
+        midinote, visual_midinote, x, y, side = self.layout.get(ch, width)[data[1]]
+        midinote += 12 * octave + transpose
+
         if self.is_split():
             split_chan = side
         else:
@@ -841,6 +654,7 @@ class Core:
         data[1] = midinote
         
         self.mark(visual_midinote - 24, 0, only_row=y)
+        self.notes.off(ch)
         # data[1] += self.out_octave * 12 + self.position.x * 2
         # if self.flipped:
         #     data[1] += 7
@@ -850,7 +664,9 @@ class Core:
         #         self.left_chord_notes[data[1]] = False
                 # self.dirty_left_chord = True
         
-        self.chord_notes[data[1]] = False
+        if not 0 <= data[1] < 128:
+            return # out of midi range
+        self.chord_notes &= ~(1 << data[1])
         try:
             self.note_set.remove(data[1])
         except KeyError:
@@ -922,12 +738,27 @@ class Core:
         
     #     return col, row
     
-    def cb_midi_in(self, data, timestamp, force_channel=None):
+    def cb_midi_in(self, data, timestamp, force_channel=None, limit=True):
         """LinnStrument MIDI Callback"""
         # d4 = None
         # if len(data)==4:
         #     d4 = data[3]
         #     data = data[:3]
+        if limit and self.limiter:
+            msg = data[0] >> 4
+            if msg == 9 or msg == 8:
+                # send held expression before the note changes
+                for args in self.limiter.take_channel(data[0] & 0x0F):
+                    self.cb_midi_in(*args, limit=False)
+            elif not self.limiter.filter(data, timestamp, force_channel):
+                return
+        if force_channel:
+            self.midi_in_message(data, timestamp, force_channel)
+        else:
+            self.midi_dispatch[data[0]](data, timestamp)
+
+    def midi_in_message(self, data, timestamp, force_channel=None):
+        """Handle any LinnStrument message, in any mode (see compile_midi_dispatch())"""
         d0 = data[0]
         # print(data)
         ch = d0 & 0x0F
@@ -959,7 +790,7 @@ class Core:
             if msg == 14:
                 if self.is_split():
                     # experimental: ignore pitch bend for a certain split
-                    split_chan = self.notes[ch].split
+                    split_chan = self.notes.split[ch]
                     if self.options.stable_left and split_chan == 0:
                         data[1] = 0
                         data[2] = 64
@@ -992,43 +823,18 @@ class Core:
             
             # This block has to happen before the below block rewrites y axis to pitch bend
             if self.options.y_bend:
-                pb_range = self.options.bend_range * 2
-                bend_threshold = 1 # units
                 if msg == 14:
                     # if y-bending enabled, rewrite pitch bend based on y bend value
-                    note = self.notes[ch]
-                    # if note.y_bend > EPSILON:
-                    val = decompose_pitch_bend((data[1], data[2]))
-                    note.bend = val
-                    val += note.y_bend / pb_range
-                    data[1], data[2] = compose_pitch_bend(val)
+                    self.y_bend_pitch(ch, data)
 
                 if msg == 11 and data[1] == 74:
-                    # print(data[2])
-                    if data[2] > 127 - bend_threshold:
-                        bend = (data[2] - (127 - bend_threshold)) / bend_threshold
-                    elif data[2] <= bend_threshold:
-                        # bend down?
-                        # bend = -(bend_threshold - data[2]) / bend_threshold
-                        bend = None
-                    else:
-                        bend = None
-                    note = self.notes[ch]
+                    value = data[2]
                     data = [0xe0 | ch,0,0]
                     if force_channel:
                         data[0] = 0xe0 | (force_channel-1)
                     elif not self.is_mpe():
                         data[0] = 0xe0 | (self.options.one_channel-1)
-                    if bend is not None:
-                        if bend > 0.9:
-                            bend = 1.0
-                        elif bend < -0.9:
-                            bend = -1.0
-                        note.y_bend = bend
-                        data[1], data[2] = compose_pitch_bend(note.bend + note.y_bend / pb_range)
-                    else:
-                        note.y_bend = 0.0
-                        data[1], data[2] = compose_pitch_bend(note.bend + note.y_bend / pb_range)
+                    data[1], data[2] = self.y_bend_timbre(ch, value)
 
 
             if skip:
@@ -1041,10 +847,6 @@ class Core:
                     self.midi_write(self.midi_out, data, timestamp)
             elif self.is_split(): # everything else (if split)...
                 # print('ch', ch)
-                try:
-                    note = self.notes[ch]
-                except:
-                    note = None
                 if ch == 0:
                     self.midi_write(self.midi_out, data, timestamp)
                     self.midi_write(self.split_out, data, timestamp)
@@ -1054,9 +856,9 @@ class Core:
                 #         self.midi_write(self.split_out, data, timestamp)
                 #     else:
                 #         self.midi_write(self.midi_out, data, timestamp)
-                elif note and note.location is not None:
-                    col = note.location.x
-                    row = note.location.y
+                elif self.notes.x[ch] >= 0: # a note was played on the channel
+                    col = self.notes.x[ch]
+                    row = self.notes.y[ch]
                     split_chan = self.channel_from_split(col, row)
                     if split_chan:
                         self.midi_write(self.split_out, data, timestamp)
@@ -1068,6 +870,158 @@ class Core:
             else:  # everything else (if not split)...
                 self.midi_write(self.midi_out, data, timestamp)
 
+    def y_bend_pitch(self, ch, data):
+        """Add the channel's y bend to pitch bend message `data`"""
+        notes = self.notes
+        value = (data[2] << 7) + data[1]
+        notes.bend_value[ch] = value
+        notes.bend[ch] = (value - 8192) / 8192.0 # decompose_pitch_bend()
+        # if notes.y_bend[ch] > EPSILON:
+        data[1], data[2] = self.bend_table(notes.y_bend[ch])[value]
+
+    def y_bend_timbre(self, ch, value):
+        """Set the channel's y bend from CC74 `value`, returns its pitch bend bytes"""
+        notes = self.notes
+        bend_threshold = 1 # units
+        # print(value)
+        if value > 127 - bend_threshold:
+            bend = (value - (127 - bend_threshold)) / bend_threshold
+            if bend > 0.9:
+                bend = 1.0
+            elif bend < -0.9:
+                bend = -1.0
+        # elif value <= bend_threshold:
+        #     # bend down?
+        #     bend = -(bend_threshold - value) / bend_threshold
+        else:
+            bend = 0.0
+        notes.y_bend[ch] = bend
+        return self.bend_table(bend)[notes.bend_value[ch]]
+
+    def bend_table(self, y_bend):
+        """Pitch bend bytes for every 14-bit bend with `y_bend` added"""
+        table = self.bend_tables.get(y_bend)
+        if table is None:
+            table = self.bend_tables[y_bend] = pitch_bend_table(y_bend / (self.options.bend_range * 2))
+        return table
+
+    def compile_midi_dispatch(self):
+        """Build the handler for each status byte of LinnStrument input
+
+        Notes, pressure, pitch bend and CCs get handlers made for the current
+        split, MPE and y_bend modes, so the options aren't checked again for
+        every message.  Anything else goes to midi_in_message().  Has to be
+        called again when those modes change, and when midi_out or split_out
+        are changed: the handlers keep the ports they were made with, so
+        they don't look them up for every message.  The ports are only set
+        in __init__, before the first call.
+        """
+        table = [self.midi_in_message] * 256
+        split = self.is_split()
+        y_bend = self.options.y_bend
+        if y_bend:
+            # made now instead of on the first bend (y_bend_timbre() only uses these)
+            self.bend_table(0.0)
+            self.bend_table(1.0)
+        for ch in range(16):
+            table[0x90 | ch] = self.midi_note_on
+            table[0x80 | ch] = self.note_off
+            if not split:
+                table[0xA0 | ch] = self.forward_handler(0xA0, ch)
+                table[0xD0 | ch] = self.forward_handler(0xD0, ch)
+                if y_bend:
+                    table[0xE0 | ch] = self.y_bend_pitch_handler(ch)
+                    table[0xB0 | ch] = self.y_bend_timbre_handler(ch)
+                else:
+                    table[0xE0 | ch] = self.forward_handler(0xE0, ch)
+                    table[0xB0 | ch] = self.forward_handler(0xB0, ch)
+            elif not y_bend:
+                table[0xA0 | ch] = self.split_handler(0xA0, ch)
+                table[0xD0 | ch] = self.split_handler(0xD0, ch)
+                if not self.options.stable_left and not self.options.stable_right:
+                    table[0xE0 | ch] = self.split_handler(0xE0, ch)
+        self.midi_dispatch = table
+
+    def midi_note_on(self, data, timestamp):
+        if data[2] == 0: # 0 vel
+            self.note_off(data, timestamp)
+        else:
+            self.note_on(data, timestamp)
+
+    def out_status(self, kind, ch):
+        """Status byte sent for message `kind` from channel `ch`, in the current MPE mode"""
+        if self.is_mpe():
+            return kind | ch
+        return kind | (self.options.one_channel-1)
+
+    def forward_handler(self, kind, ch):
+        """Handler sending messages to the output (when not split)"""
+        write = self.output.write
+        out = self.midi_out
+        status = self.out_status(kind, ch)
+        if status == kind | ch:
+            def forward(data, timestamp):
+                write(out, data)
+        else:
+            def forward(data, timestamp):
+                data[0] = status
+                write(out, data)
+        return forward
+
+    def split_handler(self, kind, ch):
+        """Handler sending messages to the side of the split the channel's note is on"""
+        write = self.output.write
+        out = self.midi_out
+        split_out = self.split_out
+        status = self.out_status(kind, ch)
+        notes = self.notes
+        channel_from_split = self.channel_from_split
+
+        def split(data, timestamp):
+            data[0] = status
+            if ch == 0:
+                write(out, data)
+                write(split_out, data)
+            elif notes.x[ch] >= 0: # a note was played on the channel
+                if channel_from_split(notes.x[ch], notes.y[ch]):
+                    write(split_out, data)
+                else:
+                    write(out, data)
+            else:
+                write(out, data)
+                write(split_out, data)
+        return split
+
+    def y_bend_pitch_handler(self, ch):
+        """Handler adding the y bend to pitch bend (when not split)"""
+        write = self.output.write
+        out = self.midi_out
+        status = self.out_status(0xE0, ch)
+        y_bend_pitch = self.y_bend_pitch
+
+        def pitch(data, timestamp):
+            data[0] = status
+            y_bend_pitch(ch, data)
+            write(out, data)
+        return pitch
+
+    def y_bend_timbre_handler(self, ch):
+        """Handler turning CC74 into y bend (when not split), other CCs are sent"""
+        write = self.output.write
+        out = self.midi_out
+        status = self.out_status(0xB0, ch)
+        bend_status = self.out_status(0xE0, ch)
+        y_bend_timbre = self.y_bend_timbre
+
+        def timbre(data, timestamp):
+            if data[1] == 74:
+                lsb, msb = y_bend_timbre(ch, data[2])
+                write(out, [bend_status, lsb, msb])
+            else:
+                data[0] = status
+                write(out, data)
+        return timbre
+
     def cb_visualizer(self, data, timestamp):
         """Visualizer MIDI Callback"""
         # print(msg, timestamp)
@@ -1097,7 +1051,7 @@ class Core:
                 val2 = 1.0 - data[2] / 127
                 low = self.options.velocity_curve_low
                 high = self.options.velocity_curve_high
-                self.velocity_curve_ = low + val2 * (high - low)
+                self.set_velocity_curve(low + val2 * (high - low))
 
     def is_macro_button(self, x, y):
         """Is pad at x, y bound to a macro?"""
@@ -1116,48 +1070,47 @@ class Core:
             self.articulation.set(val)
         return True
 
-    # uses button state events (mk3 pro)
-    def cb_launchpad_in(self, lp, event, timestamp=0):
-        """Launchpad MIDI Callback"""
-        if (lp.mode == "pro" or lp.mode == "promk3") and event[0] >= 255:
-        # if event[0] >= 255: # uncomment this for testing pro behavior on launchpad X
-            # I'm testing the mk3 method on an lpx, so I'll check this here
-            vel = event[2] if lp.mode == 'lpx' else event[1]
+    def cb_launchpad_in(self, lp, msg, timestamp=0):
+        """Launchpad MIDI Callback, for the messages of the launchpad's input port"""
+        status = msg[0]
+        if status == 208 and lp.mode != 'lpx': # channel pressure (pro, mk3 pro)
+            vel = msg[1]
             for note in self.note_set:
                 self.midi_write(self.midi_out, [160, note, vel], timestamp)
                 self.articulation.pressure(vel / 127)
-        elif lp.mode == 'lpx' and event[0] >= 255: # pressure
-            x = event[0] - 255
-            y = 8 - (event[1] - 255)
-            vel = event[2]
+            return
+        if status != 144 and status != 176 and (status != 160 or lp.mode != 'lpx'):
+            return
+        # pads and buttons in programmer mode are numbered 11-99, from the
+        #  bottom left: x, y like launchpad_py's "classic" layout, y flipped
+        x = (msg[1] - 1) % 10
+        y = 8 - (99 - msg[1]) // 10
+        if status == 160: # polyphonic pressure (launchpad X)
+            vel = msg[2]
             note = y * 8 + x
             note += 12
             if not self.is_macro_button(x,  8 - y - 1):
-                self.note_on([160, note, event[2]], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
+                self.note_on([160, note, vel], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
                 self.articulation.pressure(vel / 127)
             else:
                 self.macro(x, 8 - y - 1, vel / 127)
-        elif event[2] == 0: # note off
-            x = event[0]
-            y = 8 - event[1]
+        elif msg[2] == 0: # note off
             if 0 <= x < 8 and 0 <= y < 8:
                 self.reset_launchpad_light(x, y, launchpad=lp)
                 if not self.is_macro_button(x, 8 - y - 1):
                     note = y * 8 + x
-                    self.note_off([128, note, event[2]], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
+                    self.note_off([128, note, msg[2]], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
                 else:
                     self.macro(x, 8 - y - 1, False)
             else:
                 # Launchpad X buttons
                 lp.button(x, 8 - y - 1)
         else: # note on
-            x = event[0]
-            y = 8 - event[1]
             if 0 <= x < 8 and 0 <= y < 8:
                 self.set_launchpad_light(x, y, -1, launchpad=lp)
                 if not self.is_macro_button(x, 8 - y - 1):
                     note = y * 8 + x
-                    self.note_on([144, note, event[2]], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
+                    self.note_on([144, note, msg[2]], timestamp, width=8, transpose=lp.transpose, octave=lp.get_octave(), force_channel=self.options.launchpad_channel)
                 else:
                     self.macro(x, 8 - y - 1, True)
 
@@ -1244,13 +1197,21 @@ class Core:
 
     def sig(self, signal, frame):
         """Signal handler"""
-        self.quit()
+        # this interrupts the main thread anywhere (even while it's queueing
+        # an engine command), so only set the flag, the loop notices it
+        self.done = True
+
+    def sig_stats(self, signal, frame):
+        """Signal handler to print stats (SIGUSR1)"""
+        self.print_stats()
 
     def __init__(self):
         Core.CORE = self
         
         signal.signal(signal.SIGINT, self.sig)
         signal.signal(signal.SIGTERM, self.sig)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.sig_stats)
          
         self.cfg = ConfigParser(allow_no_value=True)
         self.cfg.read("settings.ini")
@@ -1258,37 +1219,34 @@ class Core:
             opts = self.cfg["general"]
         except KeyError:
             opts = None
-
-        with open("scales.yaml", 'r') as stream:
+        STARTUP.mark("settings.ini")
+
+        # scales, colors and layout tables from the last run, if nothing changed
+        self.cache = None
+        cached = None
+        if get_option(opts, 'cache', DEFAULT_OPTIONS.cache) and "--no-cache" not in sys.argv:
+            self.cache = StartupCache(CACHE_SOURCES)
+            cached = self.cache.load()
+            STARTUP.mark("startup cache" if cached else "startup cache (out of date)")
+
+        if cached:
+            self.scales = ScaleDB.restore(cached["scales"])
+            self.scale_db = self.scales.db
+        else:
             try:
-                self.scale_db = yaml.safe_load(stream)
-            except yaml.YAMLError as exc:
-                error('Cannot load scales.yaml')
-
-        dups = {}
-        scale_count = 0
-        for scale in self.scale_db:
-            notes = scale['notes']
-            count = notes.count('x')
-            dupes = (scale.get('duplicates') is True) or False
-            if not dupes:
-                scale_count += count
-                for i in range(count):
-                    mode_notes = self.rotate_mode(notes, i)
-                    try:
-                        name = scale['name'] + ' ' + scale['modes'][i]
-                    except:
-                        name = scale['name'] + ' Mode ' + str(i+1)
-                    if mode_notes in dups:
-                        print('Duplicate scale: ', dups[mode_notes], ' and ', name)
-                        break
-                    else:
-                        # print(mode_notes, name)
-                        dups[mode_notes] = name
-            else:
-                scale_count += 1
+                import yaml
+            except ImportError:
+                error("The project dependencies have changed! Run the requirements setup command again!")
+            with open("scales.yaml", 'r') as stream:
+                try:
+                    self.scale_db = yaml.safe_load(stream)
+                except yaml.YAMLError as exc:
+                    error('Cannot load scales.yaml')
 
-        # print('Scale Count:', scale_count)
+            # compile scales to bit masks (also checks for duplicates)
+            self.scales = ScaleDB(self.scale_db)
+            # print('Scale Count:', self.scales.count)
+            STARTUP.mark("scales")
 
         self.options = Settings()
 
@@ -1296,18 +1254,24 @@ class Core:
         self.options.row_offset = get_option(opts, "row_offset", DEFAULT_OPTIONS.row_offset)
         self.options.base_offset = get_option(opts, "base_offset", DEFAULT_OPTIONS.base_offset)
 
-        self.options.colors = get_option(opts, "colors", DEFAULT_OPTIONS.colors)
-        self.options.colors = list(self.options.colors.split(","))
-        self.options.colors = list(map(lambda x: glm.ivec3(get_color(x)), self.options.colors))
+        if cached:
+            self.options.colors = [glm.ivec3(c) for c in cached["colors"]]
+        else:
+            self.options.colors = get_option(opts, "colors", DEFAULT_OPTIONS.colors)
+            self.options.colors = list(self.options.colors.split(","))
+            self.options.colors = list(map(lambda x: glm.ivec3(get_color(x)), self.options.colors))
 
         self.options.launchpad_colors = get_option(opts, "launchpad_colors", DEFAULT_OPTIONS.launchpad_colors)
         if self.options.launchpad_colors:
             self.options.launchpad_colors = list(self.options.launchpad_colors.split(","))
             self.options.launchpad_colors = list(int(x) for x in self.options.launchpad_colors)
 
-        self.options.split_colors = get_option(opts, "split_colors", DEFAULT_OPTIONS.split_colors)
-        self.options.split_colors = list(self.options.split_colors.split(","))
-        self.options.split_colors = list(map(lambda x: glm.ivec3(get_color(x)), self.options.split_colors))
+        if cached:
+            self.options.split_colors = [glm.ivec3(c) for c in cached["split_colors"]]
+        else:
+            self.options.split_colors = get_option(opts, "split_colors", DEFAULT_OPTIONS.split_colors)
+            self.options.split_colors = list(self.options.split_colors.split(","))
+            self.options.split_colors = list(map(lambda x: glm.ivec3(get_color(x)), self.options.split_colors))
 
         # LIGHT = ivec3(127)
         self.options.lights = get_option(opts, "lights", DEFAULT_OPTIONS.lights)
@@ -1368,10 +1332,13 @@ class Core:
         self.options.mark_light = get_option(
             opts, "mark_light", DEFAULT_OPTIONS.mark_light
         )
-        self.options.mark_color = get_option(
-            opts, "mark_color", DEFAULT_OPTIONS.mark_color
-        )
-        self.options.mark_color = glm.ivec3(get_color(self.options.mark_color))
+        if cached:
+            self.options.mark_color = glm.ivec3(cached["mark_color"])
+        else:
+            self.options.mark_color = get_option(
+                opts, "mark_color", DEFAULT_OPTIONS.mark_color
+            )
+            self.options.mark_color = glm.ivec3(get_color(self.options.mark_color))
 
         self.options.min_velocity = get_option(
             opts, "min_velocity", DEFAULT_OPTIONS.min_velocity
@@ -1393,6 +1360,7 @@ class Core:
         #     opts, "no_overlap", DEFAULT_OPTIONS.mpe
         # )
         self.options.vibrato = get_option(opts, "vibrato", DEFAULT_OPTIONS.vibrato)
+        self.options.vibrato_rate = get_option(opts, "vibrato_rate", DEFAULT_OPTIONS.vibrato_rate)
         self.options.midi_out = get_option(opts, "midi_out", DEFAULT_OPTIONS.midi_out)
         self.options.split_out = get_option(
             opts, "split_out", DEFAULT_OPTIONS.split_out
@@ -1441,31 +1409,22 @@ class Core:
         self.options.launchpad_channel = get_option(opts, 'launchpad_channel', 1)
         self.options.experimental = get_option(opts, 'experimental', False)
         self.options.debug = get_option(opts, 'debug', False)
+        self.options.stats = get_option(opts, 'stats', DEFAULT_OPTIONS.stats) or "--stats" in sys.argv
+        self.options.latency = get_option(opts, 'latency', DEFAULT_OPTIONS.latency) or "--latency" in sys.argv
+        self.options.profile_csv = get_arg("--profile-csv", get_option(opts, 'profile_csv', DEFAULT_OPTIONS.profile_csv))
+        self.options.profile = get_option(opts, 'profile', DEFAULT_OPTIONS.profile) or "--profile" in sys.argv or bool(self.options.profile_csv)
+        self.options.expression_limit = get_option(opts, 'expression_limit', DEFAULT_OPTIONS.expression_limit)
+        self.options.expression_interval = get_option(opts, 'expression_interval', DEFAULT_OPTIONS.expression_interval)
+        self.options.expression_threshold = get_option(opts, 'expression_threshold', DEFAULT_OPTIONS.expression_threshold)
+        self.options.headless = get_option(opts, 'headless', DEFAULT_OPTIONS.headless) or "--headless" in sys.argv
+        self.options.record = get_arg("--record", get_option(opts, 'record', DEFAULT_OPTIONS.record))
+        self.options.replay = get_arg("--replay", get_option(opts, 'replay', DEFAULT_OPTIONS.replay))
+        self.options.replay_speed = float(get_arg("--replay-speed", get_option(opts, 'replay_speed', DEFAULT_OPTIONS.replay_speed)))
+        self.options.capture = get_arg("--capture", get_option(opts, 'capture', DEFAULT_OPTIONS.capture))
         self.options.stabilizer = get_option(opts, 'stabilizer', False)
         self.options.stable_left = get_option(opts, 'stable_left', False)
         self.options.stable_right = get_option(opts, 'stable_right', False)
-
-        # simulator keys
-        self.keys = {}
-        i = 0
-        for key in "1234567890-=":
-            self.keys[ord(key)] = 62 + i
-            i += 2
-        self.keys[pygame.K_BACKSPACE] = 62 + i
-        i = 0
-        for key in "qwertyuiop[]\\":
-            self.keys[ord(key)] = 57 + i
-            i += 2
-        i = 0
-        for key in "asdfghjkl;'":
-            self.keys[ord(key)] = 52 + i
-            i += 2
-        self.keys[pygame.K_RETURN] = 52 + i
-        i = 0
-        for key in "zxcvbnm,./":
-            self.keys[ord(key)] = 47 + i
-            i += 2
-        self.keys[pygame.K_RSHIFT] = 47 + i
+        STARTUP.mark("options and colors")
 
         # self.panel = CHORD_ANALYZER
         self.panel_sz = 32
@@ -1497,29 +1456,46 @@ class Core:
         self.flipped = False  # vertically shift +1
         self.config_save_timer = 1.0
 
-        self.velocity_curve_ = self.options.velocity_curve
+        self.velocity_maps = {} # velocity curve -> velocity map
+        self.set_velocity_curve(self.options.velocity_curve)
+        self.bend_tables = {} # y bend -> pitch bend table
 
         self.mouse_mark = ivec2(0)
         self.mouse_midi = -1
         self.mouse_midi_vel = None
 
         self.last_note = None # ivec2
-        self.chord = ''
 
         self.scale_index = 0
         self.mode_index = 0
         self.scale_name = self.scale_db[self.scale_index]['name']
         self.mode_name = self.scale_db[self.scale_index]['modes'][self.mode_index]
-        self.scale_notes = self.scale_db[self.scale_index]['notes']
+        self.scale_mask = self.scales.modes[self.scale_index][self.mode_index]
         self.scale_root = 0
         self.tonic = 0
         
         self.program = 0
         self.bank = 0
 
+        self.layout = Layout(self)
+        if cached:
+            self.layout.load(cached["layout"])
+        else:
+            self.layout.build()
+            if self.cache:
+                # plain data only (see StartupCache)
+                self.cache.save({
+                    "scales": self.scales.state(),
+                    "colors": [tuple(c) for c in self.options.colors],
+                    "split_colors": [tuple(c) for c in self.options.split_colors],
+                    "mark_color": tuple(self.options.mark_color),
+                    "layout": self.layout.state(),
+                })
+
         self.articulation = Articulation(self)
 
         self.init_board()
+        STARTUP.mark("layout")
 
         # load midi file from command line (playiung it is not yet impl)
         # self.midi_in_fn = None
@@ -1529,150 +1505,37 @@ class Core:
         #     if self.midi_in_fn.to_lower().endswith('.mid'):
         #         self.midifile = mido.MidiFile(midi_fn)
 
-        # self.root = Tk()
-        # self.menubar = Menu(self.root)
-        # self.filemenu = Menu(self.menubar, tearoff=0)
-        # self.filemenu.add_command(label="Open", command=nothing)
-        # self.root.config(menu=self.menubar)
-        # self.embed = Frame(self.root, width=self.screen_w, height=self.screen_h)
-        # self.embed.pack()
-        # os.environ['SDL_WINDOWID'] = str(self.embed.winfo_id())
-        # self.root.update()
-        # self.menubar.add_cascade(label="File", menu=self.filemenu)
-        # self.root.protocol("WM_DELETE_WINDOW", self.quit)
-        pygame.init()
-        pygame.display.set_caption(TITLE)
-        self.icon = pygame.image.load('icon.png')
-        pygame.display.set_icon(self.icon)
-        # if FOCUS:
-        #     pygame.mouse.set_visible(0)
-        #     pygame.event.set_grab(True)
-        if self.options.lite:
-            self.screen = Screen(
-                self, pygame.display.set_mode((256, 256), pygame.DOUBLEBUF)
-            )
-        else:
-            self.screen = Screen(
-                self, pygame.display.set_mode(self.screen_sz, pygame.DOUBLEBUF)
-            )
+        # frames only run at full rate while something is changing
+        self.scheduler = FrameScheduler(self.options.fps)
 
-        bs = ivec2(self.button_sz, self.panel_sz)  # // 2 double panel
-        self.gui = pygame_gui.UIManager(self.screen_sz)
-        y = 0
-        self.btn_octave_down = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((2, y), bs), text="<OCT", manager=self.gui
-        )
-        self.btn_octave_up = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x + 2, y), bs), text="OCT>", manager=self.gui
-        )
-        self.btn_transpose_down = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 2 + 2, y), (bs.x, bs.y)),
-            text='<TR',
-            manager=self.gui
-        )
-        self.btn_transpose_up = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 3 + 2, y), (bs.x, bs.y)),
-            text='TR>',
-            manager=self.gui
-        )
-        self.btn_move_left = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 4 + 2, y), bs),
-            text="<MOV",
-            manager=self.gui,
-        )
-        self.btn_move_right = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 5 + 2, y), bs),
-            text="MOV>",
-            manager=self.gui,
-        )
-        # self.btn_size = pygame_gui.elements.UIButton(
-        #     relative_rect=pygame.Rect((bs.x * 4 + 2, y), bs),
-        #     text="SIZE",
-        #     manager=self.gui,
-        # )
-        self.btn_rotate = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 6 + 2, y), bs),
-            text="ROT",
-            manager=self.gui,
-        )
-        self.btn_flip = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 7 + 2, y), bs),
-            text="FLIP",
-            manager=self.gui,
-        )
-
-        self.btn_split = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 8 + 2, y), (bs.x * 2, bs.y)),
-            text="SPLIT: " + ("ON" if self.split_state else "OFF"),
-            manager=self.gui,
-        )
-
-        self.btn_mpe = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 10 + 2, y), (bs.x * 2, bs.y)),
-            text="MPE: " + ("OFF" if self.options.one_channel else "ON"),
-            manager=self.gui,
-        )
-
-
-        # if self.options.experimental:
-        self.btn_prev_scale = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 12 + 2, y), (bs.x, bs.y)),
-            text='<SCL',
-            manager=self.gui
-        )
-        self.btn_next_scale = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 13 + 2, y), (bs.x, bs.y)),
-            text='SCL>',
-            manager=self.gui
-        )
-
-        self.btn_prev_mode = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 14 + 2, y), (bs.x, bs.y)),
-            text='<MOD',
-            manager=self.gui
-        )
-        self.btn_next_mode = pygame_gui.elements.UIButton(
-            relative_rect=pygame.Rect((bs.x * 15 + 2, y), (bs.x, bs.y)),
-            text='MOD>',
-            manager=self.gui
-        )
-        # self.next_scale = pygame_gui.elements.UIButton(
-        #     relative_rect=pygame.Rect((bs.x * 11 + 2, y), (bs.x, bs.y)),
-        #     text='SCL>',
-        #     manager=self.gui
-        # )
-        # self.scale_label = pygame_gui.elements.UILabel(
-        #     relative_rect=pygame.Rect((bs.x * 12 + 2, y), (bs.x, bs.y)),
-        #     text='Major',
-        #     manager=self.gui
-        # )
-
-        # self.chord_label = pygame_gui.elements.UILabel(
-        #     relative_rect=pygame.Rect((0, self.screen_h - self.status_sz), (self.screen_w, self.status_sz)),
-        #     text='test',
-        #     manager=self.gui
-        # )
-        # self.chord_label.centerx = self.screen_w/2
-
-        # y = bs.y * 2
-        # self.note_buttons = [None] * 12
-        # for n in range(12):
-        #     end_pos = n*2*bs.x//3 + 2*bs.x//3
-        #     self.note_buttons[n] = pygame_gui.elements.UIButton(
-        #         relative_rect=pygame.Rect((2+n*2*bs.x//3, y), (2*bs.x//3, bs.y)),
-        #         text=NOTES[n],
-        #         manager=self.gui
-        #     )
-        
-        # self.slider_velocity = pygame_gui.elements.UIHorizontalSlider (
-        #     relative_rect=pygame.Rect((bs.x*2+2,y+bs.y),(bs.x*2,bs.y)),
-        #     start_value=self.options.velocity_curve,
-        #     value_range=[0,1],
-        #     manager=self.gui
-        # )
+        # the window is an optional layer on top of the engine
+        self.gui = None
+        if not self.options.headless:
+            from src.gui import Gui
+            self.gui = Gui(self)
+            STARTUP.mark("window")
+        self.frame_time = time.monotonic() # for the headless timer
 
         # pygame.midi.init()
 
+        # optional latency instrumentation
+        self.latency = LatencyMonitor() if self.options.latency else None
+
+        # optional frame profiler (can be turned on later from the GUI)
+        self.profiler = None
+
+        # all note state is owned by the engine thread
+        self.engine = MidiEngine(self)
+        self.output = MidiWriter(self.latency)
+        if self.options.profile:
+            self.profiler = FrameProfiler(self.engine, self.options.fps, self.options.profile_csv)
+        self.limiter = None
+        if self.options.expression_limit:
+            self.limiter = ExpressionLimiter(
+                self.options.expression_interval / 1000.0,
+                self.options.expression_threshold
+            )
+
         self.out = []
         self.midi_in = None
         ins = []
@@ -1700,10 +1563,29 @@ class Core:
         #     print('in: ', inx)
 
         self.linn_out = None
+        # the MIDI dispatch handlers keep these, call compile_midi_dispatch()
+        # again if they are changed after it
         self.midi_out = None
         self.split_out = None
-
-        outnames = rtmidi2.get_out_ports()
+        # what the LinnStrument lights are showing
+        self.linn_lights = LinnLights(self.send_ls_cc)
+        # RPNs are paced on their own thread and written by the engine
+        self.rpn_queue = RpnQueue(self.engine.input(self.send_rpn))
+        self.rpn_queue.on_applied = self.rpn_applied
+        self.rpn_queue.start()
+
+        # recording or replaying a session (see src/recorder.py)
+        self.recorder = Recorder(self.options.record) if self.options.record else None
+        self.replayer = None
+        if self.options.replay:
+            self.replayer = Replayer(self.options.replay, self.options.replay_speed, self.options.capture)
+            # replays go to stand-in devices instead of the real ones
+            self.midi_out = self.replayer.sink("out")
+            self.split_out = self.replayer.sink("split") if self.options.split_out else None
+            self.linn_out = self.replayer.sink("linn")
+            self.rpn_queue.interval = 0.0 # no device to wait for
+
+        outnames = [] if self.replayer else rtmidi2.get_out_ports()
         for i in range(len(outnames)):
             name = outnames[i]
             name_lower = name.lower()
@@ -1734,54 +1616,57 @@ class Core:
         #         self.gamepad = Gamepad(self, 0)
         #         print('Gamepad initialized')
 
-        innames = rtmidi2.get_in_ports()
+        innames = [] if self.replayer else rtmidi2.get_in_ports()
         for i in range(len(innames)):
             name = innames[i]
             name_lower = name.lower()
             if "visualizer" in name_lower:
                 print("Visualizer (In): " + name)
                 self.visualizer = rtmidi2.MidiIn()
-                self.visualizer.callback = self.cb_visualizer
+                self.visualizer.callback = self.engine.input(self.cb_visualizer)
                 self.visualizer.open_port(i)
             elif "linnstrument" in name_lower:
                 print("Instrument (In): " + name)
                 self.midi_in = rtmidi2.MidiIn()
-                self.midi_in.callback = self.cb_midi_in
+                self.midi_in.callback = self.recorded_input(MIDI_IN, self.cb_midi_in)
                 self.midi_in.open_port(i)
             elif self.options.foot_in and self.options.foot_in in name_lower:
                 print("Foot Controller (In): " + name)
                 self.foot_in = rtmidi2.MidiIn()
                 self.foot_in.open_port(i)
-                self.foot_in.callback = self.cb_foot
+                self.foot_in.callback = self.recorded_input(FOOT_IN, self.cb_foot)
+
+        STARTUP.mark("MIDI ports")
 
         self.launchpads = []
-        num_launchpads = 0
-        if self.options.launchpad:
-            launchpads = []
-            lp = launchpad.LaunchpadProMk3()
-            if lp.Check(0):
-                if lp.Open(0):
-                    self.launchpads += [Launchpad(self, lp, "promk3", num_launchpads)]
-                    num_launchpads += 1
-            lp = launchpad.LaunchpadPro()
-            if lp.Check(0):
-                if lp.Open(0):
-                    self.launchpads += [Launchpad(self, lp, "pro", num_launchpads)]
-                    num_launchpads += 1
-            lp = launchpad.LaunchpadLPX()
-            if lp.Check(1):
-                lp = launchpad.LaunchpadLPX()
-                if lp.Open(1):
-                    self.launchpads += [Launchpad(self, lp, "lpx", num_launchpads)]
-                    num_launchpads += 1
-                if launchpad.LaunchpadLPX().Check(3):
-                    lp = launchpad.LaunchpadLPX()
-                    if lp.Open(3): # second
-                        self.launchpads += [Launchpad(self, lp, "lpx", num_launchpads, self.options.octave_separation)]
-                        num_launchpads += 1
-        
+        if self.options.launchpad and not self.replayer:
+            opened = set() # input ports, a pro's names also match a pro mk3
+            for mode, names, number in Launchpad.PORTS:
+                port_in = Launchpad.find_port(innames, names, number)
+                port_out = Launchpad.find_port(outnames, names, number)
+                if port_in is None or port_out is None or port_in in opened:
+                    continue
+                opened.add(port_in)
+                # a second launchpad of the same kind plays octave_separation higher
+                second = any(lp.mode == mode for lp in self.launchpads)
+                lp = Launchpad(self, rtmidi2.MidiOut(), mode, len(self.launchpads),
+                    self.options.octave_separation if second else 0)
+                try:
+                    lp.open(port_in, port_out)
+                except Exception:
+                    print("Unable to open Launchpad")
+                    continue
+                self.launchpads.append(lp)
+
         if self.launchpads:
             print('Launchpads:', len(self.launchpads))
+        if self.options.launchpad and not self.replayer:
+            STARTUP.mark("launchpad detection")
+
+        for lp in self.launchpads:
+            lp.input = self.recorded_input(LAUNCHPAD_IN, self.cb_launchpad_in)
+            if self.recorder:
+                self.recorder.device(lp)
 
         self.done = False
 
@@ -1799,21 +1684,29 @@ class Core:
                 "No MIDI output device detected.  Install a midi loopback device and name it 'midimech'!"
             )
 
+        self.output.names[self.midi_out] = "out"
+        if self.split_out:
+            self.output.names[self.split_out] = "split"
+        if self.linn_out:
+            self.output.names[self.linn_out] = "linn"
+
         self.dirty = True
         self.dirty_lights = True
         self.dirty_chord = False
+        self.board_changed = False
         # self.dirty_left_chord = False
 
         w = self.max_width
         h = self.board_h
-        self.board = [[0 for x in range(w)] for y in range(h)]
-        self.mark_lights = [[False for x in range(w)] for y in range(h)]
-        self.launchpad_state = [[None for x in range(8)] for y in range(8)]
+        self.board = np.zeros((h, w), dtype=np.uint8)
+        self.mark_lights = np.zeros((h, w), dtype=bool)
+        self.launchpad_state = np.zeros((8, 8), dtype=np.uint8) # pressure, 0 if not pressed
 
-        self.font = pygame.font.Font(None, FONT_SZ)
+        # copies of engine state for the GUI thread (see publish())
+        self.board_view = self.board.copy()
+        self.chord_view = self.chord_notes
+        self.chord_version = 0
 
-        # self.retro_font = pygame.font.Font("PressStart2P.ttf", FONT_SZ)
-        self.clock = pygame.time.Clock()
 
         # if move_board:
         #     self.move_board(move_board)
@@ -1822,6 +1715,28 @@ class Core:
 
         self.setup_rpn()
         # self.test()
+        STARTUP.mark("RPNs queued")
+
+        self.compile_midi_dispatch()
+        self.articulation_clock = None # started by the first launchpad vibrato
+        self.engine.start()
+        # messages written by the engine are batched until it flushes
+        self.output.thread = self.engine.ident
+
+        for lp in self.launchpads:
+            lp.start()
+
+        if self.replayer:
+            self.replayer.start(self)
+        STARTUP.mark("engine started")
+
+    def recorded_input(self, source, handler):
+        """Engine input callback for `handler`, that also records the events if recording"""
+        recorder = self.recorder
+        if recorder:
+            # timed when the event arrives, not when the engine gets to it
+            return recorder.stamp(self.engine.input(recorder.wrap(source, handler)))
+        return self.engine.input(handler)
 
     def midi_mode_rpn(self, on=True):
         if on:
@@ -1856,17 +1771,21 @@ class Core:
             self.rpn(202, self.split_point + 1)
 
             # lights
-            self.send_ls_cc(0, 20, 0)
-            self.send_ls_cc(0, 21, 1)
-            self.send_ls_cc(0, 22, 7 if on else 0)
+            self.linn_lights.set(0, 1, 7 if on else 0)
         else:
             self.rpn(200, 0)
             self.rpn(202, self.split_point if self.split_point else 8)
 
     def rpn(self, num, value):
+        """Queue LinnStrument RPN (sent in the background, see RpnQueue)"""
+        if not self.linn_out:
+            return
+        self.rpn_queue.set(num, value)
+
+    def send_rpn(self, num, value):
+        """Send LinnStrument RPN now (called by the RPN queue)"""
         if not self.linn_out:
             return
-        """LinnStrument RPN"""
         num_msb, num_lsb = decode_value(num)
         value_msb, value_lsb = decode_value(value)
         self.midi_write(self.linn_out, [176, 99, num_msb])
@@ -1875,7 +1794,14 @@ class Core:
         self.midi_write(self.linn_out, [176, 38, value_lsb])
         self.midi_write(self.linn_out, [176, 101, 127])
         self.midi_write(self.linn_out, [176, 100, 127])
-        time.sleep(0.05)
+
+    def rpn_applied(self, sent, skipped):
+        if self.rpn_queue.sent == sent: # the first ones
+            STARTUP.mark("LinnStrument settings applied")
+        print("LinnStrument settings applied (%d RPNs sent, %d already set)" % (sent, skipped))
+
+    def rpn_restored(self, sent, skipped):
+        print("LinnStrument settings restored (%d RPNs sent, %d already set)" % (sent, skipped))
 
     def mpe_rpn(self, on=True):
         """Sets up MPE settings (except MIDI mode)"""
@@ -1934,9 +1860,7 @@ class Core:
             self.rpn(137, 13)
 
             # turn transpose light off
-            self.send_ls_cc(0, 20, 0)
-            self.send_ls_cc(0, 21, 4)
-            self.send_ls_cc(0, 22, 7)
+            self.linn_lights.set(0, 4, 7)
 
         else:
             # reset transpose in both splits
@@ -1959,38 +1883,33 @@ class Core:
             #     self.move_board(sval)
             #     self.position.x += sval
         elif val == 1:  # shift right (add column left)
-            for y in range(len(self.board)):
-                self.board[y] = [0] + self.board[y][:-1]
+            self.board = np.roll(self.board, 1, axis=1)
+            self.board[:, 0] = 0
             self.position.x += val
         elif val == -1:  # shift left (add column right)
-            for y in range(len(self.board)):
-                self.board[y] = self.board[y][1:] + [0]
+            self.board = np.roll(self.board, -1, axis=1)
+            self.board[:, -1] = 0
             self.position.x += val
+        self.layout.build()
+        self.board_changed = True
         self.dirty = self.dirty_lights = True
 
     def quit(self):
-        self.reset_lights()
-        self.setup_rpn(False)
+        # deinit() resets the lights and LinnStrument settings
         self.done = True
+        self.scheduler.wake()
 
     def clear_marks(self, use_lights=False):
-        y = 0
-        for row in self.board:
-            x = 0
-            for x in range(len(row)):
-                idx = self.get_note_index(x, y)
-                try:
-                    self.board[y][x] = False
-                except IndexError:
-                    pass
-                if use_lights:
-                    # if state:
-                    #     self.set_light(x, y, 1)
-                    # else:
-                    self.reset_light(x, y)
-            y += 1
+        self.board.fill(0)
+        self.board_changed = True
         self.dirty = True
         if use_lights:
+            # setup_lights() relights the board on the next engine update,
+            # sending every light again in case a device lost them (F1)
+            self.mark_lights.fill(False)
+            self.linn_lights.refresh()
+            for lp in self.launchpads:
+                lp.frame.refresh()
             self.dirty_lights = True
 
     def mark_xy(self, x, y, state, use_lights=False):
@@ -1999,7 +1918,7 @@ class Core:
         # print(x, y)
         idx = self.get_note_index(x, y)
         try:
-            self.board[y + self.flipped][x] = state
+            self.board[y + self.flipped, x] = state
         except IndexError:
             print("mark_xy: Out of range")
             pass
@@ -2008,36 +1927,26 @@ class Core:
                 self.set_light(x, y, self.options.mark_light, mark=True)
             else:
                 self.reset_light(x, y)
+        self.board_changed = True
         self.dirty = True
 
     def mark(self, midinote, state, use_lights=False, only_row=None):
         if only_row is not None:
             only_row = self.board_h - only_row - 1 - self.flipped  # flip
-            try:
-                rows = [self.board[only_row]]
-                y = only_row
-            except IndexError:
-                rows = self.board
-                y = 0
+            if -self.board_h <= only_row < self.board_h:
+                cells = [(x, only_row) for x in self.layout.row_cells[only_row].get(midinote, ())]
+            else:
+                cells = self.layout.cells.get(midinote, ())
         else:
-            rows = self.board
-            y = 0
-        for row in rows:
-            x = 0
-            for x in range(len(row)):
-                idx = self.get_note_index(x, y, transpose=False)
-                # print(x, y, midinote%12, idx)
-                if midinote % 12 == idx:
-                    octave = self.get_octave(x, y)
-                    if octave == midinote // 12:
-                        # print(octave)
-                        self.board[y + self.flipped][x + self.position.x] = state
-                        if use_lights:
-                            if state:
-                                self.set_light(x, y, self.options.mark_light, mark=True)
-                            else:
-                                self.reset_light(x, y)
-            y += 1
+            cells = self.layout.cells.get(midinote, ())
+        for x, y in cells:
+            self.board[y + self.flipped, x + self.position.x] = state
+            if use_lights:
+                if state:
+                    self.set_light(x, y, self.options.mark_light, mark=True)
+                else:
+                    self.reset_light(x, y)
+        self.board_changed = True
         self.dirty = True
 
     def resize(self):
@@ -2046,7 +1955,9 @@ class Core:
         self.screen_h = self.board_h * self.scale.y + self.menu_sz + self.status_sz
         self.button_sz = self.screen_w / self.board_w
         self.screen_sz = ivec2(self.screen_w, self.screen_h)
-        self.screen = Screen(self, pygame.display.set_mode(self.screen_sz))
+        if self.gui:
+            self.gui.resize()
+        self.layout.build()
         self.dirty_lights = True
 
     def channel_from_split(self, col, row, force=False):
@@ -2080,166 +1991,111 @@ class Core:
         #     self.position.x = (self.tonic // 2) % 6
         # print('new pos', self.position.x)
         
+        self.layout.build()
+        self.dirty = self.dirty_lights = True
+
+    def transpose(self, ofs):
+        self.set_tonic(self.tonic + ofs)
+
+    def change_octave(self, ofs):
+        self.octave += ofs
+        self.layout.build()
+        self.dirty = self.dirty_lights = True
+        self.clear_marks(use_lights=False)
+
+    def rotate(self):
+        if self.rotated:
+            self.position.x += 3
+            self.rotated = False
+        else:
+            self.position.x -= 3
+            self.rotated = True
+        self.layout.build()
+        self.dirty = self.dirty_lights = True
+        self.clear_marks(use_lights=False)
+
+    def flip(self):
+        self.flipped = not self.flipped
+        self.layout.build()
         self.dirty = self.dirty_lights = True
+        self.clear_marks(use_lights=False)
+
+    def set_split(self, state):
+        self.split_state = state
+        self.compile_midi_dispatch()
+        self.dirty = self.dirty_lights = True
+
+    def set_one_channel(self, one_channel):
+        self.options.one_channel = one_channel
+        self.compile_midi_dispatch()
+        self.midi_mode_rpn()
+        self.dirty = True
+
+    def key_note(self, n, state):
+        """Keyboard simulator note"""
+        n -= 12
+        n += self.octave * 12
+        self.mark(n + self.vis_octave * 12, 1 if state else 0, True)
+        if state:
+            data = [0x90, n, 127]
+        else:
+            data = [0x80, n, 0]
+        # TODO: add split for keyboard?
+        if self.midi_out:
+            self.midi_write(self.midi_out, data, 0)
+
+    def engine_update(self):
+        """Called by the MIDI engine after it has processed pending events"""
+        profiler = self.profiler
+        if profiler:
+            start = profiler.clock()
+        if self.dirty_lights:
+            self.dirty_lights = False
+            self.setup_lights()
+            if profiler:
+                start = profiler.engine_lap("lights", start)
+        if self.limiter:
+            if self.latency:
+                # held on purpose, so not counted as latency
+                self.latency.current = None
+            for args in self.limiter.due():
+                self.cb_midi_in(*args, limit=False)
+            self.engine.timeout = self.limiter.timeout()
+            if profiler:
+                start = profiler.engine_lap("midi", start)
+        self.output.flush()
+        for lp in self.launchpads:
+            lp.flush()
+        if profiler:
+            profiler.engine_lap("flush", start)
+        self.publish()
+
+    def publish(self):
+        """Copy changed engine state for the GUI thread to read"""
+        changed = False
+        if self.board_changed:
+            self.board_changed = False
+            self.board_view = self.board.copy()
+            self.dirty = True
+        if self.dirty_chord:
+            self.dirty_chord = False
+            self.chord_view = self.chord_notes
+            self.chord_version += 1
+            changed = True
+        # wake the main loop if it has something to draw
+        scheduler = self.scheduler
+        if scheduler.sleeping:
+            if self.gui and (self.dirty or changed):
+                scheduler.wake()
 
     def logic(self, dt):
         # keys = pygame.key.get_pressed()
 
-        for lp in self.launchpads:
-            # while True:
-            #     events = self.launchpad.EventRaw()
-            #     if events != []:
-            #         for ev in events:
-            #             self.cb_launchpad_in(ev[0], ev[1])
-            #     else:
-            #         break
-            while True:
-                event = lp.out.ButtonStateXY(returnPressure = True)
-                if event:
-                    self.cb_launchpad_in(lp, event)
-                else:
-                    break
-        
-        for ev in pygame.event.get():
-            if ev.type == pygame.QUIT:
-                self.quit()
-                break
-            elif ev.type == pygame.KEYDOWN:
-                if ev.key == pygame.K_ESCAPE:
-                    self.quit()
-                elif ev.key == pygame.K_F1:
-                    self.clear_marks(use_lights=True)
-                    self.send_all_notes_off()
-                else:
-                    try:
-                        n = self.keys[ev.key]
-                        n -= 12
-                        n += self.octave * 12
-                        self.mark(n + self.vis_octave * 12, 1, True)
-                        data = [0x90, n, 127]
-                        # TODO: add split for mouse?
-                        if self.midi_out:
-                            self.midi_write(self.midi_out, data, 0)
-                    except KeyError:
-                        pass
-            elif ev.type == pygame.KEYUP:
-                try:
-                    n = self.keys[ev.key]
-                    n -= 12
-                    n += self.octave * 12
-                    self.mark(n + self.vis_octave * 12, 0, True)
-                    data = [0x80, n, 0]
-                    if self.midi_out:
-                        # TODO: add split for mouse?
-                        self.midi_write(self.midi_out, data, 0)
-                except KeyError:
-                    pass
+        # launchpad input arrives through rtmidi callbacks (Launchpad.start)
 
-            # else:
-                # if self.gamepad and ev.type in (\
-                #         pygame.JOYAXISMOTION,
-                #         pygame.JOYBALLMOTION,
-                #         pygame.JOYBUTTONDOWN,
-                #         pygame.JOYBUTTONUP,
-                #         pygame.JOYHATMOTION
-                #     ):
-                #         self.gamepad.event(ev)
-                
-            if not self.options.lite:
-                if ev.type == pygame.MOUSEMOTION:
-                    x, y = ev.pos
-                    y -= self.menu_sz
-                    self.mouse_hover(x, y)
-                elif ev.type == pygame.MOUSEBUTTONDOWN:
-                    x, y = ev.pos
-                    y -= self.menu_sz
-                    if ev.button == 1:
-                        self.mouse_press(x, y)
-                    elif ev.button == 2:
-                        self.mouse_release(x, y)
-                    elif ev.button == 3:
-                        self.mouse_hold(x, y)
-                elif ev.type == pygame.MOUSEBUTTONUP:
-                    self.mouse_release()
-                elif ev.type == pygame_gui.UI_BUTTON_PRESSED:
-                    if ev.ui_element == self.btn_octave_down:
-                        self.octave -= 1
-                        self.dirty = self.dirty_lights = True
-                        self.clear_marks(use_lights=False)
-                    elif ev.ui_element == self.btn_octave_up:
-                        self.octave += 1
-                        self.dirty = self.dirty_lights = True
-                        self.clear_marks(use_lights=False)
-                    elif ev.ui_element == self.btn_move_left:
-                        self.move_board(-1)
-                        self.clear_marks(use_lights=False)
-                    elif ev.ui_element == self.btn_move_right:
-                        self.move_board(1)
-                        self.clear_marks(use_lights=False)
-                    # elif ev.ui_element == self.btn_mode:
-                    #     # TODO: toggle mode
-                    #     self.dirty = True
-                    # elif ev.ui_element == self.btn_size:
-                    #     if self.board_w == 16:
-                    #         self.board_w = 25
-                    #         self.resize()
-                    #     else:
-                    #         self.board_w = 16
-                    #         self.resize()
-                    #     self.dirty = True
-                    elif ev.ui_element == self.btn_rotate:
-                        if self.rotated:
-                            self.position.x += 3
-                            self.rotated = False
-                        else:
-                            self.position.x -= 3
-                            self.rotated = True
-                        self.dirty = self.dirty_lights = True
-                        self.clear_marks(use_lights=False)
-                    elif ev.ui_element == self.btn_flip:
-                        self.flipped = not self.flipped
-                        self.dirty = self.dirty_lights = True
-                        self.clear_marks(use_lights=False)
-                    elif ev.ui_element == self.btn_split:
-                        if self.split_out:
-                            self.split_state = not self.split_state
-                            self.btn_split.set_text(
-                                "SPLIT: " + ("ON" if self.split_state else "OFF")
-                            )
-                            self.dirty = self.dirty_lights = True
-                        else:
-                            print("You need to add another MIDI loopback device called 'split'")
-                    elif ev.ui_element == self.btn_mpe:
-                        # self.split_state = not self.split_state
-                        self.options.one_channel = 0 if self.options.one_channel else 1
-                        # one_channel being non-zero means we're using MPE
-                        self.btn_mpe.set_text(
-                            "MPE: " + ("OFF" if self.options.one_channel else "ON")
-                        )
-                        self.midi_mode_rpn()
-                        self.dirty = True
-                    elif ev.ui_element == self.btn_transpose_down:
-                        self.set_tonic(self.tonic - 1)
-                    elif ev.ui_element == self.btn_transpose_up:
-                        self.set_tonic(self.tonic + 1)
-                    elif ev.ui_element == self.btn_next_scale:
-                        self.next_scale()
-                    elif ev.ui_element == self.btn_prev_scale:
-                        self.prev_scale()
-                    elif ev.ui_element == self.btn_next_mode:
-                        self.next_mode()
-                    elif ev.ui_element == self.btn_prev_mode:
-                        self.prev_mode()
-                # elif ev.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
-                #     if ev.ui_element == self.slider_velocity:
-                #         global self.options.velocity_curve
-                #         self.options.velocity_curve = ev.value
-                #         self.config_save_timer = 1.0
-
-                self.gui.process_events(ev)
-        
-        if self.launchpads:
-            self.articulation.logic(dt)
+        if self.replayer and self.replayer.finished and not self.done:
+            print(self.replayer.stats())
+            self.quit()
 
         # if self.gamepad:
         #     self.gamepad.logic(dt)
@@ -2268,8 +2124,8 @@ class Core:
         #     self.init_board()
 
         if self.dirty_lights:
-            self.setup_lights()
-            self.dirty_lights = False
+            # lights are set by the engine thread
+            self.engine.wake()
 
         # lowest note changed?
         # if self.options.show_lowest_note:
@@ -2292,45 +2148,6 @@ class Core:
         # #     if self.config_save_timer <= 0.0:
         # #         save()
 
-        if not self.options.lite:
-            # for note in self.notes:
-            #     if note.location is None:
-            #         continue
-            #     note.logic(dt)
-
-            # chord analysis for jazz mod
-            # if self.options.jazz:
-            #     if self.dirty_chord:
-            #         self.left_chord = self.analyze(self.left_chord_notes)
-            
-            # chord analyzer
-            if self.options.chord_analyzer:
-                if self.dirty_chord:
-                    self.chord = self.analyze(self.chord_notes)
-
-            self.dirty_chord = False
-        
-            self.gui.update(dt)
-
-    def analyze(self, chord_notes):
-        notes = []
-        r = ''
-        for i, note in enumerate(chord_notes):
-            if note:
-                notes.append(NOTES[i % 12])
-        if notes:
-            r = mp.alg.detect(mp.chord(','.join(notes)))
-            # try:
-            #     r = r[0:self.chord.index(' sort')]
-            # except ValueError:
-            #     pass
-            # if self.chord.startswith('note '):
-            #     r = r[len('note '):-1]
-        else:
-            r = ''
-        self.dirty = True
-        return r
-
     def sustainable_devices(self):
         if not self.is_split() or not self.options.sustain_split:
             return [self.midi_out]
@@ -2342,258 +2159,41 @@ class Core:
             return [self.midi_out, self.split_out]
         return [self.midi_out]
 
-    def render(self):
-        if not self.dirty:
-            return False
-
-        if self.options.lite:
-            self.screen.surface.blit(self.icon, (0,0,256,256))
-            return True
-        
-        self.dirty = False
-
-        self.screen.surface.fill((0, 0, 0))
-        b = 2  # border
-        sz = self.screen_w / self.board_w
-        y = 0
-        rad = int(sz // 2 - 8)
-
-        for row in self.board:
-            x = 0
-            for cell in row:
-                # write text
-                note = self.get_note(x, y, True)
-
-                split_chan = self.channel_from_split(x, y)
-
-                # note = str(self.get_octave(x, y)) # show octave
-                # brightness = 1.0 if cell else 0.5
-
-                col = None
-
-                # if cell:
-                #     col = ivec3(255,0,0)
-                # else:
-                #     col = self.get_color(x, y)
-                lit_col = ivec3(255, 0, 0)
-                unlit_col = copy.copy(self.get_color(x, y) or ivec3(0))
-                black = unlit_col == ivec3(0)
-                inner_col = copy.copy(unlit_col)
-                for i in range(len(unlit_col)):
-                    unlit_col[i] = min(255, unlit_col[i] * 1.5)
-
-                ry = y + self.menu_sz  # real y
-                # pygame.gfxdraw.box(self.screen.surface, [x*sz + b, self.menu_sz + y*sz + b, sz - b, sz - b], unlit_col)
-                rect = [x * sz + b, self.menu_sz + y * sz + b, sz - b, sz - b]
-                inner_rect = [rect[0] + 4, rect[1] + 4, rect[2] - 8, rect[3] - 8]
-                pygame.draw.rect(self.screen.surface, unlit_col, rect, border_radius=8)
-                pygame.draw.rect(
-                    self.screen.surface, inner_col, inner_rect, border_radius=8
-                )
-                if not black:
-                    pygame.draw.rect(
-                        self.screen.surface,
-                        BORDER_COLOR,
-                        rect,
-                        width=2,
-                        border_radius=8,
-                    )
-                else:
-                    pygame.draw.rect(
-                        self.screen.surface, vec3(24), rect, width=2, border_radius=8
-                    )
-                if cell:
-                    circ = ivec2(
-                        int(x * sz + b / 2 + sz / 2),
-                        int(self.menu_sz + y * sz + b / 2 + sz / 2),
-                    )
-                    pygame.gfxdraw.aacircle(
-                        self.screen.surface,
-                        circ.x + 1,
-                        circ.y - 1,
-                        rad,
-                        ivec3(255, 0, 0),
-                    )
-                    pygame.gfxdraw.filled_circle(
-                        self.screen.surface,
-                        circ.x + 1,
-                        circ.y - 1,
-                        rad,
-                        ivec3(255, 0, 0),
-                    )
-
-                    pygame.gfxdraw.aacircle(
-                        self.screen.surface, circ.x - 1, circ.y + 1, rad, ivec3(0)
-                    )
-                    pygame.gfxdraw.filled_circle(
-                        self.screen.surface, circ.x - 1, circ.y + 1, rad, ivec3(0)
-                    )
-
-                    pygame.gfxdraw.filled_circle(
-                        self.screen.surface, circ.x, circ.y, rad, lit_col
-                    )
-                    pygame.gfxdraw.aacircle(
-                        self.screen.surface, circ.x, circ.y, rad, lit_col
-                    )
-
-                    pygame.gfxdraw.filled_circle(
-                        self.screen.surface,
-                        circ.x,
-                        circ.y,
-                        int(rad * 0.9),
-                        ivec3(200, 0, 0),
-                    )
-                    pygame.gfxdraw.aacircle(
-                        self.screen.surface,
-                        circ.x,
-                        circ.y,
-                        int(rad * 0.9),
-                        ivec3(200, 0, 0),
-                    )
-
-                text = self.font.render(note, True, (0, 0, 0))
-                textpos = text.get_rect()
-                textpos.x = x * sz + sz // 2 - FONT_SZ // 4
-                textpos.y = self.menu_sz + y * sz + sz // 2 - FONT_SZ // 4
-                textpos.x -= 1
-                textpos.y += 1
-                self.screen.surface.blit(text, textpos)
-
-                text = self.font.render(note, True, ivec3(255))
-                textpos = text.get_rect()
-                textpos.x = x * sz + sz // 2 - FONT_SZ // 4
-                textpos.y = self.menu_sz + y * sz + sz // 2 - FONT_SZ // 4
-                textpos.x += 1
-                textpos.y -= 1
-                self.screen.surface.blit(text, textpos)
-
-                text = self.font.render(note, True, ivec3(200))
-                textpos = text.get_rect()
-                textpos.x = x * sz + sz // 2 - FONT_SZ // 4
-                textpos.y = self.menu_sz + y * sz + sz // 2 - FONT_SZ // 4
-                self.screen.surface.blit(text, textpos)
-
-                x += 1
-            y += 1
-
-        # if self.gamepad:
-        #     pos = self.gamepad.positions()
-        #     # gp_pos.y = self.board_h - y - 1
-            
-        #     circ = [None] * 2
-        #     for i in range(2):
-        #         circ[i] = ivec2(
-        #             int(pos[i].x * sz + b / 2 + sz / 2),
-        #             int(self.menu_sz + pos[i].y * sz + b / 2 + sz / 2),
-        #         )
-                
-        #         pygame.gfxdraw.aacircle(
-        #             self.screen.surface,
-        #             circ[i].x + 1,
-        #             circ[i].y - 1,
-        #             rad,
-        #             ivec3(0, 255, 0),
-        #         )
-        #         # pygame.gfxdraw.filled_circle(
-        #         #     self.screen.surface,
-        #         #     circ[i].x + 1,
-        #         #     circ[i].y - 1,
-        #         #     rad,
-        #         #     ivec3(0, 255, 0),
-        #         # )
-
-        # if self.options.experimental:
-        text = self.font.render(self.scale_name, True, ivec3(127))
-        textpos = text.get_rect()
-        textpos.x = self.screen_w*1/4 - textpos[2]/2
-        textpos.y = self.screen_h - self.status_sz*3/4
-        self.screen.surface.blit(text, textpos)
-
-        text = self.font.render(self.mode_name, True, ivec3(127))
-        textpos = text.get_rect()
-        textpos.x = self.screen_w*2/4 - textpos[2]/2
-        textpos.y = self.screen_h - self.status_sz*3/4
-        self.screen.surface.blit(text, textpos)
-
-        chord = self.chord or '-'
-        text = self.font.render(chord, True, ivec3(127))
-        textpos = text.get_rect()
-        textpos.x = self.screen_w*3/4 - textpos[2]/2
-        textpos.y = self.screen_h - self.status_sz*3/4
-        self.screen.surface.blit(text, textpos)
-
-        # if CHORD_ANALYZER:
-        #     self.render_chords()
-
-    # def render_chords(self):
-    #     sz = self.screen_w / self.board_w
-    #     chords = set()
-    #     for y, row in enumerate(self.board):
-    #         ry = y + self.menu_sz # real y
-    #         for x, cell in enumerate(row):
-    #             # root_pos = ivec2(0,0)
-    #             for name, inversion_list in CHORD_SHAPES.items():
-    #                 for shape in inversion_list:
-    #                     next_chord = False
-    #                     polygons = []
-    #                     polygon = []
-    #                     root = None
-    #                     for rj, chord_row in enumerate(shape):
-    #                         for ri, ch in enumerate(chord_row):
-    #                             try:
-    #                                 mark = self.board[y+rj][x+ri]
-    #                             except:
-    #                                 polygon = []
-    #                                 next_chord = True
-    #                                 break
-    #                             # mark does not exist (not this chord)
-    #                             if ch=='x':
-    #                                 root = ivec2(x+ri, y+rj)
-    #                             if not mark and ch in 'ox':
-    #                                 next_chord=True # double break
-    #                                 polygon = []
-    #                                 break
-    #                             # polygon += [ivec2((x+ri)*sz, (y+rj)*sz+self.menu_sz)]
-    #                         if next_chord: # double break
-    #                             break
-    #                         # if polygon:
-    #                         #     polygons += [polygon]
-    #                     if not next_chord:
-    #                         # for poly in polygons:
-    #                         #     pygame.draw.polygon(self.screen.surface, ivec3(0,255,0), poly, 2)
-    #                         note = self.get_note_index(*root)
-    #                         chords.add((note, name))
-
-    # if chords:
-    #     name = ', '.join(NOTES[c[0]] + c[1] for c in chords) # concat names
-    #     text = self.font.render(name, True, ivec3(255))
-    #     textpos = text.get_rect()
-    #     textpos.x = 0
-    #     textpos.y = self.menu_sz // 2
-    #     self.screen.surface.blit(text, textpos)
-        return True
-
-    def draw(self):
-        self.gui.draw_ui(self.screen.surface)
-        self.screen.render()
-        pygame.display.flip()
-        # self.root.update_idletasks()
-        # self.root.update()
-
     def __call__(self):
+        if not self.gui:
+            # notes are handled from here on, there's no first frame to wait for
+            STARTUP.report()
         try:
             self.done = False
             while not self.done:
                 try:
-                    dt = self.clock.tick(self.options.fps) / 1000.0
+                    dt = self.gui.tick() if self.gui else self.tick()
                 except:
                     self.deinit()
                     break
+                profiler = self.profiler
+                if profiler:
+                    profiler.lap("wait")
                 self.logic(dt)
+                if profiler:
+                    profiler.lap("logic")
                 if self.done:
                     break
-                self.render()
-                self.draw()
+                if self.gui:
+                    self.gui.logic(dt)
+                    if self.done:
+                        break
+                    rendered = self.gui.render()
+                    if profiler:
+                        profiler.lap("render")
+                    # the buttons only need drawing again while active
+                    if rendered or not self.scheduler.idle():
+                        self.gui.draw()
+                if profiler:
+                    profiler.end_frame()
+                if not STARTUP.reported:
+                    STARTUP.mark("first frame")
+                    STARTUP.report()
         except:
             print(traceback.format_exc())
 
@@ -2601,11 +2201,75 @@ class Core:
 
         return 0
 
+    def tick(self):
+        """Headless frame timer, returns the time since the last frame"""
+        # sleep until the engine wakes us (or check for quit now and then)
+        scheduler = self.scheduler
+        if scheduler.idle():
+            scheduler.sleeping = True
+            if self.done:
+                scheduler.sleeping = False
+            else:
+                scheduler.sleep()
+        else:
+            delay = self.frame_time + scheduler.frame - time.monotonic()
+            if delay > 0.0:
+                time.sleep(delay)
+        now = time.monotonic()
+        dt = now - self.frame_time
+        self.frame_time = now
+        scheduler.frames += 1
+        return dt
+
+    def print_stats(self):
+        print(self.output.stats())
+        if self.linn_out:
+            print(self.linn_lights.stats())
+            print(self.rpn_queue.stats())
+        for lp in self.launchpads:
+            print(lp.frame.stats())
+        if self.limiter:
+            print(self.limiter.stats())
+        if self.latency:
+            print(self.latency.report())
+        print(self.scheduler.stats())
+        if self.articulation_clock:
+            print(self.articulation_clock.stats())
+        if self.profiler:
+            print(self.profiler.report())
+
+    def start_articulation_clock(self):
+        """Start ticking the articulation, on the first launchpad vibrato (engine thread)"""
+        if self.articulation_clock or not self.articulation.mode or not self.engine.running:
+            return
+        self.articulation_clock = ArticulationClock(self, self.options.vibrato_rate)
+        self.articulation_clock.start()
+
     def deinit(self):
         for lp in self.launchpads:
-            if lp.out:
-                lp.out.Reset()
-                lp.out.LedSetMode(0)
+            lp.stop()
+        if self.engine.running:
+            # the engine sends these, then the queued RPNs are sent
+            # (the engine has to be running for that)
+            self.rpn_queue.on_applied = self.rpn_restored
+            self.engine.call(self.reset_lights)
+            self.engine.call(self.setup_rpn, False)
+            self.engine.sync()
+        self.rpn_queue.stop()
+        self.engine.stop()
+        # after the engine, which is where the clock is started
+        if self.articulation_clock:
+            self.articulation_clock.stop()
+        if self.recorder:
+            self.recorder.close()
+        if self.replayer:
+            self.replayer.close()
+        if self.profiler:
+            self.profiler.close()
+        if self.options.stats or self.latency or self.profiler:
+            self.print_stats()
+        for lp in self.launchpads:
+            lp.close()
         for out in self.out:
             out.close()
             out.abort()
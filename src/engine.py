@@ -0,0 +1,179 @@
+import threading, traceback, time
+
+class RingBuffer:
+    """Lock-free single producer, single consumer ring buffer
+
+    Only the producer moves `head` and only the consumer moves `tail`,
+    so each side only ever writes its own index.
+    """
+
+    def __init__(self, size=4096):
+        assert size & (size - 1) == 0, "size must be a power of two"
+        self.items = [None] * size
+        self.size = size
+        self.mask = size - 1
+        self.head = 0 # next slot to write (producer)
+        self.tail = 0 # next slot to read (consumer)
+        self.overflows = 0
+
+    def push(self, item):
+        """Add item, returns False if the buffer is full (item is dropped)"""
+        head = self.head
+        if head - self.tail >= self.size:
+            self.overflows += 1
+            return False
+        self.items[head & self.mask] = item
+        self.head = head + 1
+        return True
+
+    def pop(self):
+        """Remove and return the oldest item, or None if empty"""
+        tail = self.tail
+        if tail == self.head:
+            return None
+        i = tail & self.mask
+        item = self.items[i]
+        self.items[i] = None
+        self.tail = tail + 1
+        return item
+
+    def __len__(self):
+        return self.head - self.tail
+
+
+class MidiEngine(threading.Thread):
+    """Thread that owns all note state
+
+    Every input port gets its own ring buffer that is filled by the
+    port's callback thread and drained here, so note handling never
+    races with the GUI.  The GUI thread sends state changes with call().
+
+    The GUI thread still reads some of that state without a lock, and
+    relies on the GIL making each attribute store atomic:
+
+    - the board and the held chord through the copies made by
+      Core.publish() (board_view, chord_view), which are replaced, never
+      changed in place
+    - layout fields (tonic, position, flipped, scale_mask, split...) and
+      Layout's tables, each changed with a single store
+
+    So the GUI never sees a half written value, but a frame can draw
+    some fields from before a change and some from after.  The change
+    also changes Gui.layout_key() or sets core.dirty, so the next frame
+    is drawn from the new state.
+    """
+
+    def __init__(self, core):
+        super().__init__(name="midi engine", daemon=True)
+        self.core = core
+        # optional LatencyMonitor, events are stamped when they arrive
+        self.monitor = core.latency
+        self.inputs = []
+        self.event = threading.Event()
+        self.running = False
+        self.timeout = None
+        self.handled = 0 # events handled, for the frame profiler
+        # commands from the main (GUI) thread
+        self.call = self.input(self.command)
+
+    def input(self, handler, size=4096, block=False):
+        """Create an input port for `handler`
+
+        Returns the callback to give to the producer (ex: rtmidi callback),
+        which queues its arguments for handler(*args) on the engine thread.
+        With `block`, the callback waits for room instead of dropping events
+        when the ring is full (for replays, not for device callbacks).
+        """
+        ring = RingBuffer(size)
+        self.inputs.append((ring, handler))
+        push = ring.push
+        event = self.event
+
+        if block:
+            def push(item, push=ring.push):
+                while len(ring) >= ring.size:
+                    event.set()
+                    time.sleep(0.001)
+                return push(item)
+
+        if self.monitor:
+            clock = self.monitor.clock
+
+            def callback(*args):
+                if push((clock(), args)):
+                    if not event.is_set():
+                        event.set()
+        else:
+            def callback(*args):
+                if push(args):
+                    if not event.is_set():
+                        event.set()
+
+        return callback
+
+    def command(self, func, *args):
+        func(*args)
+
+    def wake(self):
+        self.event.set()
+
+    def sync(self, timeout=None):
+        """Wait until the engine has handled everything sent with call() so far"""
+        if not self.running or threading.current_thread() is self:
+            return False
+        done = threading.Event()
+        self.call(done.set)
+        return done.wait(timeout)
+
+    def run(self):
+        while self.running:
+            self.event.wait(self.timeout)
+            self.event.clear()
+            if not self.running:
+                break
+            self.process()
+
+    def process(self):
+        """Drain all input rings, then let the core update its state"""
+        monitor = self.monitor
+        profiler = self.core.profiler
+        if profiler:
+            start = profiler.clock()
+        handled = 0
+        busy = True
+        while busy:
+            busy = False
+            for ring, handler in self.inputs:
+                while True:
+                    args = ring.pop()
+                    if args is None:
+                        break
+                    busy = True
+                    handled += 1
+                    if monitor:
+                        monitor.current, args = args
+                    try:
+                        handler(*args)
+                    except:
+                        print(traceback.format_exc())
+        self.handled += handled
+        if profiler:
+            profiler.engine_lap("midi", start)
+        if monitor:
+            # anything sent from here on isn't caused by an input event
+            monitor.current = None
+        self.core.engine_update()
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def stop(self):
+        """Stop the thread, processing any events that are still queued"""
+        if not self.running:
+            return
+        self.running = False
+        self.event.set()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+            self.process()
@@ -0,0 +1,745 @@
+import os, sys, copy
+import glm
+import numpy as np
+from glm import ivec2, vec2, ivec3, vec3
+
+from src.util import *
+from src.constants import *
+
+with open(os.devnull, "w") as devnull:
+    # suppress pygame messages (to keep console output clean)
+    stdout = sys.stdout
+    sys.stdout = devnull
+    import pygame, pygame.gfxdraw
+
+    sys.stdout = stdout
+pygame_gui = None # loaded by Gui, unless in lite mode
+
+from src.chords import ChordTable
+from src.profiler import FrameProfiler
+
+
+class Screen(Object):
+    def __init__(self, core, screen):
+        self.core = core
+        self.pos = glm.vec2(0.0, 0.0)
+        self.sz = glm.vec2(core.screen_w, core.screen_h)
+        self.surface = pygame.Surface(core.screen_sz).convert()
+        self.screen = screen
+
+    def render(self, rects=None):
+        if rects is None:
+            self.screen.blit(self.surface, (0, 0))
+        else:
+            for rect in rects:
+                self.screen.blit(self.surface, rect, rect)
+
+
+class Gui:
+    """Window, GUI events and rendering on top of the core
+
+    Not created in headless mode, so pygame is only imported when there
+    is a display.  pygame_gui is only loaded for the buttons (not in lite
+    mode).  Chords are named from the chord table, without musicpy.
+    """
+
+    def __init__(self, core):
+        self.core = core
+        self.chord = ''
+        self.chord_analyzed = 0
+        self.chords = ChordTable()
+        if core.options.chord_analyzer:
+            if not self.chords.load():
+                print('Chord table not found, run scripts/build_chords.py')
+
+        # simulator keys
+        self.keys = {}
+        i = 0
+        for key in "1234567890-=":
+            self.keys[ord(key)] = 62 + i
+            i += 2
+        self.keys[pygame.K_BACKSPACE] = 62 + i
+        i = 0
+        for key in "qwertyuiop[]\\":
+            self.keys[ord(key)] = 57 + i
+            i += 2
+        i = 0
+        for key in "asdfghjkl;'":
+            self.keys[ord(key)] = 52 + i
+            i += 2
+        self.keys[pygame.K_RETURN] = 52 + i
+        i = 0
+        for key in "zxcvbnm,./":
+            self.keys[ord(key)] = 47 + i
+            i += 2
+        self.keys[pygame.K_RSHIFT] = 47 + i
+
+        # core.root = Tk()
+        # core.menubar = Menu(core.root)
+        # core.filemenu = Menu(core.menubar, tearoff=0)
+        # core.filemenu.add_command(label="Open", command=nothing)
+        # core.root.config(menu=core.menubar)
+        # core.embed = Frame(core.root, width=core.screen_w, height=core.screen_h)
+        # core.embed.pack()
+        # os.environ['SDL_WINDOWID'] = str(core.embed.winfo_id())
+        # core.root.update()
+        # core.menubar.add_cascade(label="File", menu=core.filemenu)
+        # core.root.protocol("WM_DELETE_WINDOW", core.quit)
+        pygame.init()
+        pygame.display.set_caption(TITLE)
+        self.icon = pygame.image.load('icon.png')
+        pygame.display.set_icon(self.icon)
+        # if FOCUS:
+        #     pygame.mouse.set_visible(0)
+        #     pygame.event.set_grab(True)
+        if core.options.lite:
+            self.screen = Screen(
+                core, pygame.display.set_mode((256, 256), pygame.DOUBLEBUF)
+            )
+        else:
+            self.screen = Screen(
+                core, pygame.display.set_mode(core.screen_sz, pygame.DOUBLEBUF)
+            )
+
+        self.manager = None
+        if not core.options.lite:
+            # pygame_gui is slow to import, so it's only loaded for the buttons
+            global pygame_gui
+            import pygame_gui
+            self.create_buttons()
+
+        self.font = pygame.font.Font(None, FONT_SZ)
+
+        # core.retro_font = pygame.font.Font("PressStart2P.ttf", FONT_SZ)
+        self.clock = pygame.time.Clock()
+
+        # render layers and caches (see render())
+        self.background = None # every cell drawn unpressed
+        self.background_key = None # layout_key() the background was drawn with
+        self.cell_sz = 0
+        self.cells = [] # (note name, color) for each cell
+        self.sprites = {} # (color, pressed) -> cell surface
+        self.glyph_cache = {} # note name -> text surfaces
+        self.drawn = None # pressed state of each cell on screen
+        self.status = None # status bar text on screen
+        self.hud = core.options.profile # show frame times in the status bar
+        self.hud_text = None # HUD text on screen
+        self.hud_time = 0.0 # when the HUD was last updated
+        self.dirty_rects = []
+        self.full_update = True
+
+        # events received while waiting in tick()
+        self.pending = []
+        # posted by other threads to wake tick() up
+        self.wake_event = pygame.event.custom_type()
+        core.scheduler.on_wake = self.wake
+
+    def create_buttons(self):
+        core = self.core
+        bs = ivec2(core.button_sz, core.panel_sz)  # // 2 double panel
+        self.manager = pygame_gui.UIManager(core.screen_sz)
+        y = 0
+        self.btn_octave_down = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((2, y), bs), text="<OCT", manager=self.manager
+        )
+        self.btn_octave_up = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x + 2, y), bs), text="OCT>", manager=self.manager
+        )
+        self.btn_transpose_down = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 2 + 2, y), (bs.x, bs.y)),
+            text='<TR',
+            manager=self.manager
+        )
+        self.btn_transpose_up = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 3 + 2, y), (bs.x, bs.y)),
+            text='TR>',
+            manager=self.manager
+        )
+        self.btn_move_left = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 4 + 2, y), bs),
+            text="<MOV",
+            manager=self.manager,
+        )
+        self.btn_move_right = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 5 + 2, y), bs),
+            text="MOV>",
+            manager=self.manager,
+        )
+        # self.btn_size = pygame_gui.elements.UIButton(
+        #     relative_rect=pygame.Rect((bs.x * 4 + 2, y), bs),
+        #     text="SIZE",
+        #     manager=self.manager,
+        # )
+        self.btn_rotate = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 6 + 2, y), bs),
+            text="ROT",
+            manager=self.manager,
+        )
+        self.btn_flip = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 7 + 2, y), bs),
+            text="FLIP",
+            manager=self.manager,
+        )
+
+        self.btn_split = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 8 + 2, y), (bs.x * 2, bs.y)),
+            text="SPLIT: " + ("ON" if core.split_state else "OFF"),
+            manager=self.manager,
+        )
+
+        self.btn_mpe = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 10 + 2, y), (bs.x * 2, bs.y)),
+            text="MPE: " + ("OFF" if core.options.one_channel else "ON"),
+            manager=self.manager,
+        )
+
+
+        # if core.options.experimental:
+        self.btn_prev_scale = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 12 + 2, y), (bs.x, bs.y)),
+            text='<SCL',
+            manager=self.manager
+        )
+        self.btn_next_scale = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 13 + 2, y), (bs.x, bs.y)),
+            text='SCL>',
+            manager=self.manager
+        )
+
+        self.btn_prev_mode = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 14 + 2, y), (bs.x, bs.y)),
+            text='<MOD',
+            manager=self.manager
+        )
+        self.btn_next_mode = pygame_gui.elements.UIButton(
+            relative_rect=pygame.Rect((bs.x * 15 + 2, y), (bs.x, bs.y)),
+            text='MOD>',
+            manager=self.manager
+        )
+        # core.next_scale = pygame_gui.elements.UIButton(
+        #     relative_rect=pygame.Rect((bs.x * 11 + 2, y), (bs.x, bs.y)),
+        #     text='SCL>',
+        #     manager=self.manager
+        # )
+        # core.scale_label = pygame_gui.elements.UILabel(
+        #     relative_rect=pygame.Rect((bs.x * 12 + 2, y), (bs.x, bs.y)),
+        #     text='Major',
+        #     manager=self.manager
+        # )
+
+        # core.chord_label = pygame_gui.elements.UILabel(
+        #     relative_rect=pygame.Rect((0, core.screen_h - core.status_sz), (core.screen_w, core.status_sz)),
+        #     text='test',
+        #     manager=self.manager
+        # )
+        # core.chord_label.centerx = core.screen_w/2
+
+        # y = bs.y * 2
+        # core.note_buttons = [None] * 12
+        # for n in range(12):
+        #     end_pos = n*2*bs.x//3 + 2*bs.x//3
+        #     core.note_buttons[n] = pygame_gui.elements.UIButton(
+        #         relative_rect=pygame.Rect((2+n*2*bs.x//3, y), (2*bs.x//3, bs.y)),
+        #         text=NOTES[n],
+        #         manager=self.manager
+        #     )
+        
+        # core.slider_velocity = pygame_gui.elements.UIHorizontalSlider (
+        #     relative_rect=pygame.Rect((bs.x*2+2,y+bs.y),(bs.x*2,bs.y)),
+        #     start_value=core.options.velocity_curve,
+        #     value_range=[0,1],
+        #     manager=self.manager
+        # )
+
+    def wake(self):
+        pygame.event.post(pygame.event.Event(self.wake_event))
+
+    def busy(self):
+        """Is there anything to draw or animate?"""
+        core = self.core
+        return (
+            core.dirty or self.full_update or self.dirty_rects
+            or core.chord_version != self.chord_analyzed
+        )
+
+    def tick(self):
+        """Wait for the next frame, returns the time since the last one
+
+        Runs at full fps while something is changing, otherwise sleeps
+        until an input event or until the engine has something new.
+        """
+        core = self.core
+        scheduler = core.scheduler
+        if self.busy():
+            scheduler.activity()
+        elif scheduler.idle():
+            scheduler.sleeping = True
+            if self.busy():
+                scheduler.sleeping = False
+            else:
+                scheduler.sleep(self.wait)
+        scheduler.frames += 1
+        return self.clock.tick(core.options.fps) / 1000.0
+
+    def wait(self, timeout):
+        ev = pygame.event.wait(int(timeout * 1000))
+        if ev.type != pygame.NOEVENT and ev.type != self.wake_event:
+            self.pending.append(ev)
+
+    def resize(self):
+        core = self.core
+        self.screen = Screen(core, pygame.display.set_mode(core.screen_sz))
+        self.background_key = None
+        self.sprites = {}
+        self.full_update = True
+
+    def logic(self, dt):
+        core = self.core
+        events = pygame.event.get()
+        if self.pending:
+            events = self.pending + events
+            self.pending = []
+        if events:
+            # keep drawing a while for the buttons (hover, etc.)
+            core.scheduler.activity()
+        for ev in events:
+            if ev.type == self.wake_event:
+                continue
+            if ev.type == pygame.QUIT:
+                core.quit()
+                break
+            elif ev.type == pygame.KEYDOWN:
+                if ev.key == pygame.K_ESCAPE:
+                    core.quit()
+                elif ev.key == pygame.K_F1:
+                    core.engine.call(core.clear_marks, True)
+                    core.engine.call(core.send_all_notes_off)
+                elif ev.key == pygame.K_F2:
+                    core.print_stats()
+                elif ev.key == pygame.K_F3:
+                    self.toggle_hud()
+                else:
+                    try:
+                        core.engine.call(core.key_note, self.keys[ev.key], True)
+                    except KeyError:
+                        pass
+            elif ev.type == pygame.KEYUP:
+                try:
+                    core.engine.call(core.key_note, self.keys[ev.key], False)
+                except KeyError:
+                    pass
+
+            # else:
+                # if core.gamepad and ev.type in (\
+                #         pygame.JOYAXISMOTION,
+                #         pygame.JOYBALLMOTION,
+                #         pygame.JOYBUTTONDOWN,
+                #         pygame.JOYBUTTONUP,
+                #         pygame.JOYHATMOTION
+                #     ):
+                #         core.gamepad.event(ev)
+                
+            if not core.options.lite:
+                if ev.type == pygame.MOUSEMOTION:
+                    x, y = ev.pos
+                    y -= core.menu_sz
+                    # only hovering with the button down plays notes
+                    if pygame.mouse.get_pressed(3)[0]:
+                        core.engine.call(core.mouse_hover, x, y)
+                elif ev.type == pygame.MOUSEBUTTONDOWN:
+                    x, y = ev.pos
+                    y -= core.menu_sz
+                    if ev.button == 1:
+                        core.engine.call(core.mouse_press, x, y)
+                    elif ev.button == 2:
+                        core.engine.call(core.mouse_release, x, y)
+                    elif ev.button == 3:
+                        core.engine.call(core.mouse_hold, x, y)
+                elif ev.type == pygame.MOUSEBUTTONUP:
+                    core.engine.call(core.mouse_release)
+                elif self.manager and ev.type == pygame_gui.UI_BUTTON_PRESSED:
+                    if ev.ui_element == self.btn_octave_down:
+                        core.engine.call(core.change_octave, -1)
+                    elif ev.ui_element == self.btn_octave_up:
+                        core.engine.call(core.change_octave, 1)
+                    elif ev.ui_element == self.btn_move_left:
+                        core.engine.call(core.move_board, -1)
+                        core.engine.call(core.clear_marks, False)
+                    elif ev.ui_element == self.btn_move_right:
+                        core.engine.call(core.move_board, 1)
+                        core.engine.call(core.clear_marks, False)
+                    # elif ev.ui_element == self.btn_mode:
+                    #     # TODO: toggle mode
+                    #     core.dirty = True
+                    # elif ev.ui_element == self.btn_size:
+                    #     if core.board_w == 16:
+                    #         core.board_w = 25
+                    #         core.resize()
+                    #     else:
+                    #         core.board_w = 16
+                    #         core.resize()
+                    #     core.dirty = True
+                    elif ev.ui_element == self.btn_rotate:
+                        core.engine.call(core.rotate)
+                    elif ev.ui_element == self.btn_flip:
+                        core.engine.call(core.flip)
+                    elif ev.ui_element == self.btn_split:
+                        if core.split_out:
+                            split_state = not core.split_state
+                            core.engine.call(core.set_split, split_state)
+                            self.btn_split.set_text(
+                                "SPLIT: " + ("ON" if split_state else "OFF")
+                            )
+                        else:
+                            print("You need to add another MIDI loopback device called 'split'")
+                    elif ev.ui_element == self.btn_mpe:
+                        # one_channel being non-zero means we're using MPE
+                        one_channel = 0 if core.options.one_channel else 1
+                        core.engine.call(core.set_one_channel, one_channel)
+                        self.btn_mpe.set_text(
+                            "MPE: " + ("OFF" if one_channel else "ON")
+                        )
+                    elif ev.ui_element == self.btn_transpose_down:
+                        core.engine.call(core.transpose, -1)
+                    elif ev.ui_element == self.btn_transpose_up:
+                        core.engine.call(core.transpose, 1)
+                    elif ev.ui_element == self.btn_next_scale:
+                        core.engine.call(core.next_scale)
+                    elif ev.ui_element == self.btn_prev_scale:
+                        core.engine.call(core.prev_scale)
+                    elif ev.ui_element == self.btn_next_mode:
+                        core.engine.call(core.next_mode)
+                    elif ev.ui_element == self.btn_prev_mode:
+                        core.engine.call(core.prev_mode)
+                # elif ev.type == pygame_gui.UI_HORIZONTAL_SLIDER_MOVED:
+                #     if ev.ui_element == core.slider_velocity:
+                #         global core.options.velocity_curve
+                #         core.options.velocity_curve = ev.value
+                #         core.config_save_timer = 1.0
+
+                if self.manager:
+                    self.manager.process_events(ev)
+
+        profiler = core.profiler
+        if profiler:
+            profiler.lap("input")
+
+        if not core.options.lite:
+            # for note in core.notes:
+            #     if note.location is None:
+            #         continue
+            #     note.logic(dt)
+
+            # chord analysis for jazz mod
+            # if core.options.jazz:
+            #     if core.dirty_chord:
+            #         core.left_chord = self.analyze(core.left_chord_notes)
+            
+            # chord analyzer
+            chord_version = core.chord_version
+            if chord_version != self.chord_analyzed:
+                self.chord_analyzed = chord_version
+                if core.options.chord_analyzer:
+                    self.chord = self.analyze(core.chord_view)
+            if profiler:
+                profiler.lap("chords")
+        
+            self.manager.update(dt)
+            if profiler:
+                profiler.lap("gui")
+
+    def analyze(self, chord_notes):
+        """Get chord name for bitmask of midi notes"""
+        core = self.core
+        r = self.chords.analyze(chord_notes)
+        core.dirty = True
+        return r or ''
+
+    def layout_key(self):
+        """State the background layer depends on (note names and colors)"""
+        core = self.core
+        return (
+            core.board_w, core.board_h, core.position.x, core.flipped,
+            core.tonic, core.scale_mask, bool(core.is_split()),
+        )
+
+    def cell_sprite(self, col, pressed):
+        """Cached image of a cell (without its note name)"""
+        key = (tuple(col) if col is not None else None, pressed)
+        try:
+            return self.sprites[key]
+        except KeyError:
+            pass
+
+        sz = self.cell_sz
+        b = 2  # border
+        rad = int(sz // 2 - 8)
+        surface = pygame.Surface((sz, sz)).convert()
+        surface.fill((0, 0, 0))
+
+        lit_col = ivec3(255, 0, 0)
+        unlit_col = ivec3(col) if col is not None else ivec3(0)
+        black = unlit_col == ivec3(0)
+        inner_col = ivec3(unlit_col)
+        for i in range(len(unlit_col)):
+            unlit_col[i] = min(255, unlit_col[i] * 1.5)
+
+        rect = [b, b, sz - b, sz - b]
+        inner_rect = [rect[0] + 4, rect[1] + 4, rect[2] - 8, rect[3] - 8]
+        pygame.draw.rect(surface, unlit_col, rect, border_radius=8)
+        pygame.draw.rect(surface, inner_col, inner_rect, border_radius=8)
+        if not black:
+            pygame.draw.rect(surface, BORDER_COLOR, rect, width=2, border_radius=8)
+        else:
+            pygame.draw.rect(surface, vec3(24), rect, width=2, border_radius=8)
+        if pressed:
+            c = int(b / 2 + sz / 2)
+            pygame.gfxdraw.aacircle(surface, c + 1, c - 1, rad, ivec3(255, 0, 0))
+            pygame.gfxdraw.filled_circle(surface, c + 1, c - 1, rad, ivec3(255, 0, 0))
+
+            pygame.gfxdraw.aacircle(surface, c - 1, c + 1, rad, ivec3(0))
+            pygame.gfxdraw.filled_circle(surface, c - 1, c + 1, rad, ivec3(0))
+
+            pygame.gfxdraw.filled_circle(surface, c, c, rad, lit_col)
+            pygame.gfxdraw.aacircle(surface, c, c, rad, lit_col)
+
+            pygame.gfxdraw.filled_circle(surface, c, c, int(rad * 0.9), ivec3(200, 0, 0))
+            pygame.gfxdraw.aacircle(surface, c, c, int(rad * 0.9), ivec3(200, 0, 0))
+
+        self.sprites[key] = surface
+        return surface
+
+    def glyphs(self, note):
+        """Cached text for a note name: shadow, highlight and text with offsets"""
+        try:
+            return self.glyph_cache[note]
+        except KeyError:
+            pass
+        glyphs = self.glyph_cache[note] = (
+            (self.font.render(note, True, (0, 0, 0)), -1, 1),
+            (self.font.render(note, True, ivec3(255)), 1, -1),
+            (self.font.render(note, True, ivec3(200)), 0, 0),
+        )
+        return glyphs
+
+    def draw_cell(self, surface, x, y, note, col, pressed):
+        sz = self.cell_sz
+        cx = x * sz
+        cy = self.core.menu_sz + y * sz
+        surface.blit(self.cell_sprite(col, pressed), (cx, cy))
+        tx = cx + sz // 2 - FONT_SZ // 4
+        ty = cy + sz // 2 - FONT_SZ // 4
+        for text, dx, dy in self.glyphs(note):
+            surface.blit(text, (tx + dx, ty + dy))
+
+    def build_background(self):
+        """Draw every cell unpressed, only redone when the layout changes"""
+        core = self.core
+        self.cell_sz = int(core.screen_w / core.board_w)
+        self.background = pygame.Surface(core.screen_sz).convert()
+        self.background.fill((0, 0, 0))
+        self.cells = []
+        notes = core.note_grid(transpose=True).tolist()
+        for y in range(core.board_h):
+            row = []
+            for x in range(core.board_w):
+                note = NOTES[notes[y][x]]
+                col = core.get_color(x, y)
+                row.append((note, col))
+                self.draw_cell(self.background, x, y, note, col, False)
+            self.cells.append(row)
+
+    def render(self):
+        core = self.core
+        if not core.dirty:
+            return False
+
+        if core.options.lite:
+            # only the icon is shown, drawn again after a resize
+            core.dirty = False
+            if self.background_key == "lite":
+                return False
+            self.background_key = "lite"
+            self.screen.surface.blit(self.icon, (0,0,256,256))
+            self.full_update = True
+            return True
+        
+        core.dirty = False
+        surface = self.screen.surface
+
+        key = self.layout_key()
+        if key != self.background_key:
+            self.background_key = key
+            self.build_background()
+            surface.blit(self.background, (0, 0))
+            self.drawn = None
+            self.status = None
+            self.hud_text = None
+            self.full_update = True
+
+        # only redraw the cells that changed since the last frame
+        sz = self.cell_sz
+        pressed = core.board_view[:core.board_h, :core.board_w] != 0
+        # unpressed cells are already on a new background
+        changed = pressed if self.drawn is None else pressed != self.drawn
+        for y, x in zip(*np.nonzero(changed)):
+            y, x = int(y), int(x)
+            rect = (x * sz, core.menu_sz + y * sz, sz, sz)
+            if pressed[y, x]:
+                note, col = self.cells[y][x]
+                self.draw_cell(surface, x, y, note, col, True)
+            else:
+                surface.blit(self.background, rect, rect)
+            self.dirty_rects.append(rect)
+        self.drawn = pressed
+
+
+        # if core.gamepad:
+        #     pos = core.gamepad.positions()
+        #     # gp_pos.y = core.board_h - y - 1
+            
+        #     circ = [None] * 2
+        #     for i in range(2):
+        #         circ[i] = ivec2(
+        #             int(pos[i].x * sz + b / 2 + sz / 2),
+        #             int(core.menu_sz + pos[i].y * sz + b / 2 + sz / 2),
+        #         )
+                
+        #         pygame.gfxdraw.aacircle(
+        #             self.screen.surface,
+        #             circ[i].x + 1,
+        #             circ[i].y - 1,
+        #             rad,
+        #             ivec3(0, 255, 0),
+        #         )
+        #         # pygame.gfxdraw.filled_circle(
+        #         #     self.screen.surface,
+        #         #     circ[i].x + 1,
+        #         #     circ[i].y - 1,
+        #         #     rad,
+        #         #     ivec3(0, 255, 0),
+        #         # )
+
+
+        # if core.options.experimental:
+        status = (core.scale_name, core.mode_name, self.chord or '-')
+        if status != self.status and not self.hud:
+            self.status = status
+            rect = (0, core.screen_h - core.status_sz, core.screen_w, core.status_sz)
+            surface.fill((0, 0, 0), rect)
+            for i, name in enumerate(status):
+                text = self.font.render(name, True, ivec3(127))
+                textpos = text.get_rect()
+                textpos.x = core.screen_w*(i+1)/4 - textpos[2]/2
+                textpos.y = core.screen_h - core.status_sz*3/4
+                surface.blit(text, textpos)
+            self.dirty_rects.append(rect)
+
+        # if CHORD_ANALYZER:
+        #     self.render_chords()
+
+    # def render_chords(self):
+    #     sz = core.screen_w / core.board_w
+    #     chords = set()
+    #     for y, row in enumerate(core.board):
+    #         ry = y + core.menu_sz # real y
+    #         for x, cell in enumerate(row):
+    #             # root_pos = ivec2(0,0)
+    #             for name, inversion_list in CHORD_SHAPES.items():
+    #                 for shape in inversion_list:
+    #                     next_chord = False
+    #                     polygons = []
+    #                     polygon = []
+    #                     root = None
+    #                     for rj, chord_row in enumerate(shape):
+    #                         for ri, ch in enumerate(chord_row):
+    #                             try:
+    #                                 mark = core.board[y+rj][x+ri]
+    #                             except:
+    #                                 polygon = []
+    #                                 next_chord = True
+    #                                 break
+    #                             # mark does not exist (not this chord)
+    #                             if ch=='x':
+    #                                 root = ivec2(x+ri, y+rj)
+    #                             if not mark and ch in 'ox':
+    #                                 next_chord=True # double break
+    #                                 polygon = []
+    #                                 break
+    #                             # polygon += [ivec2((x+ri)*sz, (y+rj)*sz+core.menu_sz)]
+    #                         if next_chord: # double break
+    #                             break
+    #                         # if polygon:
+    #                         #     polygons += [polygon]
+    #                     if not next_chord:
+    #                         # for poly in polygons:
+    #                         #     pygame.draw.polygon(self.screen.surface, ivec3(0,255,0), poly, 2)
+    #                         note = core.get_note_index(*root)
+    #                         chords.add((note, name))
+
+    # if chords:
+    #     name = ', '.join(NOTES[c[0]] + c[1] for c in chords) # concat names
+    #     text = self.font.render(name, True, ivec3(255))
+    #     textpos = text.get_rect()
+    #     textpos.x = 0
+    #     textpos.y = core.menu_sz // 2
+    #     self.screen.surface.blit(text, textpos)
+        return True
+
+    def toggle_hud(self):
+        core = self.core
+        self.hud = not self.hud
+        if self.hud and not core.profiler:
+            core.profiler = FrameProfiler(core.engine, core.options.fps)
+        # redraw the status bar
+        self.status = None
+        self.hud_text = None
+        core.dirty = True
+
+    def render_hud(self):
+        """Draw the frame profiler's stats over the status bar, twice a second"""
+        core = self.core
+        profiler = core.profiler
+        if self.hud_text is not None and profiler.last - self.hud_time < 0.5:
+            return
+        self.hud_time = profiler.last
+        text = profiler.hud()
+        if text == self.hud_text:
+            return
+        self.hud_text = text
+        rect = (0, core.screen_h - core.status_sz, core.screen_w, core.status_sz)
+        surface = self.screen.surface
+        surface.fill((0, 0, 0), rect)
+        text = self.font.render(text, True, ivec3(127))
+        textpos = text.get_rect()
+        textpos.x = 8
+        textpos.y = core.screen_h - core.status_sz*3/4
+        surface.blit(text, textpos)
+        self.dirty_rects.append(rect)
+
+    def draw(self):
+        core = self.core
+        profiler = core.profiler
+        if self.hud and profiler:
+            self.render_hud()
+        if self.manager:
+            self.manager.draw_ui(self.screen.surface)
+        if self.full_update:
+            self.full_update = False
+            self.screen.render()
+            if profiler:
+                profiler.lap("draw")
+            pygame.display.flip()
+        else:
+            # the buttons are drawn every frame, everything else only if changed
+            rects = self.dirty_rects
+            rects.append((0, 0, core.screen_w, core.menu_sz))
+            self.screen.render(rects)
+            if profiler:
+                profiler.lap("draw")
+            pygame.display.update(rects)
+        if profiler:
+            profiler.lap("flip")
+        self.dirty_rects = []
+        # core.root.update_idletasks()
+        # core.root.update()
@@ -0,0 +1,108 @@
+import threading, time
+
+class Histogram:
+    """Fixed size log-linear (HDR style) histogram of nanosecond values
+
+    Values below 2 * SUB are exact, above that every power of two is split
+    into SUB buckets, so the error is at most 1/SUB (~3%).
+    """
+
+    SUB_BITS = 5
+    SUB = 1 << SUB_BITS
+    SIZE = 1024 # covers up to ~68 seconds
+
+    def __init__(self):
+        self.counts = [0] * self.SIZE
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        if value < self.SUB << 1:
+            i = value
+        else:
+            shift = value.bit_length() - self.SUB_BITS - 1
+            i = (shift << self.SUB_BITS) + (value >> shift)
+            if i >= self.SIZE:
+                i = self.SIZE - 1
+        self.counts[i] += 1
+        self.total += 1
+        if value > self.max:
+            self.max = value
+
+    def bucket_value(self, i):
+        """Upper bound of bucket i"""
+        if i < self.SUB << 1:
+            return i
+        shift = (i >> self.SUB_BITS) - 1
+        return ((i - (shift << self.SUB_BITS)) << shift) + (1 << shift) - 1
+
+    def percentile(self, p):
+        """Value at percentile p (0-100)"""
+        if not self.total:
+            return 0
+        target = max(1, int(self.total * p / 100.0 + 0.5))
+        count = 0
+        for i, n in enumerate(self.counts):
+            count += n
+            if count >= target:
+                return min(self.bucket_value(i), self.max)
+        return self.max
+
+
+class LatencyMonitor:
+    """Records time from a MIDI event arriving to its output being sent
+
+    The engine stamps each input event with a monotonic clock and sets
+    `current` while the event is handled.  The MIDI writer records the
+    latency of every message it sends for that event, by message type and
+    destination.
+    """
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def __init__(self):
+        self.current = None # stamp of the event being processed
+        self.histograms = {} # (message type, destination) -> Histogram
+        self.lock = threading.Lock() # for adding histograms while reporting
+
+    @staticmethod
+    def message_type(msg):
+        kind = msg[0] & 0xF0
+        if kind == 0x90:
+            return "note on" if msg[2] else "note off"
+        if kind == 0x80:
+            return "note off"
+        if kind == 0xA0 or kind == 0xD0:
+            return "pressure"
+        if kind == 0xE0:
+            return "bend"
+        if kind == 0xB0:
+            return "cc"
+        return "other"
+
+    def record(self, msg, destination, ns):
+        key = (self.message_type(msg), destination)
+        try:
+            hist = self.histograms[key]
+        except KeyError:
+            with self.lock:
+                hist = self.histograms[key] = Histogram()
+        hist.record(ns)
+
+    def report(self):
+        lines = ["%-20s %8s %9s %8s %8s %8s" % (
+            "Latency (us)", "route", "count", "p50", "p99", "max"
+        )]
+        # reports can be asked for from another thread while recording
+        with self.lock:
+            histograms = list(self.histograms.items())
+        for (kind, destination), hist in sorted(histograms):
+            lines.append("%-20s %8s %9d %8.1f %8.1f %8.1f" % (
+                kind, destination, hist.total,
+                hist.percentile(50) / 1000.0,
+                hist.percentile(99) / 1000.0,
+                hist.max / 1000.0,
+            ))
+        return "\n".join(lines)
@@ -1,13 +1,141 @@
 from src.device import Device, DeviceSettings
 import glm
+import functools, time
+import rtmidi2
+
+class LedFrame:
+    """LED state of a Launchpad's 9x9 surface
+
+    Pads are drawn into the frame and flush() sends only the pads that
+    changed since the last flush, using the device's multi-LED SysEx
+    message, so a full redraw is one or two writes instead of one
+    message per pad.  Colors are stored like launchpad_py's LedCtrlRaw
+    (RGB 0-63) or as a palette color code.
+    """
+
+    # SysEx header, RGB and palette commands for each mode
+    # (lpx and promk3 have one LED command with a type per pad)
+    HEADERS = {
+        "pro": ([0, 32, 41, 2, 16], 11, 10),
+        "lpx": ([0, 32, 41, 2, 12], 3, 3),
+        "promk3": ([0, 32, 41, 2, 14], 3, 3),
+    }
+    MAX_LEDS = 64 # pads per message, keeps SysEx messages a safe size
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.header, self.rgb_cmd, self.code_cmd = self.HEADERS[mode]
+        self.leds = [None] * 100 # by led number, (r, g, b) or color code
+        self.shown = [None] * 100 # what was last sent
+        self.changed = set()
+
+        self.sent = 0 # pads sent
+        self.saved = 0 # unchanged pads skipped
+        self.messages = 0
+
+    @staticmethod
+    def led(x, y):
+        """Led number for x, y (launchpad_py's "classic" layout), or None"""
+        if x < 0 or x > 9 or y < 0 or y > 9:
+            return None
+        return 90 - 10 * y + (x + 1) % 10
+
+    def set(self, x, y, red, green, blue=None):
+        """Same arguments as LedCtrlXY"""
+        if blue is None:
+            blue = 0
+            red *= 21
+            green *= 21
+        limit = lambda n: int(max(min(63, n), 0))
+        self.set_led(self.led(x, y), (limit(red), limit(green), limit(blue)))
+
+    def set_code(self, x, y, code):
+        """Same arguments as LedCtrlXYByCode"""
+        self.set_led(self.led(x, y), code)
+
+    def set_led(self, led, color):
+        if led is None:
+            return
+        if self.leds[led] == color:
+            self.saved += 1
+            return
+        self.leds[led] = color
+        self.changed.add(led)
+
+    def refresh(self):
+        """Send every pad again on the next flush, not only the changed ones"""
+        self.shown = [None] * 100
+        self.changed.update(led for led, color in enumerate(self.leds) if color is not None)
+
+    def flush(self):
+        """Get the SysEx messages (without F0/F7) for the changed pads"""
+        rgb = []
+        codes = []
+        for led in sorted(self.changed):
+            color = self.leds[led]
+            if color == self.shown[led]:
+                self.saved += 1 # changed back before it was sent
+                continue
+            self.shown[led] = color
+            if isinstance(color, tuple):
+                rgb.append((led, color))
+            else:
+                codes.append((led, color))
+        self.changed.clear()
+        self.sent += len(rgb) + len(codes)
+
+        if self.mode == "pro":
+            msgs = self.pack(self.rgb_cmd, [[led] + list(color) for led, color in rgb])
+            msgs += self.pack(self.code_cmd, [[led, code] for led, code in codes])
+        else:
+            # type 3 is RGB (0-127), type 0 is a palette color
+            msgs = self.pack(self.rgb_cmd,
+                [[3, led] + [c << 1 for c in color] for led, color in rgb] +
+                [[0, led, code] for led, code in codes]
+            )
+        self.messages += len(msgs)
+        return msgs
+
+    def pack(self, cmd, pads):
+        msgs = []
+        for i in range(0, len(pads), self.MAX_LEDS):
+            msg = self.header + [cmd]
+            for pad in pads[i:i + self.MAX_LEDS]:
+                msg += pad
+            msgs.append(msg)
+        return msgs
+
+    def stats(self):
+        return "Launchpad %s lights: %d pads sent in %d messages, %d unchanged" % (
+            self.mode, self.sent, self.messages, self.saved
+        )
 
 class Launchpad(Device):
+    # (mode, port names to look for, which of the matching ports to use):
+    #  the X has a DAW port and then a MIDI port, which has the pads
+    PORTS = [
+        ("promk3", ["promk3"], 0),
+        ("pro", ["launchpad pro"], 0),
+        ("lpx", ["launchpad x", "lpx"], 1),
+        ("lpx", ["launchpad x", "lpx"], 3), # a second launchpad X
+    ]
+    # SysEx command that selects the device mode, and the mode used while
+    #  running (pro: 0 is Ableton Live mode, lpx/promk3: 1 is programmer mode),
+    #  mode 0 is set again on quit
+    MODES = {"pro": (33, 0), "lpx": (14, 1), "promk3": (14, 1)}
+    SETTLE = 0.01 # seconds to wait after changing modes
+    SETTLE_MK3 = 0.1
+
     def __init__(self, core, out, mode, index=0, octave_separation=0):
         super().__init__(core)
-        self.out = out
+        self.out = out # rtmidi2.MidiOut, None when replaying
         self.mode = mode
         self.index = index
         self.octave_separation = octave_separation
+        self.frame = LedFrame(mode)
+        self.input = None # input(lp, msg, timestamp), called from rtmidi's thread
+        self.midi_in = None
+        self.port_in = None
 
         print("Launchpad", mode, 'Connected! (#' + str(index) + ")")
 
@@ -79,23 +207,77 @@ class Launchpad(Device):
                     print("PROG-")
                 self.core.prev_program()
 
+    @staticmethod
+    def find_port(ports, names, number):
+        """Index of the `number`th port matching the first name that has one, or None"""
+        for name in names:
+            matches = [i for i, port in enumerate(ports) if name in port.lower()]
+            if number < len(matches):
+                return matches[number]
+        return None
+
+    def open(self, port_in, port_out):
+        """Open the output and put the launchpad in the mode midimech uses
+
+        The input is opened by start(), once there is somewhere to send it.
+        """
+        self.out.open_port(port_out)
+        self.set_mode(self.MODES[self.mode][1])
+        self.port_in = port_in
+
+    def set_mode(self, mode):
+        self.out.send_raw(0xF0, *self.frame.header, self.MODES[self.mode][0], mode, 0xF7)
+        time.sleep(self.SETTLE_MK3 if self.mode == "promk3" else self.SETTLE)
+
+    def start(self):
+        """Have rtmidi call back with each message as it arrives, from its own thread"""
+        if self.port_in is None: # no device when replaying
+            return
+        self.midi_in = rtmidi2.MidiIn()
+        self.midi_in.callback = functools.partial(self.input, self)
+        self.midi_in.open_port(self.port_in)
+
+    def stop(self):
+        if self.midi_in:
+            self.midi_in.close_port()
+            self.midi_in = None
+
+    def close(self):
+        """Turn the lights off and put the launchpad back in its default mode"""
+        if not self.out:
+            return
+        for y in range(9):
+            for x in range(9):
+                self.frame.set_code(x, y, 0)
+        self.flush()
+        self.set_mode(0)
+        self.out.close_port()
+
+    def flush(self):
+        """Send changed pads of the LED frame"""
+        msgs = self.frame.flush()
+        if self.out: # no device when replaying
+            for msg in msgs:
+                self.out.send_raw(0xF0, *msg, 0xF7)
+
     def set_lights(self):
         # if self.mode == "lpx":
-        self.out.LedCtrlXY(0, 0, 0, 0, 63)
-        self.out.LedCtrlXY(1, 0, 0, 0, 63)
-        self.out.LedCtrlXY(2, 0, 63, 0, 63)
-        self.out.LedCtrlXY(3, 0, 63, 0, 63)
-        self.out.LedCtrlXY(4, 0, 63, 0, 0)
-        self.out.LedCtrlXY(5, 0, 63, 0, 0)
+        self.frame.set(0, 0, 0, 0, 63)
+        self.frame.set(1, 0, 0, 0, 63)
+        self.frame.set(2, 0, 63, 0, 63)
+        self.frame.set(3, 0, 63, 0, 63)
+        self.frame.set(4, 0, 63, 0, 0)
+        self.frame.set(5, 0, 63, 0, 0)
         
-        self.out.LedCtrlXY(8, 1, 63, 63, 0)
-        self.out.LedCtrlXY(8, 2, 63, 63, 0)
-        self.out.LedCtrlXY(8, 3, 0, 63, 63)
-        self.out.LedCtrlXY(8, 4, 0, 63, 63)
-        self.out.LedCtrlXY(8, 5, 63, 24, 63)
-        self.out.LedCtrlXY(8, 6, 63, 24, 63)
-        self.out.LedCtrlXY(8, 7, 24, 63, 63)
-        self.out.LedCtrlXY(8, 8, 24, 63, 63)
+        self.frame.set(8, 1, 63, 63, 0)
+        self.frame.set(8, 2, 63, 63, 0)
+        self.frame.set(8, 3, 0, 63, 63)
+        self.frame.set(8, 4, 0, 63, 63)
+        self.frame.set(8, 5, 63, 24, 63)
+        self.frame.set(8, 6, 63, 24, 63)
+        self.frame.set(8, 7, 24, 63, 63)
+        self.frame.set(8, 8, 24, 63, 63)
+        self.flush()
 
     def get_octave(self):
         return self.octave_separation + self.octave
@@ -0,0 +1,112 @@
+import numpy as np
+
+class Layout:
+    """Precompiled lookup tables mapping raw device notes to output notes
+
+    Each table maps a raw note number (0-127) to a tuple of
+    (midinote, visual_midinote, x, y, side) for one device geometry,
+    so note on/off only has to do a single indexed read.
+    Rebuild with build() whenever the layout state changes
+    (tonic, position, flip, rotation, octave or options).
+
+    It also keeps the inverse for marking the board: the cells showing
+    each visual midi note, so Core.mark() doesn't scan the whole board.
+    """
+
+    FULL = 0 # whole board width
+    LEFT = 1 # left side of hardware split
+    RIGHT = 2 # right side of hardware split
+
+    def __init__(self, core):
+        self.core = core
+        self.tables = {}
+        self.cells = {} # visual midi note -> [(x, y), ...] on the board
+        self.row_cells = {} # y -> visual midi note -> [x, ...]
+
+    def build(self):
+        """Rebuild all tables from the current core state"""
+        core = self.core
+        tables = {}
+        if core.options.hardware_split:
+            left_width = core.split_point
+            right_width = core.board_w - left_width
+            tables[self.LEFT] = self.build_table(left_width)
+            tables[self.RIGHT] = self.build_table(right_width, left_width)
+        else:
+            tables[self.FULL] = self.build_table(core.board_w)
+        # launchpads are always 8 wide
+        tables[8] = self.build_table(8)
+        # swap in one assignment so callbacks never see a partial table
+        self.tables = tables
+        self.build_cells()
+
+    def state(self):
+        """Everything build() made, for the startup cache"""
+        return self.tables, self.cells, self.row_cells
+
+    def load(self, state):
+        """Use tables from state() instead of building them"""
+        self.tables, self.cells, self.row_cells = state
+
+    def build_cells(self):
+        """Build the note to cells maps, in the order Core.mark() used to scan the board"""
+        core = self.core
+        h = core.board_h
+        cells = {}
+        row_cells = {}
+        # rows outside the board are included for mark()'s only_row,
+        # which can be negative and wrap around like list indices
+        ys = list(range(h)) + list(range(-h, 0))
+        x = np.arange(core.max_width)
+        y = np.array(ys)[:, None]
+        notes = core.get_octave(x, y) * 12 + core.get_note_index(x, y, transpose=False)
+        for y, row_notes in zip(ys, notes.tolist()):
+            row = row_cells[y] = {}
+            for x, note in enumerate(row_notes):
+                row.setdefault(note, []).append(x)
+                if y >= 0:
+                    cells.setdefault(note, []).append((x, y))
+        self.cells = cells
+        self.row_cells = row_cells
+
+    def build_table(self, width, offset=0):
+        """Build the table for a region `width` wide starting at column `offset`"""
+        core = self.core
+        column_offset = core.options.column_offset
+        row_offset = core.options.row_offset
+        octave_split = core.options.octave_split
+        table = []
+        for n in range(128):
+            y = n // width
+            x = n % width
+            midinote = row_offset * y + column_offset * x
+            midinote += 32
+            if core.flipped:
+                midinote += 7
+            midinote += column_offset * offset
+            visual_midinote = midinote
+            midinote += 12 * core.octave
+            midinote += column_offset * core.position.x
+            midinote += core.tonic
+
+            # figure out if note is on left or right side
+            side = core.channel_from_split(x + offset, y, force=True)
+
+            # if the note is on the right side, we shift by the current octave split
+            if side == 1 and octave_split != 0:
+                midinote += 12 * octave_split
+
+            table.append((midinote, visual_midinote, x, y, side))
+        return table
+
+    def get(self, ch, width=None):
+        """Get the table for a channel, or for a device `width` wide"""
+        if width is None:
+            if self.core.options.hardware_split:
+                return self.tables[self.RIGHT if ch >= 8 else self.LEFT]
+            return self.tables[self.FULL]
+        try:
+            return self.tables[width]
+        except KeyError:
+            table = self.tables[width] = self.build_table(width)
+            return table
@@ -0,0 +1,110 @@
+import time
+
+class ExpressionLimiter:
+    """Per channel rate limiter and deduplicator for MPE expression
+
+    Applies to channel pressure, pitch bend and CC74 coming from the
+    instrument.  A message passes right away if at least `interval` seconds
+    have passed since the last one of its type on that channel and its value
+    moved by at least `threshold`.  Repeated values are dropped.  Anything
+    else is held back, and only the newest held value per channel and type
+    is kept.  Held values are always sent once their delay is up
+    (`interval`, or `interval * SETTLE` for changes below the threshold),
+    so the final state is never lost.
+    """
+
+    SETTLE = 4
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, interval, threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.last_time = {} # key -> time the last value was sent
+        self.last_value = {} # key -> last value sent
+        self.pending = {} # key -> [deadline, data, timestamp, force_channel]
+
+        self.received = 0 # expression messages received
+        self.passed = 0 # expression messages sent
+
+    def key_value(self, data):
+        """Get the (key, value) for an expression message, otherwise (None, None)"""
+        status = data[0]
+        kind = status & 0xF0
+        if kind == 0xE0:
+            return status, (data[2] << 7) | data[1]
+        if kind == 0xD0:
+            return status, data[1] << 7
+        if kind == 0xB0 and data[1] == 74:
+            return status, data[2] << 7
+        return None, None
+
+    def filter(self, data, timestamp, force_channel=None):
+        """Returns True if the message should be sent now"""
+        key, value = self.key_value(data)
+        if key is None:
+            return True
+        self.received += 1
+        now = self.clock()
+        last_value = self.last_value.get(key)
+        if last_value is None:
+            self.sent(key, value, now)
+            return True
+        if value == last_value:
+            # back to what was last sent, so anything held is stale
+            self.pending.pop(key, None)
+            return False
+        last_time = self.last_time[key]
+        big = abs(value - last_value) >= self.threshold << 7
+        if big and now - last_time >= self.interval:
+            self.pending.pop(key, None)
+            self.sent(key, value, now)
+            return True
+        if big:
+            deadline = last_time + self.interval
+        else:
+            deadline = last_time + self.interval * self.SETTLE
+        pending = self.pending.get(key)
+        if pending is not None:
+            deadline = min(deadline, pending[0])
+        self.pending[key] = [deadline, data, timestamp, force_channel]
+        return False
+
+    def sent(self, key, value, now):
+        self.last_time[key] = now
+        self.last_value[key] = value
+        self.passed += 1
+
+    def release(self, key, now):
+        deadline, data, timestamp, force_channel = self.pending.pop(key)
+        self.sent(key, self.key_value(data)[1], now)
+        return data, timestamp, force_channel
+
+    def due(self):
+        """Remove and return the held messages whose delay is up"""
+        if not self.pending:
+            return []
+        now = self.clock()
+        keys = [key for key, pending in self.pending.items() if pending[0] <= now]
+        return [self.release(key, now) for key in keys]
+
+    def take_channel(self, ch):
+        """Remove and return all held messages on channel `ch` (ex: before a note)"""
+        if not self.pending:
+            return []
+        now = self.clock()
+        keys = [key for key in self.pending if key & 0x0F == ch]
+        return [self.release(key, now) for key in keys]
+
+    def timeout(self):
+        """Seconds until the next held message is due, or None"""
+        if not self.pending:
+            return None
+        deadline = min(pending[0] for pending in self.pending.values())
+        return max(0.0, deadline - self.clock())
+
+    def stats(self):
+        reduction = 100.0 * (1.0 - self.passed / self.received) if self.received else 0.0
+        return "Expression: %d received, %d sent (%.1f%% reduction)" % (
+            self.received, self.passed, reduction
+        )
@@ -1,6 +1,58 @@
-from device import Device, DeviceSettings
+from src.device import Device, DeviceSettings
 
 class LinnStrument(Device):
     def __init__(self):
         super().__init__()
 
+class LinnLights:
+    """Shadow framebuffer of the LinnStrument's pad lights
+
+    Remembers the color the device shows on each pad and which column and
+    row are currently selected (CC20 and CC21), so a pad is only sent when
+    its color changes and the column/row CCs are skipped if unchanged.
+    """
+
+    WIDTH = 26 # control column (0) plus up to 25 note columns
+    HEIGHT = 8
+
+    def __init__(self, send):
+        self.send = send # send(channel, cc, value)
+        self.shown = [[None] * self.WIDTH for y in range(self.HEIGHT)]
+        self.column = None
+        self.row = None
+
+        self.sent = 0 # messages sent
+        self.saved = 0 # messages skipped
+
+    def set(self, column, row, color):
+        """Set pad light at device column, row to color (LinnStrument color number)"""
+        if 0 <= row < self.HEIGHT and 0 <= column < self.WIDTH:
+            if self.shown[row][column] == color:
+                self.saved += 3
+                return
+            self.shown[row][column] = color
+        if column != self.column:
+            self.column = column
+            self.send(0, 20, column)
+            self.sent += 1
+        else:
+            self.saved += 1
+        if row != self.row:
+            self.row = row
+            self.send(0, 21, row)
+            self.sent += 1
+        else:
+            self.saved += 1
+        self.send(0, 22, color)
+        self.sent += 1
+
+    def refresh(self):
+        """Forget what the device shows, so every pad set is sent again"""
+        self.shown = [[None] * self.WIDTH for y in range(self.HEIGHT)]
+        self.column = None
+        self.row = None
+
+    def stats(self):
+        total = self.sent + self.saved
+        saved = 100.0 * self.saved / total if total else 0.0
+        return "LinnStrument lights: %d sent, %d saved (%.1f%%)" % (self.sent, self.saved, saved)
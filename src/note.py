@@ -1,19 +1,108 @@
-class Note:
-    def __init__(self):
-        # self.bend = 0.0
-        # self.pressed = False
-        # self.intensity = 0.0  # how much to light marker up (in app)
-        self.ipressure = 0 # 0, 127
-        self.pressure = 0.0  # how much the note is being pressed
-        # self.dirty = False
-        self.location = None  # on board
-        self.midinote = None
-        self.split = 0
-        self.note = None
+from array import array
+from glm import ivec2
+
+class NoteState:
+    """Per channel note state, stored as parallel arrays indexed by channel
+
+    Nothing is allocated when a note is played, only array slots change.
+    `count` is the number of channels holding a note.  For code that wants
+    attribute access, notes[ch] is a Note view of one channel.
+    """
 
+    def __init__(self, channels=16):
+        self.channels = channels
+        self.active = bytearray(channels) # note held
+        self.x = array('i', [-1] * channels) # location of the last note, -1 if none yet
+        self.y = array('i', [-1] * channels)
+        self.midinote = array('i', [-1] * channels)
+        self.split = bytearray(channels)
+        self.pressure = array('d', [0.0] * channels) # how much the note is being pressed
+        self.ipressure = array('i', [0] * channels) # 0, 127
         # apply additional bend?
-        self.bend = 0.0
-        self.y_bend = 0.0
+        self.bend = array('d', [0.0] * channels)
+        self.bend_value = array('i', [8192] * channels) # 14-bit value of the last bend
+        self.y_bend = array('d', [0.0] * channels)
+        self.count = 0
+        self.views = [Note(self, ch) for ch in range(channels)]
+
+    def on(self, ch, x, y, pressure, midinote, split):
+        if not self.active[ch]:
+            self.active[ch] = 1
+            self.count += 1
+        self.x[ch] = x
+        self.y[ch] = y
+        self.pressure[ch] = pressure
+        self.midinote[ch] = midinote
+        self.split[ch] = split
+
+    def off(self, ch):
+        """Release the channel's note (its location is kept for routing)"""
+        if self.active[ch]:
+            self.active[ch] = 0
+            self.count -= 1
+
+    def __getitem__(self, ch):
+        return self.views[ch]
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def __len__(self):
+        return self.channels
+
+class Note:
+    """View of one channel of NoteState"""
+
+    __slots__ = ('state', 'ch')
+
+    def __init__(self, state, ch):
+        self.state = state
+        self.ch = ch
+
+    @property
+    def location(self):
+        """Board location as an ivec2, None if no note was played on the channel"""
+        x = self.state.x[self.ch]
+        if x < 0:
+            return None
+        return ivec2(x, self.state.y[self.ch])
+
+    @property
+    def active(self):
+        return bool(self.state.active[self.ch])
+
+    @property
+    def midinote(self):
+        n = self.state.midinote[self.ch]
+        return None if n < 0 else n
+
+    @property
+    def split(self):
+        return self.state.split[self.ch]
+
+    @property
+    def pressure(self):
+        return self.state.pressure[self.ch]
+
+    @property
+    def ipressure(self):
+        return self.state.ipressure[self.ch]
+
+    @property
+    def bend(self):
+        return self.state.bend[self.ch]
+
+    @bend.setter
+    def bend(self, value):
+        self.state.bend[self.ch] = value
+
+    @property
+    def y_bend(self):
+        return self.state.y_bend[self.ch]
+
+    @y_bend.setter
+    def y_bend(self, value):
+        self.state.y_bend[self.ch] = value
 
     # def logic(self, dt):
     #     if self.pressed:  # pressed, fade to pressure value
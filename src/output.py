@@ -0,0 +1,132 @@
+import threading
+
+class MidiWriter:
+    """Batches outgoing MIDI per device
+
+    Messages written from the batching thread (the MIDI engine) are
+    queued per device and sent together by flush().  Pressure and pitch
+    bend values that are superseded before the flush are dropped.
+    Messages written from any other thread are sent right away.
+
+    Batching only saves the superseded messages: each remaining message
+    is still one send_raw() call and one write to the port.  RtMidi has
+    no multi-message send (rtmidi2's send_messages() loops over the
+    messages the same way), and send_messages() doesn't add the channel
+    to the message type in every rtmidi2 version, so it isn't used.
+    """
+
+    def __init__(self, monitor=None):
+        self.monitor = monitor # optional LatencyMonitor
+        self.names = {} # device -> name for latency reports
+        self.stamps = {} # device -> input event stamp for each pending message
+        self.queues = {} # device -> list of pending messages
+        self.slots = {} # device -> {channel: {coalescing key: queue index}}
+        self.thread = None # ident of the batching thread
+
+        self.sent = 0 # messages handed to the devices
+        self.coalesced = 0 # superseded pressure/bend messages not sent
+        self.dropped = 0 # messages not sent because the device isn't connected
+        self.flushes = 0
+
+    def write(self, dev, msg):
+        if not dev:
+            self.dropped += 1
+            return
+        if threading.get_ident() != self.thread:
+            dev.send_raw(*msg)
+            self.sent += 1
+            return
+
+        try:
+            queue = self.queues[dev]
+            slots = self.slots[dev]
+        except KeyError:
+            queue = self.queues[dev] = []
+            slots = self.slots[dev] = {}
+            self.stamps[dev] = []
+
+        if self.monitor:
+            self.stamps[dev].append(self.monitor.current)
+
+        status = msg[0]
+        kind = status & 0xF0
+        ch = status & 0x0F
+        if kind == 0xD0 or kind == 0xE0 or kind == 0xA0:
+            key = (status, msg[1]) if kind == 0xA0 else status
+            try:
+                channel_slots = slots[ch]
+            except KeyError:
+                channel_slots = slots[ch] = {}
+            i = channel_slots.get(key)
+            if i is not None:
+                queue[i] = None
+                self.coalesced += 1
+            channel_slots[key] = len(queue)
+        elif kind == 0x90 or kind == 0x80:
+            # don't move expression across notes on the same channel
+            slots.pop(ch, None)
+        queue.append(tuple(msg))
+
+    def flush(self):
+        """Send all queued messages, in order"""
+        for dev, queue in self.queues.items():
+            if not queue:
+                continue
+            self.slots[dev].clear()
+            send_raw = dev.send_raw
+            sent = 0
+            for msg in queue:
+                if msg is not None:
+                    send_raw(*msg)
+                    sent += 1
+            self.sent += sent
+            if self.monitor:
+                self.record(dev, queue)
+            queue.clear()
+        self.flushes += 1
+
+    def record(self, dev, queue):
+        """Record latency for the messages just sent to `dev`"""
+        monitor = self.monitor
+        now = monitor.clock()
+        name = self.names.get(dev, "?")
+        stamps = self.stamps[dev]
+        for msg, stamp in zip(queue, stamps):
+            if msg is not None and stamp is not None:
+                monitor.record(msg, name, now - stamp)
+        stamps.clear()
+
+    def stats(self):
+        total = self.sent + self.coalesced
+        saved = 100.0 * self.coalesced / total if total else 0.0
+        return "MIDI out: %d sent, %d coalesced (%.1f%% saved), %d dropped (no device), %d flushes" % (
+            self.sent, self.coalesced, saved, self.dropped, self.flushes
+        )
+
+
+class MidiSink:
+    """Stand-in for an rtmidi2 MidiOut that discards messages
+
+    Used for replays, optionally writing each message to `capture` (an
+    open text file) as a line of hex bytes prefixed with the device name.
+    """
+
+    def __init__(self, name, capture=None):
+        self.name = name
+        self.capture = capture
+        self.count = 0
+
+    def send_raw(self, *msg):
+        self.count += 1
+        if self.capture:
+            self.capture.write(self.name + " " + " ".join("%02x" % b for b in msg) + "\n")
+
+    def send_messages(self, kind, msgs):
+        for ch, v1, v2 in msgs:
+            self.send_raw(kind | ch, v1, v2)
+
+    def close(self):
+        pass
+
+    def abort(self):
+        pass
@@ -0,0 +1,116 @@
+import time
+from collections import deque
+
+class FrameProfiler:
+    """Times the phases of each frame, with rolling statistics
+
+    The main loop calls lap(phase) after each phase, which adds the time
+    since the previous lap to that phase, and end_frame() once per frame.
+    The MIDI engine adds its own time with engine_lap(), it runs on its own
+    thread, so its phases are totals that the frame picks up the change of.
+
+    Optionally every frame is written as a row of a CSV file.
+    """
+
+    WINDOW = 120 # frames kept for the rolling statistics
+
+    # in frame order, the engine phases run on the engine thread
+    FRAME_PHASES = ("wait", "logic", "input", "chords", "gui", "render", "draw", "flip")
+    ENGINE_PHASES = ("midi", "lights", "flush")
+    PHASES = FRAME_PHASES + ENGINE_PHASES
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, engine, fps, csv=""):
+        self.engine = engine
+        self.budget = 1.0 / fps # frame deadline
+        self.current = dict.fromkeys(self.PHASES, 0.0)
+        self.history = {name: deque(maxlen=self.WINDOW) for name in self.PHASES + ("work", "events")}
+        self.engine_totals = dict.fromkeys(self.ENGINE_PHASES, 0.0) # written by the engine thread
+        self.engine_seen = dict(self.engine_totals)
+        self.handled = engine.handled
+        self.frames = 0
+        self.missed = 0
+        self.start = self.last = self.clock()
+        self.csv = None
+        if csv:
+            self.csv = open(csv, "w")
+            self.csv.write("frame,time," + ",".join(name + "_ms" for name in self.PHASES) + ",work_ms,events,missed\n")
+
+    def lap(self, phase):
+        """Add the time since the last lap to `phase` (main thread)"""
+        now = self.clock()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def engine_lap(self, phase, start):
+        """Add the time since `start` to an engine phase, returns the time now (engine thread)"""
+        now = self.clock()
+        self.engine_totals[phase] += now - start
+        return now
+
+    def end_frame(self):
+        """Store the frame's times and start the next one"""
+        self.lap("draw") # anything left over
+        current = self.current
+        for name in self.ENGINE_PHASES:
+            total = self.engine_totals[name]
+            current[name] = total - self.engine_seen[name]
+            self.engine_seen[name] = total
+        handled = self.engine.handled
+        events = handled - self.handled
+        self.handled = handled
+
+        # waiting for the next frame isn't work
+        work = sum(current[name] for name in self.FRAME_PHASES) - current["wait"]
+        missed = work > self.budget
+        if missed:
+            self.missed += 1
+        self.frames += 1
+
+        history = self.history
+        for name, value in current.items():
+            history[name].append(value)
+            current[name] = 0.0
+        history["work"].append(work)
+        history["events"].append(events)
+
+        if self.csv:
+            row = [str(self.frames), "%.6f" % (self.last - self.start)]
+            row += ["%.3f" % (history[name][-1] * 1000.0) for name in self.PHASES]
+            row += ["%.3f" % (work * 1000.0), str(events), "1" if missed else "0"]
+            self.csv.write(",".join(row) + "\n")
+
+    def stats(self, name):
+        """(mean, max) of a phase over the window, in ms (events are a count)"""
+        values = self.history[name]
+        if not values:
+            return 0.0, 0.0
+        scale = 1 if name == "events" else 1000.0
+        return sum(values) / len(values) * scale, max(values) * scale
+
+    def hud(self):
+        """Short summary for the status bar"""
+        s = "frame %.1f/%.1fms" % self.stats("work")
+        phases = sorted(
+            ((self.stats(name)[0], name) for name in self.PHASES if name != "wait"),
+            reverse=True
+        )
+        for mean, name in phases[:3]:
+            s += "  %s %.1f" % (name, mean)
+        s += "  %.0f events/frame  missed %d" % (self.stats("events")[0], self.missed)
+        return s
+
+    def report(self):
+        lines = ["Frames: %d, %d over %.1fms (last %d frames, mean/max ms)" % (
+            self.frames, self.missed, self.budget * 1000.0, len(self.history["work"])
+        )]
+        for name in self.PHASES + ("work",):
+            lines.append("  %-8s %7.2f %7.2f" % ((name,) + self.stats(name)))
+        lines.append("  %-8s %7.1f %7.0f" % (("events",) + self.stats("events")))
+        return "\n".join(lines)
+
+    def close(self):
+        if self.csv:
+            self.csv.close()
+            self.csv = None
@@ -0,0 +1,203 @@
+import mmap, struct, time, threading
+from src.output import MidiSink
+
+MAGIC = b"MMREC3\n"
+
+# record header: time (seconds since the recording started), source,
+#  port (launchpad index), number of values, then that many int16 values
+RECORD = struct.Struct("<dBBH")
+
+MIDI_IN = 0 # cb_midi_in(data, timestamp), the message bytes
+FOOT_IN = 1 # cb_foot(data, timestamp), the message bytes
+LAUNCHPAD_IN = 2 # cb_launchpad_in(lp, msg, timestamp), the message bytes
+LAUNCHPAD_DEVICE = 3 # a launchpad at `port`, its mode name as bytes
+
+
+class Recorder:
+    """Streams input events to an append-only binary file for replaying
+
+    Events are timed by stamp() in the input callback, when they arrive,
+    and recorded by the handler from wrap() on the engine thread, in the
+    order they are handled, before the handler changes them.  An event
+    that can't be recorded is still handled.
+    """
+
+    def __init__(self, fn, clock=time.monotonic):
+        self.file = open(fn, "wb")
+        self.file.write(MAGIC)
+        self.clock = clock
+        self.start = clock()
+        self.count = 0
+        self.errors = 0
+
+    def write(self, t, source, port, values):
+        """Record an event that arrived at clock() time `t`, False if it couldn't be"""
+        try:
+            n = len(values)
+            self.file.write(
+                RECORD.pack(t - self.start, source, port, n)
+                + struct.pack("<%dh" % n, *values)
+            )
+        except Exception as e:
+            if not self.errors:
+                print("Recording error:", e)
+            self.errors += 1
+            return False
+        self.count += 1
+        return True
+
+    def device(self, lp):
+        """Record a connected launchpad, so its events can be replayed"""
+        self.write(self.clock(), LAUNCHPAD_DEVICE, lp.index, lp.mode.encode())
+
+    def stamp(self, callback):
+        """Get an input callback that passes the time to `callback` first"""
+        clock = self.clock
+        def stamped(*args):
+            return callback(clock(), *args)
+        return stamped
+
+    def wrap(self, source, handler):
+        """Get a handler that records its events, then calls `handler`
+
+        It takes the time from stamp() before the handler's arguments.
+        """
+        write = self.write
+        if source == LAUNCHPAD_IN:
+            def recorded(t, lp, msg, timestamp=0):
+                write(t, source, lp.index, msg)
+                handler(lp, msg, timestamp)
+        else:
+            def recorded(t, data, timestamp):
+                write(t, source, 0, data)
+                handler(data, timestamp)
+        return recorded
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            print("Recorded", self.count, "events")
+            if self.errors:
+                print(self.errors, "events could not be recorded")
+
+
+class Replayer(threading.Thread):
+    """Plays back a recording through the core's input handlers
+
+    The file is memory mapped and the events are fed to the MIDI engine
+    like the devices would, at their recorded times divided by `speed`
+    (0 is as fast as possible).  Launchpads are recreated without a
+    device, so their lights are still computed but not sent.
+
+    Output goes to the stand-in devices made with sink().  Given a
+    `capture` filename, the messages sent while replaying are written to
+    it, and each event is handled before the next one is sent, so output
+    batching doesn't depend on timing and captures are repeatable.
+    """
+
+    def __init__(self, fn, speed=1.0, capture=""):
+        super().__init__(name="replay", daemon=True)
+        self.speed = speed
+        self.capture = open(capture, "w") if capture else None
+        self.lockstep = bool(capture)
+        self.sinks = []
+        with open(fn, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[:len(MAGIC)] != MAGIC:
+            raise ValueError(fn + " is not a midimech recording (or is from an older version)")
+        self.core = None
+        self.finished = False
+        self.count = 0
+        self.skipped = 0 # launchpad events without a launchpad
+        self.elapsed = 0.0
+
+    def sink(self, name):
+        """Make a stand-in MIDI output for the core"""
+        sink = MidiSink(name)
+        self.sinks.append(sink)
+        return sink
+
+    def __iter__(self):
+        """Yield (time, source, port, values) for every event"""
+        data = self.data
+        offset = len(MAGIC)
+        end = len(data) - RECORD.size
+        while offset <= end:
+            t, source, port, n = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            values = list(struct.unpack_from("<%dh" % n, data, offset))
+            offset += 2 * n
+            yield t, source, port, values
+
+    def start(self, core):
+        self.core = core
+        engine = core.engine
+        # blocking inputs, so nothing is dropped when going fast
+        self.inputs = {
+            MIDI_IN: engine.input(core.cb_midi_in, block=True),
+            FOOT_IN: engine.input(core.cb_foot, block=True),
+            LAUNCHPAD_IN: engine.input(core.cb_launchpad_in, block=True),
+        }
+        # handled after everything before it
+        self.done = threading.Event()
+        self.finish = engine.input(self.done.set)
+        super().start()
+
+    def run(self):
+        from src.launchpad import Launchpad
+
+        core = self.core
+        inputs = self.inputs
+        launchpads = {}
+        speed = self.speed
+        lockstep = self.lockstep
+        # let the device setup finish first
+        core.rpn_queue.wait()
+        self.sync()
+        for sink in self.sinks:
+            sink.capture = self.capture
+        start = time.perf_counter()
+        for t, source, port, values in self:
+            if speed > 0.0:
+                delay = start + t / speed - time.perf_counter()
+                if delay > 0.0:
+                    time.sleep(delay)
+            if source == LAUNCHPAD_DEVICE:
+                lp = launchpads[port] = Launchpad(core, None, bytes(values).decode(), port)
+                core.launchpads.append(lp)
+                continue
+            if source == LAUNCHPAD_IN:
+                lp = launchpads.get(port)
+                if not lp:
+                    self.skipped += 1
+                    continue
+                inputs[LAUNCHPAD_IN](lp, values)
+            else:
+                inputs[source](values, 0)
+            self.count += 1
+            if lockstep:
+                self.sync()
+        self.sync()
+        self.elapsed = time.perf_counter() - start
+        for sink in self.sinks:
+            sink.capture = None
+        self.finished = True
+
+    def sync(self):
+        """Wait until the engine has handled everything sent so far"""
+        self.done.clear()
+        self.finish()
+        self.done.wait()
+
+    def close(self):
+        if self.capture:
+            self.capture.close()
+            self.capture = None
+
+    def stats(self):
+        rate = self.count / self.elapsed if self.elapsed else 0.0
+        s = "Replay: %d events in %.3fs (%.0f events/s)" % (self.count, self.elapsed, rate)
+        if self.skipped:
+            s += ", %d launchpad events skipped" % self.skipped
+        return s
@@ -0,0 +1,85 @@
+import threading, time
+from collections import deque
+
+class RpnQueue(threading.Thread):
+    """Sends LinnStrument RPNs in the background, paced for the device
+
+    The LinnStrument needs time to apply each RPN, so instead of sleeping
+    after every one (which froze the caller), they are queued here and
+    handed to send(num, value) one at a time, `interval` seconds apart.
+    RPNs are sent in the order they were set, but one whose value is
+    already known to be set on the device is skipped.
+    """
+
+    INTERVAL = 0.05 # seconds between RPNs
+    sleep = staticmethod(time.sleep)
+
+    def __init__(self, send, interval=INTERVAL):
+        super().__init__(name="rpn queue", daemon=True)
+        self.send = send # send(num, value), called from this thread
+        self.interval = interval
+        self.queue = deque() # (num, value) waiting to be sent
+        self.known = {} # num -> value last sent
+        self.cond = threading.Condition()
+        self.running = False
+        self.applied = threading.Event() # set when the queue is empty
+        self.applied.set()
+        self.on_applied = None # on_applied(sent, skipped), called from this thread
+
+        self.sent = 0
+        self.skipped = 0
+
+    def set(self, num, value):
+        """Queue RPN `num` to be set to `value`"""
+        with self.cond:
+            self.queue.append((num, value))
+            self.applied.clear()
+            self.cond.notify()
+
+    def wait(self, timeout=None):
+        """Wait until all queued RPNs are sent, returns False on timeout"""
+        return self.applied.wait(timeout)
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def stop(self, timeout=None):
+        """Stop the thread once everything queued has been sent"""
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        sent = skipped = 0 # since the queue was last empty
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.queue:
+                    break
+                num, value = self.queue.popleft()
+
+            if self.known.get(num) == value:
+                skipped += 1
+            else:
+                self.send(num, value)
+                self.known[num] = value
+                sent += 1
+                if self.interval:
+                    self.sleep(self.interval)
+
+            with self.cond:
+                if self.queue:
+                    continue
+                self.applied.set()
+            self.sent += sent
+            self.skipped += skipped
+            if self.on_applied:
+                self.on_applied(sent, skipped)
+            sent = skipped = 0
+
+    def stats(self):
+        return "RPN: %d sent, %d already set" % (self.sent, self.skipped)
@@ -0,0 +1,79 @@
+class ScaleDB:
+    """scales.yaml compiled into 12-bit pitch class masks
+
+    Bit n of a mask is set if the note n semitones above the root is in
+    the scale (the 'x' at position n in the notes string).  All modes of
+    every scale are rotated once when loading, so changing modes and
+    testing notes are just lookups and bit tests.
+    """
+
+    FULL = 0xFFF
+
+    def __init__(self, db):
+        self.db = db
+        self.modes = [] # scale index -> mask of each mode
+        self.names = {} # mask -> (scale name, mode name)
+        self.count = 0 # number of distinct scales and modes
+
+        for scale in db:
+            mask = self.mask(scale['notes'])
+            modes = []
+            shift = 0
+            for i in range(bin(mask).count('1')):
+                modes.append(self.rotate(mask, shift))
+                # next note in the scale
+                shift += 1
+                while not self.rotate(mask, shift) & 1:
+                    shift += 1
+            self.modes.append(modes)
+
+            if scale.get('duplicates') is True:
+                # symmetric scales repeat their own modes
+                self.count += 1
+                for i, mode in enumerate(modes):
+                    self.names.setdefault(mode, (scale['name'], self.mode_name(scale, i)))
+                continue
+            self.count += len(modes)
+            for i, mode in enumerate(modes):
+                name = (scale['name'], self.mode_name(scale, i))
+                if mode in self.names:
+                    print('Duplicate scale: ', ' '.join(self.names[mode]), ' and ', ' '.join(name))
+                    break
+                self.names[mode] = name
+
+    @staticmethod
+    def mask(notes: str):
+        """Get the mask for a notes string (ex: 'x.x.xx.x.x.x')"""
+        mask = 0
+        for i, c in enumerate(notes[:12]):
+            if c == 'x':
+                mask |= 1 << i
+        return mask
+
+    @staticmethod
+    def rotate(mask, n):
+        """Rotate mask so it starts n semitones higher"""
+        n %= 12
+        return ((mask >> n) | (mask << (12 - n))) & ScaleDB.FULL
+
+    @staticmethod
+    def mode_name(scale, mode):
+        try:
+            return scale['modes'][mode]
+        except (KeyError, IndexError, TypeError):
+            return 'Mode ' + str(mode + 1)
+
+    def state(self):
+        """Everything compiled from the database, for the startup cache"""
+        return self.db, self.modes, self.names, self.count
+
+    @classmethod
+    def restore(cls, state):
+        """Make a ScaleDB from state() without compiling the database again"""
+        scales = cls.__new__(cls)
+        scales.db, scales.modes, scales.names, scales.count = state
+        return scales
+
+    def lookup(self, mask):
+        """Get (scale name, mode name) for a mask, or None"""
+        return self.names.get(mask)
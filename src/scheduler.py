@@ -0,0 +1,58 @@
+import threading, time
+
+class FrameScheduler:
+    """Runs frames at full rate only while something is changing
+
+    The main loop reports activity (input, something drawn)
+    and keeps running at `fps` until GRACE seconds after the last of it.
+    After that it sleeps until an input event, a wake() from another
+    thread (ex: the MIDI engine publishing new state) or IDLE_TIMEOUT.
+
+    To not miss a wake(), the loop sets `sleeping` first, then checks
+    again for anything to do, then waits.
+    """
+
+    GRACE = 0.5 # seconds at full rate after the last activity
+    IDLE_TIMEOUT = 0.5 # longest sleep, for state that is only polled (ex: quitting)
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, fps):
+        self.frame = 1.0 / fps
+        self.active_until = 0.0
+        self.sleeping = False
+        self.event = threading.Event()
+        self.on_wake = None # called by wake() while sleeping (ex: to post a GUI event)
+
+        self.frames = 0
+        self.sleeps = 0
+        self.slept = 0.0
+
+    def activity(self):
+        """Something is changing, run at full rate for a while"""
+        self.active_until = self.clock() + self.GRACE
+
+    def idle(self):
+        return self.clock() >= self.active_until
+
+    def wake(self):
+        """Wake the main loop if it is sleeping (any thread)"""
+        if self.sleeping:
+            self.event.set()
+            if self.on_wake:
+                self.on_wake()
+
+    def sleep(self, wait=None):
+        """Sleep until woken, `wait(timeout)` waits for input instead of wake() alone"""
+        start = self.clock()
+        if wait:
+            wait(self.IDLE_TIMEOUT)
+        else:
+            self.event.wait(self.IDLE_TIMEOUT)
+        self.event.clear()
+        self.sleeping = False
+        self.sleeps += 1
+        self.slept += self.clock() - start
+
+    def stats(self):
+        return "Frames: %d, slept %d times (%.1fs idle)" % (self.frames, self.sleeps, self.slept)
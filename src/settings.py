@@ -34,6 +34,13 @@ class Settings:
     # lite mode (no extra gfx, less processing)
     lite: bool = False
 
+    # headless mode (no window, pygame or pygame_gui) (also: --headless)
+    headless: bool = False
+
+    # keep scales, colors and layout between runs in the user's cache
+    #  folder, to start faster (turn off with --no-cache)
+    cache: bool = True
+
     # Custom velocity curve exponent, ex: 0.5 = more sensitive
     velocity_curve: float = 1.0
     
@@ -85,6 +92,8 @@ class Settings:
 
     # launchpad viberato method (off, mod, or pitch)
     vibrato: str = 'mod'
+    # vibrato messages per second (Hz)
+    vibrato_rate: float = 50.0
     
     # Set scale based on left hand chord (not yet impl)
     jazz: bool = False
@@ -106,5 +115,37 @@ class Settings:
     # octave splitting the linn and transposing octaves on the right side
     octave_split: int = 0
 
+    # print performance statistics on exit (also: --stats)
+    stats: bool = False
+
+    # measure MIDI latency from input to output (also: --latency)
+    #  percentiles are printed on exit, with F2, or with SIGUSR1
+    latency: bool = False
+
+    # time each part of a frame (also: --profile), shown in the status bar
+    #  (toggle with F3) and printed on exit
+    profile: bool = False
+    # write the frame times to this CSV file, one row per frame
+    #  (also: --profile-csv <file>, turns on profile)
+    profile_csv: str = ""
+
+    # record input events to a file, for replaying (also: --record <file>)
+    record: str = ""
+    # replay a recording instead of using the MIDI devices (also: --replay <file>)
+    replay: str = ""
+    # replay speed, 2.0 is twice as fast, 0 is as fast as possible (also: --replay-speed <speed>)
+    replay_speed: float = 1.0
+    # write the MIDI output of a replay to this file, one message per line
+    #  (also: --capture <file>), otherwise it is discarded
+    capture: str = ""
+
+    # Rate limit pressure, pitch bend and CC74 from the instrument per channel
+    #  (for synths that can't keep up with 10 fingers of MPE)
+    expression_limit: bool = False
+    # minimum time between messages of the same type on a channel (ms)
+    expression_interval: float = 5.0
+    # smallest value change (0-127) sent right away, smaller changes are delayed
+    expression_threshold: int = 1
+
 DEFAULT_OPTIONS = Settings()
 
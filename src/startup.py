@@ -0,0 +1,73 @@
+import sys, time, builtins
+
+class StartupProfiler:
+    """Timeline of the steps of starting up, for --profile-startup
+
+    mark(step) records the time since the previous mark.  Imports of
+    other packages are timed too (including what they import), and shown
+    under the step they happened in.  The timeline is printed by report(),
+    marks after that are printed as they happen.
+    """
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.start = self.last = self.clock()
+        self.steps = [] # (name, end time)
+        self.imports = [] # (module, end time, duration)
+        self.reported = not enabled
+        self.real_import = None
+        if enabled:
+            self.watch_imports()
+
+    def watch_imports(self):
+        self.real_import = real_import = builtins.__import__
+        imports = self.imports
+        clock = self.clock
+        timing = [False] # inside a timed import
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if timing[0] or level or name in sys.modules or name.startswith("src."):
+                return real_import(name, globals, locals, fromlist, level)
+            timing[0] = True
+            start = clock()
+            try:
+                return real_import(name, globals, locals, fromlist, level)
+            finally:
+                timing[0] = False
+                end = clock()
+                imports.append((name, end, end - start))
+
+        builtins.__import__ = timed_import
+
+    def mark(self, step):
+        if not self.enabled:
+            return
+        now = self.clock()
+        self.steps.append((step, now))
+        if self.reported:
+            print("%8.3fs %+9.1fms  %s" % (now - self.start, (now - self.last) * 1000.0, step))
+        self.last = now
+
+    def report(self):
+        """Print the timeline so far"""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        if self.real_import:
+            builtins.__import__ = self.real_import
+        print("Startup timeline (total, step, imports in the step):")
+        last = self.start
+        imports = iter(self.imports)
+        imported = next(imports, None)
+        for step, end in self.steps:
+            print("%8.3fs %+9.1fms  %s" % (end - self.start, (end - last) * 1000.0, step))
+            while imported and imported[1] <= end:
+                print("%22.1fms    import %s" % (imported[2] * 1000.0, imported[0]))
+                imported = next(imports, None)
+            last = end
+
+
+# started as early as possible, so the imports are included
+STARTUP = StartupProfiler("--profile-startup" in sys.argv)
@@ -3,28 +3,21 @@ from dataclasses import dataclass
 import glm
 from src.constants import *
 
-# suppress pygame messages to keep console output clean
-with open(os.devnull, "w") as devnull:
-    stdout = sys.stdout
-    sys.stdout = devnull
-    import pygame, pygame.midi, pygame.gfxdraw
-
-    sys.stdout = stdout
-import pygame_gui
-
 # import mido
 from collections import OrderedDict
 from configparser import ConfigParser
 
-try:
-    import webcolors
-except ImportError:
-    error("The project dependencies have changed! Run the requirements setup command again!")
-
 def error(msg):
     print(msg)
     sys.exit(1)
 
+def get_arg(name, default):
+    """Get the value after command line flag `name` (ex: --record file)"""
+    try:
+        return sys.argv[sys.argv.index(name) + 1]
+    except (ValueError, IndexError):
+        return default
+
 def sign(val):
     tv = type(val)
     if tv is int:
@@ -61,18 +54,6 @@ class Object:
         self.surface = kwargs.get("surface", None)
 
 
-class Screen(Object):
-    def __init__(self, core, screen):
-        self.core = core
-        self.pos = glm.vec2(0.0, 0.0)
-        self.sz = glm.vec2(core.screen_w, core.screen_h)
-        self.surface = pygame.Surface(core.screen_sz).convert()
-        self.screen = screen
-
-    def render(self):
-        self.screen.blit(self.surface, (0, 0))
-
-
 def nothing():
     pass
 
@@ -112,6 +93,14 @@ def compose_pitch_bend(pitch_bend_norm):
     pitch_bend_bytes = [pitch_bend_value & 0x7F, (pitch_bend_value >> 7) & 0x7F]
     return pitch_bend_bytes
 
+def pitch_bend_table(offset=0.0):
+    """compose_pitch_bend(decompose_pitch_bend(value) + offset) for every 14-bit value"""
+    table = []
+    for value in range(16384):
+        lsb, msb = compose_pitch_bend((value - 8192) / 8192.0 + offset)
+        table.append((lsb, msb))
+    return table
+
 def decode_value(value):
     lsb = value & 0x7F
     msb = (value >> 7) & 0x7F
@@ -121,6 +110,11 @@ def decode_value(value):
 #     return bend_semitones
 
 def get_color(col):
+    # only needed when the startup cache is out of date
+    try:
+        import webcolors
+    except ImportError:
+        error("The project dependencies have changed! Run the requirements setup command again!")
     if col.startswith("#"):
         return webcolors.hex_to_rgb(col)
     return webcolors.name_to_rgb(col)
@@ -0,0 +1,87 @@
+import os, sys, pickle
+
+import yaml
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.cache import StartupCache
+from src.scales import ScaleDB
+
+
+def make_cache(tmp_path):
+    source = tmp_path / "settings.ini"
+    source.write_text("[general]\n")
+    return StartupCache([str(source)], str(tmp_path / "startup.cache")), source
+
+
+def test_round_trip(tmp_path):
+    cache, source = make_cache(tmp_path)
+    assert cache.load() is None
+    data = {"colors": [(255, 0, 0)], "layout": ({0: [(32, 32, 0, 0, 0)]}, {}, {})}
+    cache.save(data)
+    assert StartupCache(cache.sources, cache.fn).load() == data
+    source.write_text("[general]\nlite=true\n")
+    assert StartupCache(cache.sources, cache.fn).load() is None
+
+
+def test_scales_round_trip(tmp_path):
+    cache, source = make_cache(tmp_path)
+    with open(os.path.join(ROOT, "scales.yaml"), "r") as f:
+        scales = ScaleDB(yaml.safe_load(f))
+    cache.load()
+    cache.save({"scales": scales.state()})
+    restored = ScaleDB.restore(StartupCache(cache.sources, cache.fn).load()["scales"])
+    assert restored.modes == scales.modes
+    assert restored.names == scales.names
+    assert restored.count == scales.count
+
+
+class Payload:
+    def __reduce__(self):
+        return (os.system, ("exit 1",))
+
+
+def test_pickle_not_loaded(tmp_path):
+    cache, source = make_cache(tmp_path)
+    with open(cache.fn, "wb") as f:
+        f.write(pickle.dumps({"stamps": {}, "data": Payload()}))
+    assert cache.load() is None
+
+
+def test_bad_header(tmp_path):
+    cache, source = make_cache(tmp_path)
+    cache.load()
+    cache.save({"x": 1})
+    with open(cache.fn, "rb") as f:
+        buf = f.read()
+    with open(cache.fn, "wb") as f:
+        f.write(b"XXXX" + buf[4:])
+    assert StartupCache(cache.sources, cache.fn).load() is None
+    with open(cache.fn, "wb") as f:
+        f.write(buf[:len(StartupCache.HEADER) + 3])
+    assert StartupCache(cache.sources, cache.fn).load() is None
+
+
+def test_one_project_at_a_time(tmp_path):
+    cache, source = make_cache(tmp_path)
+    a = StartupCache(cache.sources, cache.fn, str(tmp_path / "a"))
+    a.load()
+    a.save({"x": 1})
+    assert StartupCache(cache.sources, cache.fn, a.project).load() == {"x": 1}
+    # same file, another project folder: not used, and replaced
+    b = StartupCache(cache.sources, cache.fn, str(tmp_path / "b"))
+    assert b.load() is None
+    b.save({"x": 2})
+    assert StartupCache(cache.sources, cache.fn, b.project).load() == {"x": 2}
+    assert StartupCache(cache.sources, cache.fn, a.project).load() is None
+
+
+def test_old_files_pruned(tmp_path):
+    cache, source = make_cache(tmp_path)
+    old = tmp_path / "startup-1234abcd.cache"
+    old.write_bytes(b"MMSC")
+    cache.load()
+    cache.save({"x": 1})
+    assert not old.exists()
+    assert os.path.exists(cache.fn)
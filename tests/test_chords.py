@@ -0,0 +1,89 @@
+import os, sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.chords import ChordTable
+from src.constants import NOTES
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chord_corpus.tsv")
+
+
+def corpus():
+    """(MIDI notes, name from the table, name the old analyzer gave)
+
+    Every common chord type on every root in every inversion, played close
+    from C3, and some wide voicings and doubled notes, whose old name can
+    differ (intentionally, the table names the close voicing).
+    """
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                continue
+            fields = line.rstrip("\n").split("\t")
+            notes = [int(n) for n in fields[0].split()]
+            label = fields[1]
+            old = fields[2] if len(fields) > 2 else label
+            yield notes, label, old
+
+
+def bitmask(notes):
+    return sum(1 << n for n in notes)
+
+
+@pytest.fixture(scope="module")
+def table():
+    table = ChordTable()
+    assert table.load(os.path.join(ROOT, ChordTable.FILENAME))
+    return table
+
+
+def test_table_complete(table):
+    """Every pitch class set and bass note has a name"""
+    assert len(table) == sum(bin(mask).count("1") for mask in range(1, 1 << 12))
+    for mask in range(1, 1 << 12):
+        for bass in range(12):
+            if mask >> bass & 1:
+                assert table.get(mask, bass), (mask, bass)
+
+
+def test_save_load(tmp_path):
+    table = ChordTable()
+    table.set(0b10010001, 0, "Cmajor")
+    table.set(0b10010001, 7, "Cmajor/G")
+    fn = str(tmp_path / ChordTable.FILENAME)
+    table.save(fn)
+    loaded = ChordTable()
+    assert loaded.load(fn)
+    assert loaded.labels == table.labels
+    assert len(loaded) == 2
+    assert not ChordTable().load(str(tmp_path / "missing.bin"))
+    with open(fn, "wb") as f:
+        f.write(b"003\t0\tCmajor\n") # not a chord table
+    with pytest.raises(ValueError):
+        loaded.load(fn)
+
+
+def test_pitch_classes():
+    # C major spread over 3 octaves, G in the bass
+    assert ChordTable.pitch_classes(bitmask([43, 60, 64, 76])) == (0b10010001, 7)
+    assert ChordTable.pitch_classes(bitmask([48, 52, 55])) == (0b10010001, 0)
+    assert ChordTable.pitch_classes(bitmask([11])) == (1 << 11, 11)
+
+
+def test_corpus(table):
+    assert table.analyze(0) == ''
+    for notes, label, old in corpus():
+        assert table.analyze(bitmask(notes)) == label, notes
+
+
+def test_corpus_matches_musicpy():
+    """The corpus names are musicpy's, and the old names are what it gave for the notes played"""
+    mp = pytest.importorskip("musicpy")
+    for notes, label, old in corpus():
+        mask, bass = ChordTable.pitch_classes(bitmask(notes))
+        assert mp.alg.detect(mp.chord(",".join(ChordTable.voicing(mask, bass)))) == label, notes
+        played = ",".join(NOTES[n % 12] for n in notes)
+        assert mp.alg.detect(mp.chord(played)) == old, notes
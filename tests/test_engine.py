@@ -0,0 +1,99 @@
+import os, sys, threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.engine import RingBuffer, MidiEngine
+
+
+def test_ring_wraparound():
+    ring = RingBuffer(4)
+    assert ring.pop() is None
+    for i in range(10):
+        # the indexes keep counting, slots are reused
+        assert ring.push(i)
+        assert ring.push(i + 100)
+        assert len(ring) == 2
+        assert ring.pop() == i
+        assert ring.pop() == i + 100
+        assert ring.pop() is None
+    assert ring.head == ring.tail == 20
+    assert ring.items == [None] * 4 # popped items aren't kept alive
+
+
+def test_ring_full():
+    ring = RingBuffer(4)
+    for i in range(4):
+        assert ring.push(i)
+    assert not ring.push(4)
+    assert not ring.push(5)
+    assert ring.overflows == 2
+    assert len(ring) == 4
+    assert ring.pop() == 0
+    assert ring.push(6)
+    assert [ring.pop() for i in range(5)] == [1, 2, 3, 6, None]
+
+
+class FakeCore:
+    latency = None
+    profiler = None
+
+    def __init__(self):
+        self.updates = 0
+
+    def engine_update(self):
+        self.updates += 1
+
+
+def test_call_and_sync():
+    engine = MidiEngine(FakeCore())
+    done = []
+    threads = set()
+
+    def command(n):
+        done.append(n)
+        threads.add(threading.current_thread())
+
+    engine.start()
+    try:
+        for n in range(1000):
+            engine.call(command, n)
+        assert engine.sync(5)
+        assert done == list(range(1000))
+        assert threads == {engine}
+        assert engine.core.updates > 0
+    finally:
+        engine.stop()
+    assert not engine.is_alive()
+    # not running: nothing to wait for
+    assert not engine.sync()
+
+
+def test_inputs_handled_in_order():
+    engine = MidiEngine(FakeCore())
+    handled = []
+    note = engine.input(lambda *args: handled.append(("note",) + args))
+    bend = engine.input(lambda *args: handled.append(("bend",) + args))
+    engine.start()
+    try:
+        for i in range(100):
+            note(i, 0)
+            bend(i, 1)
+        assert engine.sync(5)
+    finally:
+        engine.stop()
+    # each port's events stay in order (ports are drained one after another)
+    assert [args[1:] for args in handled if args[0] == "note"] == [(i, 0) for i in range(100)]
+    assert [args[1:] for args in handled if args[0] == "bend"] == [(i, 1) for i in range(100)]
+    assert engine.handled >= 200
+
+
+def test_stop_processes_queued():
+    engine = MidiEngine(FakeCore())
+    handled = []
+    port = engine.input(handled.append)
+    for i in range(10):
+        port(i)
+    engine.start()
+    engine.stop()
+    assert handled == list(range(10))
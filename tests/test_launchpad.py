@@ -0,0 +1,128 @@
+import os, sys, shutil, subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+import rtmidi2
+
+from src.launchpad import Launchpad
+
+
+class FakeMidiOut:
+    """Records the bytes of each message sent"""
+
+    def __init__(self):
+        self.port = None
+        self.sent = []
+
+    def open_port(self, port):
+        self.port = port
+
+    def close_port(self):
+        self.port = None
+
+    def send_raw(self, *msg):
+        self.sent.append(list(msg))
+
+
+class FakeMidiIn:
+    def __init__(self):
+        self.callback = None
+        self.port = None
+
+    def open_port(self, port):
+        self.port = port
+
+    def close_port(self):
+        self.port = None
+
+
+def test_find_port():
+    ports = ["Midi Through", "Launchpad X:Launchpad X MIDI 1", "Launchpad X:Launchpad X MIDI 2"]
+    names = ["launchpad x", "lpx"]
+    assert Launchpad.find_port(ports, names, 1) == 2
+    assert Launchpad.find_port(ports, names, 3) is None
+    # windows names the X's ports differently
+    assert Launchpad.find_port(["LPX MIDI", "MIDIIN2 (LPX MIDI)"], names, 1) == 1
+    assert Launchpad.find_port(ports, ["launchpad pro"], 0) is None
+
+
+def test_open_start_close(monkeypatch):
+    monkeypatch.setattr(Launchpad, "SETTLE", 0.0)
+    midi_in = FakeMidiIn()
+    monkeypatch.setattr(rtmidi2, "MidiIn", lambda: midi_in)
+    received = []
+    out = FakeMidiOut()
+    lp = Launchpad(None, out, "lpx")
+    lp.input = lambda *args: received.append(args)
+
+    lp.open(2, 3)
+    assert out.port == 3
+    assert out.sent == [[0xF0, 0, 32, 41, 2, 12, 14, 1, 0xF7]] # programmer mode
+
+    # messages are passed on with the launchpad as they arrive
+    lp.start()
+    assert midi_in.port == 2
+    midi_in.callback([144, 11, 100], 0.001)
+    assert received == [(lp, [144, 11, 100], 0.001)]
+
+    del out.sent[:]
+    lp.frame.set_code(0, 8, 5) # led 11
+    lp.flush()
+    assert out.sent == [[0xF0, 0, 32, 41, 2, 12, 3, 0, 11, 5, 0xF7]]
+
+    lp.stop()
+    assert midi_in.port is None
+    del out.sent[:]
+    lp.close()
+    # every light off (even those never set), then back to live mode
+    pads = set()
+    for msg in out.sent[:-1]:
+        assert msg[:7] == [0xF0, 0, 32, 41, 2, 12, 3] and msg[-1] == 0xF7
+        pads.update(tuple(msg[i:i + 3]) for i in range(7, len(msg) - 1, 3))
+    assert pads == {(0, 10 * y + x, 0) for y in range(1, 10) for x in range(1, 10)}
+    assert out.sent[-1] == [0xF0, 0, 32, 41, 2, 12, 14, 0, 0xF7]
+    assert out.port is None
+
+
+def test_replayed_launchpad():
+    lp = Launchpad(None, None, "pro")
+    lp.start() # no device: nothing to open
+    lp.frame.set_code(0, 8, 5)
+    lp.flush()
+    lp.stop()
+    lp.close()
+
+
+# a headless Core finding a Launchpad X, in its own process to see what it imports
+HEADLESS = """
+import sys, rtmidi2
+sys.path.insert(0, sys.argv[1])
+sys.path.insert(0, sys.argv[2])
+from test_launchpad import FakeMidiOut, FakeMidiIn
+from src.launchpad import Launchpad
+Launchpad.SETTLE = Launchpad.SETTLE_MK3 = 0
+rtmidi2.get_out_ports = lambda: ["midimech", "Launchpad X LPX DAW Out", "Launchpad X LPX MIDI Out"]
+rtmidi2.get_in_ports = lambda: ["Launchpad X LPX DAW In", "Launchpad X LPX MIDI In"]
+rtmidi2.MidiOut = FakeMidiOut
+rtmidi2.MidiIn = FakeMidiIn
+from src.core import Core
+core = Core()
+lp = core.launchpads[0]
+lp.input(lp, [144, 11, 100])
+lp.input(lp, [144, 11, 0])
+core.engine.sync()
+print(len(core.launchpads), "pygame" in sys.modules, "launchpad_py" in sys.modules)
+"""
+
+
+def test_headless_without_pygame(tmp_path):
+    with open(tmp_path / "settings.ini", "w") as f:
+        f.write("[general]\nheadless=true\nlaunchpad=true\ncache=false\n")
+    shutil.copy(os.path.join(ROOT, "scales.yaml"), tmp_path)
+    out = subprocess.run(
+        [sys.executable, "-c", HEADLESS, os.path.abspath(ROOT), os.path.dirname(os.path.abspath(__file__))],
+        cwd=tmp_path, capture_output=True, text=True, timeout=60,
+    )
+    assert out.returncode == 0, out.stdout + out.stderr
+    assert out.stdout.splitlines()[-1] == "1 False False"
@@ -0,0 +1,96 @@
+import os, sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.linnstrument import LinnLights
+from src.launchpad import LedFrame
+
+
+def linn_lights():
+    sent = []
+    return LinnLights(lambda channel, cc, value: sent.append((channel, cc, value))), sent
+
+
+def test_linn_lights_changed_only():
+    lights, sent = linn_lights()
+    lights.set(1, 0, 5)
+    lights.set(2, 0, 5) # same row
+    lights.set(2, 1, 6) # same column
+    assert sent == [
+        (0, 20, 1), (0, 21, 0), (0, 22, 5),
+        (0, 20, 2), (0, 22, 5),
+        (0, 21, 1), (0, 22, 6),
+    ]
+    del sent[:]
+    lights.set(1, 0, 5) # unchanged
+    lights.set(2, 1, 6)
+    assert sent == []
+    lights.set(1, 0, 7)
+    assert sent == [(0, 20, 1), (0, 21, 0), (0, 22, 7)]
+    assert lights.sent == 10
+    assert lights.saved == 8
+
+
+def test_linn_lights_refresh():
+    lights, sent = linn_lights()
+    lights.set(3, 2, 1)
+    lights.refresh()
+    del sent[:]
+    # the same color is sent again, with the column and row
+    lights.set(3, 2, 1)
+    assert sent == [(0, 20, 3), (0, 21, 2), (0, 22, 1)]
+
+
+def test_led_frame_bytes():
+    frame = LedFrame("lpx")
+    frame.set(0, 1, 63, 0, 32) # led 81
+    frame.set_code(1, 8, 5) # led 12
+    assert frame.flush() == [[0, 32, 41, 2, 12, 3, 3, 81, 126, 0, 64, 0, 12, 5]]
+
+    frame = LedFrame("pro")
+    frame.set(0, 1, 63, 0, 32)
+    frame.set(1, 1, 1, 2) # launchpad_py's 0-3 levels
+    frame.set_code(1, 8, 5)
+    assert frame.flush() == [
+        [0, 32, 41, 2, 16, 11, 81, 63, 0, 32, 82, 21, 42, 0],
+        [0, 32, 41, 2, 16, 10, 12, 5],
+    ]
+
+
+def test_led_frame_changed_only():
+    frame = LedFrame("lpx")
+    for x in range(8):
+        frame.set_code(x, 1, 5)
+    assert len(frame.flush()[0]) == 6 + 8 * 3
+    assert frame.flush() == []
+    for x in range(8):
+        frame.set_code(x, 1, 5) # unchanged
+    frame.set_code(2, 1, 9)
+    assert frame.flush() == [[0, 32, 41, 2, 12, 3, 0, 83, 9]]
+    # changed and back again before a flush: nothing to send
+    frame.set_code(3, 1, 9)
+    frame.set_code(3, 1, 5)
+    assert frame.flush() == []
+    assert frame.sent == 9
+
+
+def test_led_frame_refresh():
+    frame = LedFrame("lpx")
+    frame.set_code(0, 1, 5)
+    frame.set_code(1, 1, 6)
+    frame.flush()
+    frame.refresh()
+    assert frame.flush() == [[0, 32, 41, 2, 12, 3, 0, 81, 5, 0, 82, 6]]
+    assert frame.flush() == []
+
+
+def test_led_frame_split():
+    frame = LedFrame("pro")
+    for y in range(1, 9):
+        for x in range(8):
+            frame.set_code(x, y, 1)
+    frame.set_code(8, 1, 1) # 65 pads
+    msgs = frame.flush()
+    assert [len(msg) for msg in msgs] == [6 + 64 * 2, 6 + 2]
+    assert frame.messages == 2
@@ -0,0 +1,123 @@
+import os, sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.limiter import ExpressionLimiter
+
+INTERVAL = 0.01
+THRESHOLD = 2 # in 7 bit steps
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def limiter():
+    clock = Clock()
+    limiter = ExpressionLimiter(INTERVAL, THRESHOLD)
+    limiter.clock = clock
+    return limiter, clock
+
+
+def test_first_and_big_changes_pass():
+    lim, clock = limiter()
+    assert lim.filter([0xD0, 10], 0)
+    clock.now += INTERVAL
+    assert lim.filter([0xD0, 12], 0)
+    # other types and channels are limited separately
+    assert lim.filter([0xE0, 0, 64], 0)
+    assert lim.filter([0xD1, 50], 0)
+    assert lim.filter([0xB0, 74, 3], 0)
+    # other CCs and notes aren't limited
+    assert lim.filter([0xB0, 1, 3], 0)
+    assert lim.filter([0xB0, 1, 3], 0)
+    assert lim.filter([0x90, 60, 100], 0)
+    assert not lim.pending
+
+
+def test_repeats_dropped():
+    lim, clock = limiter()
+    assert lim.filter([0xE0, 0, 64], 0)
+    clock.now += 1.0
+    assert not lim.filter([0xE0, 0, 64], 0)
+    assert not lim.pending
+
+
+def test_small_change_held_until_settled():
+    lim, clock = limiter()
+    assert lim.filter([0xD0, 10], 0)
+    clock.now += 1.0
+    assert not lim.filter([0xD0, 11], 0) # below the threshold
+    assert not lim.filter([0xD0, 9], 0) # newest held value replaces it
+    assert lim.pending
+    # due after interval * SETTLE from the last one sent, which was long ago
+    assert lim.due() == [([0xD0, 9], 0, None)]
+    assert not lim.pending
+    assert lim.last_value[0xD0] == 9 << 7
+
+
+def test_fast_change_held_for_interval():
+    lim, clock = limiter()
+    start = clock.now
+    assert lim.filter([0xD0, 10], 0)
+    clock.now = start + INTERVAL / 2
+    assert not lim.filter([0xD0, 20], 1, 5)
+    assert lim.timeout() == pytest.approx(INTERVAL / 2)
+    assert lim.due() == []
+    clock.now = start + INTERVAL
+    assert lim.timeout() == 0.0
+    assert lim.due() == [([0xD0, 20], 1, 5)]
+    assert lim.timeout() is None
+
+
+def test_final_value_after_settle():
+    lim, clock = limiter()
+    assert lim.filter([0xE0, 0, 64], 0)
+    sent = [[0xE0, 0, 64]]
+    for value in range(65, 67):
+        clock.now += INTERVAL / 10
+        if lim.filter([0xE0, 0, value], 0):
+            sent.append([0xE0, 0, value])
+    # a small change right after: held until interval * SETTLE
+    clock.now += INTERVAL / 10
+    assert not lim.filter([0xE0, 0, 67], 0)
+    deadline = lim.pending[0xE0][0]
+    clock.now = deadline - INTERVAL / 100
+    assert lim.due() == []
+    clock.now = deadline
+    sent += [data for data, timestamp, force_channel in lim.due()]
+    assert sent[-1] == [0xE0, 0, 67]
+    assert not lim.pending
+
+
+def test_back_to_sent_value_drops_held():
+    lim, clock = limiter()
+    assert lim.filter([0xD0, 10], 0)
+    assert not lim.filter([0xD0, 11], 0)
+    assert not lim.filter([0xD0, 10], 0)
+    assert not lim.pending
+    clock.now += 1.0
+    assert lim.due() == []
+
+
+def test_take_channel_before_note():
+    lim, clock = limiter()
+    assert lim.filter([0xD2, 10], 0)
+    assert lim.filter([0xE2, 0, 64], 0)
+    assert lim.filter([0xD3, 10], 0)
+    assert not lim.filter([0xD2, 40], 0)
+    assert not lim.filter([0xE2, 0, 80], 0)
+    assert not lim.filter([0xD3, 40], 0)
+    taken = lim.take_channel(2)
+    assert sorted(data for data, timestamp, force_channel in taken) == [[0xD2, 40], [0xE2, 0, 80]]
+    # the other channel is still held
+    assert list(lim.pending) == [0xD3]
+    assert lim.last_value[0xD2] == 40 << 7
+    assert lim.take_channel(2) == []
@@ -0,0 +1,124 @@
+import os, sys, threading
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.output import MidiWriter
+
+
+class FakeDevice:
+    """Records the bytes of each send_raw() call"""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_raw(self, *msg):
+        self.sent.append(msg)
+
+
+def batching_writer():
+    writer = MidiWriter()
+    writer.thread = threading.get_ident() # this thread batches, like the engine
+    return writer
+
+
+def test_superseded_expression():
+    writer = batching_writer()
+    dev = FakeDevice()
+    writer.write(dev, [0xD0, 10])
+    writer.write(dev, [0xE0, 0, 64])
+    writer.write(dev, [0xA0, 60, 10])
+    writer.write(dev, [0xA0, 62, 10]) # another note, kept
+    writer.write(dev, [0xD1, 10]) # another channel, kept
+    writer.write(dev, [0xD0, 20])
+    writer.write(dev, [0xE0, 10, 70])
+    writer.write(dev, [0xA0, 60, 30])
+    writer.write(dev, [0xB0, 74, 5]) # CCs are never coalesced
+    writer.write(dev, [0xB0, 74, 6])
+    assert dev.sent == []
+    writer.flush()
+    assert dev.sent == [
+        (0xA0, 62, 10),
+        (0xD1, 10),
+        (0xD0, 20),
+        (0xE0, 10, 70),
+        (0xA0, 60, 30),
+        (0xB0, 74, 5),
+        (0xB0, 74, 6),
+    ]
+    assert writer.coalesced == 3
+    assert writer.sent == 7
+
+
+def test_note_keeps_bends_around_it():
+    writer = batching_writer()
+    dev = FakeDevice()
+    writer.write(dev, [0xE0, 0, 10])
+    writer.write(dev, [0xE0, 0, 20])
+    writer.write(dev, [0x90, 60, 100])
+    writer.write(dev, [0xE0, 0, 30])
+    writer.write(dev, [0xE0, 0, 40])
+    writer.write(dev, [0x80, 60, 0])
+    writer.write(dev, [0xD0, 50])
+    writer.flush()
+    assert dev.sent == [
+        (0xE0, 0, 20),
+        (0x90, 60, 100),
+        (0xE0, 0, 40),
+        (0x80, 60, 0),
+        (0xD0, 50),
+    ]
+
+
+def test_last_value_delivered():
+    writer = batching_writer()
+    dev = FakeDevice()
+    for value in range(128):
+        writer.write(dev, [0xD3, value])
+    writer.flush()
+    assert dev.sent == [(0xD3, 127)]
+    # slots start over after a flush
+    writer.write(dev, [0xD3, 5])
+    writer.flush()
+    assert dev.sent == [(0xD3, 127), (0xD3, 5)]
+    assert writer.flushes == 2
+
+
+def test_devices_batched_separately():
+    writer = batching_writer()
+    a = FakeDevice()
+    b = FakeDevice()
+    writer.write(a, [0xE0, 0, 10])
+    writer.write(b, [0xE0, 0, 20])
+    writer.write(a, [0xE0, 0, 30])
+    writer.flush()
+    assert a.sent == [(0xE0, 0, 30)]
+    assert b.sent == [(0xE0, 0, 20)]
+
+
+def test_other_threads_send_immediately():
+    writer = batching_writer()
+    dev = FakeDevice()
+    writer.write(dev, [0x90, 60, 100])
+
+    def other():
+        writer.write(dev, [0xE0, 0, 10])
+        writer.write(dev, [0xE0, 0, 20])
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+    # sent before the batch, and not coalesced
+    assert dev.sent == [(0xE0, 0, 10), (0xE0, 0, 20)]
+    writer.flush()
+    assert dev.sent == [(0xE0, 0, 10), (0xE0, 0, 20), (0x90, 60, 100)]
+    assert writer.coalesced == 0
+
+
+def test_dropped_without_device():
+    writer = batching_writer()
+    writer.write(None, [0x90, 60, 100])
+    writer.write(None, [0xE0, 0, 10])
+    writer.flush()
+    assert writer.dropped == 2
+    assert writer.sent == 0
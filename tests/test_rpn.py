@@ -0,0 +1,89 @@
+import os, sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.rpn import RpnQueue
+
+
+class FakeLinn:
+    """Records what the queue sends, and its pauses, in order"""
+
+    def __init__(self):
+        self.log = []
+
+    def send(self, num, value):
+        self.log.append(("rpn", num, value))
+
+    def sleep(self, seconds):
+        self.log.append(("sleep", seconds))
+
+
+def queue(interval=RpnQueue.INTERVAL):
+    linn = FakeLinn()
+    rpn = RpnQueue(linn.send, interval)
+    rpn.sleep = linn.sleep
+    applied = []
+    rpn.on_applied = lambda sent, skipped: applied.append((sent, skipped))
+    return rpn, linn, applied
+
+
+def test_paced():
+    rpn, linn, applied = queue()
+    rpn.set(0, 1)
+    rpn.set(100, 1)
+    rpn.set(200, 0)
+    rpn.start()
+    try:
+        assert rpn.wait(5)
+    finally:
+        rpn.stop(5)
+    # in order, 50 ms after each one
+    assert linn.log == [
+        ("rpn", 0, 1), ("sleep", 0.05),
+        ("rpn", 100, 1), ("sleep", 0.05),
+        ("rpn", 200, 0), ("sleep", 0.05),
+    ]
+    assert applied == [(3, 0)]
+
+
+def test_already_set_skipped():
+    rpn, linn, applied = queue()
+    rpn.start()
+    try:
+        rpn.set(0, 1)
+        rpn.set(202, 9)
+        assert rpn.wait(5)
+        del linn.log[:]
+        rpn.set(0, 1) # already set
+        rpn.set(202, 8) # changed
+        rpn.set(202, 9) # changed back: sent again
+        rpn.set(202, 9)
+        assert rpn.wait(5)
+    finally:
+        rpn.stop(5)
+    assert [entry for entry in linn.log if entry[0] == "rpn"] == [("rpn", 202, 8), ("rpn", 202, 9)]
+    # the queue may empty between set() calls, so count all batches
+    assert [sum(counts) for counts in zip(*applied)] == [4, 2]
+    assert (rpn.sent, rpn.skipped) == (4, 2)
+
+
+def test_no_interval():
+    rpn, linn, applied = queue(0.0)
+    for value in range(3):
+        rpn.set(202, value)
+    rpn.start()
+    rpn.stop(5)
+    assert linn.log == [("rpn", 202, 0), ("rpn", 202, 1), ("rpn", 202, 2)]
+
+
+def test_stop_sends_queued():
+    # like the resets on quit, queued right before stopping
+    rpn, linn, applied = queue()
+    rpn.start()
+    rpn.set(0, 1)
+    rpn.set(200, 0)
+    rpn.stop(5)
+    assert not rpn.is_alive()
+    assert [entry for entry in linn.log if entry[0] == "rpn"] == [("rpn", 0, 1), ("rpn", 200, 0)]
+    assert rpn.wait(0)
@@ -0,0 +1,65 @@
+import os, sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from src.constants import EPSILON
+from src.core import Core
+from src.util import clamp, compose_pitch_bend, decompose_pitch_bend, pitch_bend_table
+
+# the math the tables replaced, as it was in Core.note_on() and y_bend_pitch()
+
+def note_on_velocity(curve, min_velocity, max_velocity, velocity):
+    """(velocity 0-1, MIDI velocity) from note_on() before the velocity map"""
+    vel = velocity / 127
+    has_curve = abs(curve - 1.0) > EPSILON
+    if min_velocity > 0 or max_velocity < 127 or has_curve:
+        if has_curve:
+            vel = vel**curve
+        return vel, clamp(min_velocity, max_velocity, int(vel * 127 + 0.5))
+    return vel, velocity
+
+
+def y_bend_pitch(lsb, msb, offset):
+    return compose_pitch_bend(decompose_pitch_bend((lsb, msb)) + offset)
+
+
+@pytest.mark.parametrize("bend_range", [2, 12, 24, 48])
+@pytest.mark.parametrize("y_bend", [0.0, 1.0, -0.37, 0.5])
+def test_pitch_bend_table(bend_range, y_bend):
+    offset = y_bend / (bend_range * 2)
+    table = pitch_bend_table(offset)
+    assert len(table) == 16384
+    for value in range(16384):
+        lsb, msb = value & 0x7F, value >> 7
+        assert list(table[value]) == y_bend_pitch(lsb, msb, offset), value
+
+
+def velocity_core(min_velocity, max_velocity):
+    core = Core.__new__(Core)
+    core.options = SimpleNamespace(
+        min_velocity=min_velocity,
+        max_velocity=max_velocity,
+        velocity_curve_low=0.5,
+        velocity_curve_high=3.0,
+    )
+    core.velocity_maps = {}
+    return core
+
+
+@pytest.mark.parametrize("min_velocity,max_velocity", [(0, 127), (20, 127), (0, 100), (10, 90)])
+def test_velocity_map(min_velocity, max_velocity):
+    core = velocity_core(min_velocity, max_velocity)
+    low = core.options.velocity_curve_low
+    high = core.options.velocity_curve_high
+    # the configured curve, then every foot pedal position (see cb_foot())
+    curves = [1.0, 0.5, 2.0] + [low + (1.0 - cc / 127) * (high - low) for cc in range(128)]
+    for curve in curves:
+        core.set_velocity_curve(curve)
+        assert len(core.velocity_map) == 128
+        for velocity in range(128):
+            expected = note_on_velocity(curve, min_velocity, max_velocity, velocity)
+            assert core.velocity_map[velocity] == expected, (curve, velocity)